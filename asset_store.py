@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from config import ASSET_STORE_FOLDER
+from metrics import REGISTRY
+from tracing import span
+from fastcopy import copy_file
+from copy_pipeline import HashStage, copy, read
+
+logger = logging.getLogger(__name__)
+
+# gc leaves temp files and unlinked blobs younger than this alone
+GC_GRACE_SECONDS = 3600
+
+STORE_HITS = REGISTRY.counter("asset_store_hits_total", "Stream files served from an existing blob")
+STORE_MISSES = REGISTRY.counter("asset_store_misses_total", "Stream files that added a new blob")
+STORE_BYTES_WRITTEN = REGISTRY.counter("asset_store_bytes_written_total", "Bytes written into the asset store")
+STORE_LINK_FALLBACKS = REGISTRY.counter("asset_store_link_fallbacks_total", "Links that fell back to a copy")
+
+
+def file_digest(path):
+    """SHA-256 of a file, read in chunks."""
+    return read(path, [HashStage()])["sha256"]
+
+
+class AssetStore:
+    """Content-addressed blob store shared by all built peds.
+
+    Blobs live at objects/<2 hex>/<sha256>. Stream files are hard links to their
+    blob, so identical sources take the space of one file. A blob whose link
+    count has dropped back to one is only referenced by the store and can be
+    collected. Hashes of source files are cached by (path, size, mtime).
+    """
+
+    def __init__(self, root=ASSET_STORE_FOLDER):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.index_path = self.root / "index.json"
+        self._lock = threading.Lock()
+        self._index = None
+        self._dirty = False
+
+    def _load_index(self):
+        if self._index is None:
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def save_index(self):
+        """Persist the source hash cache (written atomically)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self.index_path)
+            self._dirty = False
+
+    def blob_path(self, digest):
+        return self.objects / digest[:2] / digest
+
+    def _cached_digest(self, src, st):
+        with self._lock:
+            cached = self._load_index().get(src)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        return None
+
+    def _remember(self, src, st, digest):
+        with self._lock:
+            self._load_index()[src] = [st.st_size, st.st_mtime_ns, digest]
+            self._dirty = True
+
+    def digest(self, src):
+        """Return the content hash of src, reusing the cached value if unchanged."""
+        src = os.path.abspath(src)
+        st = os.stat(src)
+        digest = self._cached_digest(src, st)
+        if digest is None:
+            with span("hash", "io", src=src):
+                digest = file_digest(src)
+            self._remember(src, st, digest)
+        return digest
+
+    def add(self, src):
+        """Store src as a blob if its content is new and return the blob path.
+
+        A source whose hash is not cached is hashed while it is copied into a
+        temporary blob, so adding new content reads it once rather than twice.
+        """
+        src = os.path.abspath(src)
+        st = os.stat(src)
+        digest = self._cached_digest(src, st)
+        if digest is not None and self.blob_path(digest).exists():
+            STORE_HITS.inc()
+            return self.blob_path(digest)
+
+        tmp_path = self.objects / "tmp" / f"{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_path.parent.mkdir(parents=True, exist_ok=True)
+        with span("hash", "io", src=src):
+            digest = copy(src, tmp_path, [HashStage()])["sha256"]
+        self._remember(src, st, digest)
+
+        blob = self.blob_path(digest)
+        if blob.exists():
+            os.remove(tmp_path)
+            STORE_HITS.inc()
+            return blob
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_path, blob)
+        STORE_MISSES.inc()
+        STORE_BYTES_WRITTEN.inc(blob.stat().st_size)
+        return blob
+
+    def link(self, src, dst):
+        """Make dst a hard link to the blob holding src's content.
+
+        Falls back to a plain copy where hard links are not supported (e.g. the
+        output folder is on another volume). Returns True if dst is a link.
+        """
+        blob = self.add(src)
+        if os.path.lexists(dst):
+            os.remove(dst)
+        try:
+            os.link(blob, dst)
+            return True
+        except OSError as e:
+            logger.debug("Hard link failed for %s (%s), copying instead", dst, e)
+            STORE_LINK_FALLBACKS.inc()
+            copy_file(blob, dst)
+            return False
+
+    def gc(self, dry_run=False):
+        """Remove blobs no ped links to anymore. Returns (blobs, bytes) freed."""
+        removed = freed = 0
+        if not self.objects.exists():
+            return removed, freed
+
+        live = set()
+        # Temp files and unlinked blobs this young may belong to an add() still running elsewhere
+        cutoff = time.time() - GC_GRACE_SECONDS
+        for bucket in self.objects.iterdir():
+            if not bucket.is_dir():
+                continue
+            for blob in bucket.iterdir():
+                st = blob.stat()
+                if st.st_mtime > cutoff and (blob.suffix == ".tmp" or st.st_nlink <= 1):
+                    if blob.suffix != ".tmp":
+                        live.add(blob.name)
+                    continue
+                if blob.suffix == ".tmp" or st.st_nlink <= 1:
+                    removed += 1
+                    freed += st.st_size
+                    if not dry_run:
+                        blob.unlink()
+                else:
+                    live.add(blob.name)
+            if not dry_run and bucket.name != "tmp" and not any(bucket.iterdir()):
+                bucket.rmdir()
+
+        if not dry_run:
+            with self._lock:
+                index = self._load_index()
+                for src in [s for s, entry in index.items() if entry[2] not in live]:
+                    del index[src]
+                    self._dirty = True
+            self.save_index()
+
+        logger.info(f"Asset store gc: {removed} blobs, {freed / (1024 * 1024):.1f} MiB "
+                    f"{'would be ' if dry_run else ''}freed")
+        return removed, freed
+
+    def stats(self):
+        """Blob count, stored bytes and the bytes saved by sharing blobs."""
+        blobs = stored = saved = 0
+        if self.objects.exists():
+            for bucket in self.objects.iterdir():
+                if not bucket.is_dir():
+                    continue
+                for blob in bucket.iterdir():
+                    if blob.suffix == ".tmp":
+                        continue
+                    st = blob.stat()
+                    blobs += 1
+                    stored += st.st_size
+                    # Every link beyond the first would have been a full copy
+                    saved += st.st_size * max(st.st_nlink - 2, 0)
+        return {"blobs": blobs, "bytes": stored, "bytes_saved": saved}
+
+
+_store = None
+
+
+def get_store():
+    """Return the process-wide asset store."""
+    global _store
+    if _store is None:
+        _store = AssetStore()
+    return _store
+
+
+if __name__ == "__main__":
+    import argparse
+    from config import setup_logging
+
+    parser = argparse.ArgumentParser(description="Manage the shared asset store")
+    parser.add_argument("command", choices=["gc", "stats"])
+    parser.add_argument("--root", default=ASSET_STORE_FOLDER)
+    parser.add_argument("--dry-run", action="store_true", help="Only report what gc would remove")
+    args = parser.parse_args()
+
+    setup_logging()
+    store = AssetStore(args.root)
+    if args.command == "gc":
+        blobs, freed = store.gc(dry_run=args.dry_run)
+        print(f"{blobs} blobs, {freed} bytes {'to free' if args.dry_run else 'freed'}")
+    else:
+        print(json.dumps(store.stats(), indent=2))
@@ -0,0 +1,173 @@
+import os
+import time
+import asyncio
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from config import ASYNC_READ_CONCURRENCY, ASYNC_WRITE_CONCURRENCY
+from file_handler import FileHandler, FILES_COPIED, BYTES_COPIED, COPY_SECONDS
+from metrics import REGISTRY
+from output_sinks import OutputSink
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Files up to this size are read into memory by the read stage; bigger ones are
+# copied straight from the source by the write stage
+PREFETCH_MAX_BYTES = 16 * 1024 * 1024
+
+READS_IN_FLIGHT = REGISTRY.gauge("pipeline_reads_in_flight", "Source reads running in the async copy pipeline")
+WRITES_IN_FLIGHT = REGISTRY.gauge("pipeline_writes_in_flight", "Output writes running in the async copy pipeline")
+SHARED_WRITES = REGISTRY.counter("pipeline_shared_writes_total",
+                                 "Output files written from a source already read for another path")
+
+
+class PlanningSink(OutputSink):
+    """Record the files a build would write instead of writing them.
+
+    FileHandler.copy_files run against this sink resolves names and sources
+    (cheap with the listing cache) and leaves the copies to execute_plan.
+    A path written twice keeps its last source, as a folder would.
+    """
+
+    deferred = True
+
+    def __init__(self):
+        super().__init__()
+        self.ops = {}
+
+    def write_file(self, rel_path, src):
+        self._record(rel_path)
+        self.ops[rel_path] = ("file", src)
+
+    def write_bytes(self, rel_path, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._record(rel_path)
+        self.ops[rel_path] = ("bytes", data)
+
+    def sources(self):
+        """Map each source file to the paths it is written to, in plan order."""
+        sources = {}
+        for rel_path, (kind, payload) in self.ops.items():
+            if kind == "file":
+                sources.setdefault(os.path.normcase(os.path.abspath(payload)), []).append(rel_path)
+        return sources
+
+
+def _read_source(src):
+    """Read a source file (if small enough) and stat it through the open handle."""
+    with span("read", "io", src=src), open(src, "rb") as f:
+        st = os.fstat(f.fileno())
+        if st.st_size > PREFETCH_MAX_BYTES:
+            return None, st
+        return f.read(), st
+
+
+def _write(write, rel_path, *args):
+    # Runs on a pool thread, so the span lands on that thread's trace row
+    with span("write", "io", path=rel_path):
+        write(rel_path, *args)
+
+
+def _in_executor(loop, executor, func, *args):
+    # run_in_executor does not carry the task's context; copy it so spans reach this build's trace
+    return loop.run_in_executor(executor, contextvars.copy_context().run, func, *args)
+
+
+async def execute_plan(plan, sink, progress_callback=None, read_limit=None, write_limit=None):
+    """Copy the files of a plan into sink with bounded read and write concurrency.
+
+    Reads and writes run on a dedicated thread pool. At most read_limit source
+    reads and write_limit sink writes are in flight, and at most
+    read_limit + write_limit files are held in memory at once. A source written
+    to several paths is read once. Sinks that are not thread-safe (archives)
+    get one writer.
+    """
+    read_limit = read_limit or ASYNC_READ_CONCURRENCY
+    write_limit = write_limit or ASYNC_WRITE_CONCURRENCY
+    if not sink.concurrent_writes:
+        write_limit = 1
+
+    loop = asyncio.get_running_loop()
+    read_slots = asyncio.Semaphore(read_limit)
+    write_slots = asyncio.Semaphore(write_limit)
+    buffered = asyncio.Semaphore(read_limit + write_limit)
+    total = len(plan.ops) or 1
+    done = 0
+
+    def report(status):
+        nonlocal done
+        done += 1
+        if progress_callback:
+            progress_callback(done / total, status)
+
+    async def copy(executor, rel_paths, src):
+        async with buffered:
+            async with read_slots:
+                pending = []
+                for rel_path in rel_paths:
+                    if await _in_executor(loop, executor, sink.already_written, rel_path, src):
+                        report(rel_path)
+                    else:
+                        pending.append(rel_path)
+                if not pending:
+                    return
+                READS_IN_FLIGHT.inc()
+                try:
+                    data, st = await _in_executor(loop, executor, _read_source, src)
+                finally:
+                    READS_IN_FLIGHT.dec()
+
+            # One read feeds every path the source is written to
+            for index, rel_path in enumerate(pending):
+                async with write_slots:
+                    WRITES_IN_FLIGHT.inc()
+                    started = time.perf_counter()
+                    try:
+                        if data is not None:
+                            await _in_executor(loop, executor, _write, sink.write_prefetched, rel_path, data, src, st)
+                        elif index == 0:
+                            await _in_executor(loop, executor, _write, sink.write_file, rel_path, src)
+                        else:
+                            await _in_executor(loop, executor, _write, sink.write_copy, rel_path, pending[0], src)
+                    finally:
+                        WRITES_IN_FLIGHT.dec()
+                COPY_SECONDS.observe(time.perf_counter() - started)
+                FILES_COPIED.inc()
+                BYTES_COPIED.inc(st.st_size)
+                if index:
+                    SHARED_WRITES.inc()
+                report(rel_path)
+
+    async def write(executor, rel_path, data):
+        async with write_slots:
+            await _in_executor(loop, executor, _write, sink.write_bytes, rel_path, data)
+        report(rel_path)
+
+    with ThreadPoolExecutor(max_workers=read_limit + write_limit, thread_name_prefix="copy") as executor:
+        tasks = [copy(executor, rel_paths, src) for src, rel_paths in plan.sources().items()]
+        tasks += [write(executor, rel_path, payload)
+                  for rel_path, (kind, payload) in plan.ops.items() if kind == "bytes"]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        logger.error(f"{len(errors)} of {len(tasks)} sources failed to copy, first error: {errors[0]}")
+        raise errors[0]
+    logger.debug("Pipeline wrote %d files from %d tasks (%d reads / %d writes in flight)", len(plan.ops), len(tasks), read_limit, write_limit)
+
+
+async def plan_copy(selected_options, ped_name, base_path, plan=None):
+    """Resolve the files copy_files would write for one library root, off the event loop."""
+    plan = plan or PlanningSink()
+    await asyncio.to_thread(FileHandler.copy_files, selected_options, ped_name, base_path, None, plan)
+    return plan
+
+
+async def copy_files_async(selected_options, ped_name, base_path, sink, progress_callback=None,
+                           read_limit=None, write_limit=None):
+    """Async counterpart of FileHandler.copy_files writing into sink."""
+    plan = await plan_copy(selected_options, ped_name, base_path)
+    await execute_plan(plan, sink, progress_callback, read_limit, write_limit)
+    return True
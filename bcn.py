@@ -0,0 +1,338 @@
+"""Decode block-compressed (BCn) texture data to RGBA with NumPy.
+
+Every function takes the raw mip data plus its size in pixels and returns an
+(height, width, 4) uint8 array. Blocks are decoded in bulk: all blocks of an
+image (or, for BC7, all blocks of one mode) go through the same array ops, so
+there is no per-block or per-pixel Python loop.
+"""
+import numpy as np
+
+# BC7 mode table: subsets, partition bits, rotation bits, index selection bits,
+# color bits, alpha bits, per-endpoint p-bits, shared p-bits, index bits, secondary index bits
+_BC7_MODES = (
+    (3, 4, 0, 0, 4, 0, 1, 0, 3, 0),
+    (2, 6, 0, 0, 6, 0, 0, 1, 3, 0),
+    (3, 6, 0, 0, 5, 0, 0, 0, 2, 0),
+    (2, 6, 0, 0, 7, 0, 1, 0, 2, 0),
+    (1, 0, 2, 1, 5, 6, 0, 0, 2, 3),
+    (1, 0, 2, 0, 7, 8, 0, 0, 2, 2),
+    (1, 0, 0, 0, 7, 7, 1, 0, 4, 0),
+    (2, 6, 0, 0, 5, 5, 1, 0, 2, 0),
+)
+
+_BC7_WEIGHTS = {
+    2: np.array([0, 21, 43, 64]),
+    3: np.array([0, 9, 18, 27, 37, 46, 55, 64]),
+    4: np.array([0, 4, 9, 13, 17, 21, 26, 30, 34, 38, 43, 47, 51, 55, 60, 64]),
+}
+
+# Two-subset partitions as 16-bit masks: bit i set means pixel i is in subset 1
+_PARTITION2_MASKS = (
+    0xCCCC, 0x8888, 0xEEEE, 0xECC8, 0xC880, 0xFEEC, 0xFEC8, 0xEC80,
+    0xC800, 0xFFEC, 0xFE80, 0xE800, 0xFFE8, 0xFF00, 0xFFF0, 0xF000,
+    0xF710, 0x008E, 0x7100, 0x08CE, 0x008C, 0x7310, 0x3100, 0x8CCE,
+    0x088C, 0x3110, 0x6666, 0x366C, 0x17E8, 0x0FF0, 0x718E, 0x399C,
+    0xAAAA, 0xF0F0, 0x5A5A, 0x33CC, 0x3C3C, 0x55AA, 0x9696, 0xA55A,
+    0x73CE, 0x13C8, 0x324C, 0x3BDC, 0x6996, 0xC33C, 0x9966, 0x0660,
+    0x0272, 0x04E4, 0x4E40, 0x2720, 0xC936, 0x936C, 0x39C6, 0x639C,
+    0x9336, 0x9CC6, 0x817E, 0xE718, 0xCCF0, 0x0FCC, 0x7744, 0xEE22,
+)
+
+# Three-subset partitions, one string of 16 subset ids per partition
+_PARTITION3 = (
+    "0011001102212222", "0001001122112221", "0000200122112211", "0222002200110111",
+    "0000000011221122", "0011001100220022", "0022002211111111", "0011001122112211",
+    "0000000011112222", "0000111111112222", "0000111122222222", "0012001200120012",
+    "0112011201120112", "0122012201220122", "0011011211221222", "0011200122002220",
+    "0001001101121122", "0111001120012200", "0000112211221122", "0022002200221111",
+    "0111011102220222", "0001000122212221", "0000001101220122", "0000110022102210",
+    "0122012200110000", "0012001211222222", "0110122112210110", "0000011012211221",
+    "0022110211020022", "0110011020022222", "0011012201220011", "0000200022112221",
+    "0000000211221222", "0222002200120011", "0011001200220222", "0120012001200120",
+    "0000111122220000", "0120120120120120", "0120201212010120", "0011220011220011",
+    "0011112222000011", "0101010122222222", "0000000021212121", "0022112200221122",
+    "0022001100220011", "0220122102201221", "0101222222220101", "0000212121212121",
+    "0101010101012222", "0222011102220111", "0002111200021112", "0000211221122112",
+    "0222011101110222", "0002111211120002", "0110011001102222", "0000000021122112",
+    "0110011022222222", "0022001100110022", "0022112211220022", "0000000000002112",
+    "0002000100020001", "0222122202221222", "0101222222222222", "0111201122012220",
+)
+
+_ANCHOR2 = (
+    15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15,
+    15, 2, 8, 2, 2, 8, 8, 15, 2, 8, 2, 2, 8, 8, 2, 2,
+    15, 15, 6, 8, 2, 8, 15, 15, 2, 8, 2, 2, 2, 15, 15, 6,
+    6, 2, 6, 8, 15, 15, 2, 2, 15, 15, 15, 15, 15, 2, 2, 15,
+)
+_ANCHOR3_SECOND = (
+    3, 3, 15, 15, 8, 3, 15, 15, 8, 8, 6, 6, 6, 5, 3, 3,
+    3, 3, 8, 15, 3, 3, 6, 10, 5, 8, 8, 6, 8, 5, 15, 15,
+    8, 15, 3, 5, 6, 10, 8, 15, 15, 3, 15, 5, 15, 15, 15, 15,
+    3, 15, 5, 5, 5, 8, 5, 10, 5, 10, 8, 13, 15, 12, 3, 3,
+)
+_ANCHOR3_THIRD = (
+    15, 8, 8, 3, 15, 15, 3, 8, 15, 15, 15, 15, 15, 15, 15, 8,
+    15, 8, 15, 3, 15, 8, 15, 8, 3, 15, 6, 10, 15, 15, 10, 8,
+    15, 3, 15, 10, 10, 8, 9, 10, 6, 15, 8, 15, 3, 6, 6, 8,
+    15, 3, 15, 15, 15, 15, 15, 15, 15, 15, 15, 15, 3, 15, 15, 8,
+)
+
+_SUBSETS = {
+    1: np.zeros((1, 16), dtype=np.intp),
+    2: np.array([[(mask >> i) & 1 for i in range(16)] for mask in _PARTITION2_MASKS], dtype=np.intp),
+    3: np.array([[int(c) for c in row] for row in _PARTITION3], dtype=np.intp),
+}
+_ANCHORS = {
+    1: np.zeros((1, 1), dtype=np.intp),
+    2: np.stack([np.zeros(64, dtype=np.intp), np.array(_ANCHOR2)], axis=1),
+    3: np.stack([np.zeros(64, dtype=np.intp), np.array(_ANCHOR3_SECOND), np.array(_ANCHOR3_THIRD)], axis=1),
+}
+
+
+def _blocks(data, width, height, block_size):
+    """View data as (blocks_y, blocks_x, block_size) bytes, validating its length."""
+    blocks_x, blocks_y = max((width + 3) // 4, 1), max((height + 3) // 4, 1)
+    needed = blocks_x * blocks_y * block_size
+    if len(data) < needed:
+        raise ValueError(f"Need {needed} bytes for a {width}x{height} image, got {len(data)}")
+    return np.frombuffer(data, dtype=np.uint8, count=needed).reshape(blocks_y, blocks_x, block_size)
+
+
+def _to_image(texels, width, height):
+    """(blocks_y, blocks_x, 16, 4) texels -> (height, width, 4) image, cropped to size."""
+    blocks_y, blocks_x = texels.shape[:2]
+    image = texels.reshape(blocks_y, blocks_x, 4, 4, 4).transpose(0, 2, 1, 3, 4)
+    return np.ascontiguousarray(image.reshape(blocks_y * 4, blocks_x * 4, 4)[:height, :width])
+
+
+def _rgb565(values):
+    values = values.astype(np.uint16)
+    r = (values >> 11) & 0x1F
+    g = (values >> 5) & 0x3F
+    b = values & 0x1F
+    return np.stack([(r << 3) | (r >> 2), (g << 2) | (g >> 4), (b << 3) | (b >> 2)], axis=-1).astype(np.int32)
+
+
+def _color_block(blocks, punchthrough):
+    """Decode BC1 color blocks (..., 8) to (..., 16, 4) texels."""
+    c0 = blocks[..., 0].astype(np.uint16) | (blocks[..., 1].astype(np.uint16) << 8)
+    c1 = blocks[..., 2].astype(np.uint16) | (blocks[..., 3].astype(np.uint16) << 8)
+    e0, e1 = _rgb565(c0), _rgb565(c1)
+
+    four_color = (c0 > c1)[..., None] if punchthrough else np.ones(c0.shape + (1,), dtype=bool)
+    palette = np.empty(c0.shape + (4, 4), dtype=np.int32)
+    palette[..., 0, :3] = e0
+    palette[..., 1, :3] = e1
+    palette[..., 2, :3] = np.where(four_color, (2 * e0 + e1) // 3, (e0 + e1) // 2)
+    palette[..., 3, :3] = np.where(four_color, (e0 + 2 * e1) // 3, 0)
+    palette[..., 3] = 255
+    palette[..., 3, 3] = np.where(four_color[..., 0], 255, 0)
+
+    bits = blocks[..., 4:8].astype(np.uint32)
+    indices = bits[..., 0] | (bits[..., 1] << 8) | (bits[..., 2] << 16) | (bits[..., 3] << 24)
+    indices = (indices[..., None] >> (2 * np.arange(16, dtype=np.uint32))) & 3
+    return np.take_along_axis(palette, indices[..., None].astype(np.intp), axis=-2)
+
+
+def _alpha_block(blocks):
+    """Decode BC3/BC4 interpolated alpha blocks (..., 8) to (..., 16) values."""
+    a0 = blocks[..., 0].astype(np.int32)
+    a1 = blocks[..., 1].astype(np.int32)
+    steps = np.arange(1, 7)
+    eight = a0 > a1
+    palette = np.empty(a0.shape + (8,), dtype=np.int32)
+    palette[..., 0] = a0
+    palette[..., 1] = a1
+    palette[..., 2:8] = np.where(
+        eight[..., None],
+        ((7 - steps) * a0[..., None] + steps * a1[..., None]) // 7,
+        np.concatenate([
+            ((5 - steps[:4]) * a0[..., None] + steps[:4] * a1[..., None]) // 5,
+            np.zeros(a0.shape + (1,), dtype=np.int32),
+            np.full(a0.shape + (1,), 255, dtype=np.int32),
+        ], axis=-1),
+    )
+
+    bits = blocks[..., 2:8].astype(np.uint64)
+    packed = np.zeros(a0.shape, dtype=np.uint64)
+    for byte in range(6):
+        packed |= bits[..., byte] << np.uint64(8 * byte)
+    indices = (packed[..., None] >> (np.uint64(3) * np.arange(16, dtype=np.uint64))) & np.uint64(7)
+    return np.take_along_axis(palette, indices.astype(np.intp), axis=-1)
+
+
+def decode_bc1(data, width, height):
+    """DXT1: 4 colors (or 3 colors and transparent) per 4x4 block."""
+    return _to_image(_color_block(_blocks(data, width, height, 8), punchthrough=True).astype(np.uint8), width, height)
+
+
+def decode_bc2(data, width, height):
+    """DXT3: BC1 colors with explicit 4-bit alpha."""
+    blocks = _blocks(data, width, height, 16)
+    texels = _color_block(blocks[..., 8:], punchthrough=False)
+    alpha = blocks[..., :8].astype(np.int32)
+    alpha = np.stack([alpha & 0xF, alpha >> 4], axis=-1).reshape(alpha.shape[:-1] + (16,))
+    texels[..., 3] = alpha * 17
+    return _to_image(texels.astype(np.uint8), width, height)
+
+
+def decode_bc3(data, width, height):
+    """DXT5: BC1 colors with interpolated alpha."""
+    blocks = _blocks(data, width, height, 16)
+    texels = _color_block(blocks[..., 8:], punchthrough=False)
+    texels[..., 3] = _alpha_block(blocks[..., :8])
+    return _to_image(texels.astype(np.uint8), width, height)
+
+
+def decode_bc4(data, width, height):
+    """ATI1: one interpolated channel, shown as grey."""
+    values = _alpha_block(_blocks(data, width, height, 8))
+    texels = np.stack([values, values, values, np.full_like(values, 255)], axis=-1)
+    return _to_image(texels.astype(np.uint8), width, height)
+
+
+def decode_bc5(data, width, height):
+    """ATI2: two interpolated channels (normal maps); blue is reconstructed from them."""
+    blocks = _blocks(data, width, height, 16)
+    x = _alpha_block(blocks[..., :8])
+    y = _alpha_block(blocks[..., 8:])
+    nx, ny = x / 127.5 - 1.0, y / 127.5 - 1.0
+    z = np.sqrt(np.clip(1.0 - nx * nx - ny * ny, 0.0, 1.0))
+    texels = np.stack([x, y, np.rint((z + 1.0) * 127.5).astype(np.int32), np.full_like(x, 255)], axis=-1)
+    return _to_image(texels.astype(np.uint8), width, height)
+
+
+def _bc7_mode(bits, mode):
+    """Decode BC7 blocks of one mode: bits is (n, 128) with bit 0 first; returns (n, 16, 4)."""
+    subsets, partition_bits, rotation_bits, selection_bits, color_bits, alpha_bits, \
+        endpoint_pbits, shared_pbits, index_bits, index2_bits = _BC7_MODES[mode]
+    count = len(bits)
+    rows = np.arange(count)[:, None]
+    position = mode + 1
+
+    def read(width):
+        nonlocal position
+        if not width:
+            return np.zeros(count, dtype=np.int32)
+        weights = 1 << np.arange(width, dtype=np.int32)
+        value = bits[:, position:position + width].astype(np.int32) @ weights
+        position += width
+        return value
+
+    partition = read(partition_bits)
+    rotation = read(rotation_bits)
+    selection = read(selection_bits)
+
+    endpoints = np.zeros((count, 2 * subsets, 4), dtype=np.int32)
+    for channel in range(3):
+        for endpoint in range(2 * subsets):
+            endpoints[:, endpoint, channel] = read(color_bits)
+    for endpoint in range(2 * subsets):
+        endpoints[:, endpoint, 3] = read(alpha_bits)
+
+    color_precision, alpha_precision = color_bits, alpha_bits
+    if endpoint_pbits or shared_pbits:
+        if endpoint_pbits:
+            pbits = np.stack([read(1) for _ in range(2 * subsets)], axis=1)
+        else:
+            pbits = np.repeat(np.stack([read(1) for _ in range(subsets)], axis=1), 2, axis=1)
+        endpoints = (endpoints << 1) | pbits[..., None]
+        color_precision += 1
+        alpha_precision += 1 if alpha_bits else 0
+
+    def expand(values, precision):
+        values = values << (8 - precision)
+        return values | (values >> precision)
+
+    endpoints[..., :3] = expand(endpoints[..., :3], color_precision)
+    endpoints[..., 3] = expand(endpoints[..., 3], alpha_precision) if alpha_bits else 255
+
+    # Index widths vary per block: the anchor pixel of each subset drops its top bit
+    subset_of = _SUBSETS[subsets][partition]
+    anchors = _ANCHORS[subsets][partition if subsets > 1 else np.zeros(count, dtype=np.intp)]
+
+    def read_indices(width, anchor_pixels):
+        nonlocal position
+        widths = np.full((count, 16), width, dtype=np.int32)
+        np.put_along_axis(widths, anchor_pixels, width - 1, axis=1)
+        offsets = position + np.cumsum(widths, axis=1) - widths
+        values = np.zeros((count, 16), dtype=np.int32)
+        for bit in range(width):
+            present = bit < widths
+            taken = np.take_along_axis(bits, np.minimum(offsets + bit, 127), axis=1).astype(np.int32)
+            values |= np.where(present, taken, 0) << bit
+        position += 16 * width - anchor_pixels.shape[1]
+        return values
+
+    indices = read_indices(index_bits, anchors)
+    color_weights = alpha_weights = _BC7_WEIGHTS[index_bits][indices]
+    if index2_bits:
+        indices2 = read_indices(index2_bits, np.zeros((count, 1), dtype=np.intp))
+        weights2 = _BC7_WEIGHTS[index2_bits][indices2]
+        swap = (selection == 1)[:, None]
+        color_weights = np.where(swap, weights2, _BC7_WEIGHTS[index_bits][indices])
+        alpha_weights = np.where(swap, _BC7_WEIGHTS[index_bits][indices], weights2)
+
+    e0 = endpoints[rows, 2 * subset_of]
+    e1 = endpoints[rows, 2 * subset_of + 1]
+    weights = np.concatenate([np.repeat(color_weights[..., None], 3, axis=-1), alpha_weights[..., None]], axis=-1)
+    texels = ((64 - weights) * e0 + weights * e1 + 32) >> 6
+
+    if rotation_bits:
+        for value, channel in ((1, 0), (2, 1), (3, 2)):
+            rotate = rotation == value
+            texels[rotate, :, channel], texels[rotate, :, 3] = texels[rotate, :, 3], texels[rotate, :, channel].copy()
+    return texels
+
+
+def decode_bc7(data, width, height):
+    """BC7: eight block modes with up to three subsets, decoded mode by mode."""
+    blocks = _blocks(data, width, height, 16)
+    shape = blocks.shape[:2]
+    blocks = blocks.reshape(-1, 16)
+    bits = np.unpackbits(blocks, axis=1, bitorder="little")
+    # The mode is the position of the lowest set bit. Blocks without one are reserved and deliberately
+    # decode to transparent black as the spec asks (Pillow's bcn decoder gives opaque black)
+    has_mode = bits[:, :8].any(axis=1)
+    modes = np.where(has_mode, bits[:, :8].argmax(axis=1), 8)
+
+    texels = np.zeros((len(blocks), 16, 4), dtype=np.int32)
+    for mode in range(8):
+        selected = modes == mode
+        if selected.any():
+            texels[selected] = _bc7_mode(bits[selected], mode)
+    return _to_image(texels.reshape(shape + (16, 4)).astype(np.uint8), width, height)
+
+
+def decode_uncompressed(data, width, height, fmt):
+    """A8R8G8B8, A8B8G8R8, A1R5G5B5, A8 and L8 pixels."""
+    if fmt in ("A8R8G8B8", "A8B8G8R8"):
+        pixels = np.frombuffer(data, dtype=np.uint8, count=width * height * 4).reshape(height, width, 4)
+        return np.ascontiguousarray(pixels[..., [2, 1, 0, 3]] if fmt == "A8R8G8B8" else pixels)
+    if fmt == "A1R5G5B5":
+        values = np.frombuffer(data, dtype="<u2", count=width * height).reshape(height, width).astype(np.int32)
+        channels = [((values >> shift) & 0x1F) * 255 // 31 for shift in (10, 5, 0)]
+        return np.stack(channels + [((values >> 15) & 1) * 255], axis=-1).astype(np.uint8)
+    values = np.frombuffer(data, dtype=np.uint8, count=width * height).reshape(height, width)
+    if fmt == "A8":
+        return np.stack([np.zeros_like(values)] * 3 + [values], axis=-1)
+    return np.stack([values, values, values, np.full_like(values, 255)], axis=-1)
+
+
+DECODERS = {
+    "DXT1": decode_bc1,
+    "DXT3": decode_bc2,
+    "DXT5": decode_bc3,
+    "ATI1": decode_bc4,
+    "ATI2": decode_bc5,
+    "BC7": decode_bc7,
+}
+
+
+def decode(data, width, height, fmt):
+    """Decode one mip level in any supported ytd format to an (height, width, 4) RGBA array."""
+    if fmt in DECODERS:
+        return DECODERS[fmt](data, width, height)
+    if fmt in ("A8R8G8B8", "A8B8G8R8", "A1R5G5B5", "A8", "L8"):
+        return decode_uncompressed(data, width, height, fmt)
+    raise ValueError(f"Unsupported texture format: {fmt}")
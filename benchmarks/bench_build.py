@@ -0,0 +1,150 @@
+"""End-to-end build benchmark on a synthetic clothes library.
+
+Usage: python benchmarks/bench_build.py [--scales small,medium,large] [--repeats 3] [--output FILE]
+
+For every scale a library is generated in a temp directory (not timed), then
+FileHandler.copy_files and generate_xml are timed on the full selection. The
+XmlToYmtConverter.exe step is skipped unless --with-converter is given, since it
+only runs on Windows. --asset-store links stream files from the shared store and
+--sink picks where the resource is written (memory skips the disk entirely) and
+--async copies through the asyncio pipeline. Results go to benchmarks/results/build-<time>.json.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from common import median, write_results
+from synthetic_library import generate_library
+
+import ymt
+import file_handler
+import output_sinks
+from file_handler import FileHandler
+from output_sinks import open_sink
+from builder import split_selection
+from async_pipeline import PlanningSink, execute_plan, plan_copy
+
+KB = 1024
+
+SCALES = {
+    "small": dict(categories=["shirts", "pants", "hats"], items_per_category=5, textures_per_item=2,
+                  texture_size=64 * KB, model_size=32 * KB),
+    "medium": dict(items_per_category=10, textures_per_item=4, texture_size=256 * KB, model_size=128 * KB),
+    "large": dict(items_per_category=25, textures_per_item=4, texture_size=256 * KB, model_size=128 * KB),
+}
+
+
+def run_build(library, ped_name, sink_format="directory", use_async=False):
+    """Copy and generate one ped, returning the phase timings in seconds."""
+    groups = split_selection(library["selection"])
+    base_paths = {"head": library["face_path"], "body": library["body_path"], "clothes": library["male_path"]}
+
+    start = time.perf_counter()
+    with open_sink(ped_name, sink_format) as sink:
+        if use_async:
+            asyncio.run(copy_groups_async(groups, ped_name, base_paths, sink))
+        else:
+            for group, selected_options in groups.items():
+                if any(selected_options.get(key) for key in selected_options if not key.endswith("_textures")):
+                    FileHandler.copy_files(selected_options, ped_name, base_paths[group], sink=sink)
+    copied = time.perf_counter()
+    ymt.generate_xml(dict(library["selection"], name=ped_name), ped_name)
+    done = time.perf_counter()
+    return {"copy_s": copied - start, "xml_s": done - copied, "total_s": done - start}
+
+
+async def copy_groups_async(groups, ped_name, base_paths, sink):
+    plan = PlanningSink()
+    for group, selected_options in groups.items():
+        if any(selected_options.get(key) for key in selected_options if not key.endswith("_textures")):
+            await plan_copy(selected_options, ped_name, base_paths[group], plan)
+    await execute_plan(plan, sink)
+
+
+def assert_linked(ped_name):
+    """Fail unless the built stream files are hard links into the asset store."""
+    stream = os.path.join(output_sinks.TARGET_FOLDER, ped_name, "stream")
+    first = os.path.join(stream, sorted(os.listdir(stream))[0])
+    if os.stat(first).st_nlink < 2:
+        raise SystemExit(f"--asset-store is on but {first} was copied, not linked")
+
+
+def benchmark_scale(name, params, repeats, workdir, sink_format="directory", use_async=False, use_store=False):
+    library_root = os.path.join(workdir, f"library-{name}")
+    generate_started = time.perf_counter()
+    library = generate_library(library_root, **params)
+    print(f"[{name}] generated {library['files']} files / {library['bytes'] / (1024 * KB):.1f} MiB "
+          f"in {time.perf_counter() - generate_started:.1f}s")
+
+    runs = []
+    for run in range(repeats):
+        # Builds write to ./output relative to the working directory
+        run_dir = os.path.join(workdir, f"run-{name}-{run}")
+        os.makedirs(run_dir)
+        previous_cwd = os.getcwd()
+        os.chdir(run_dir)
+        try:
+            runs.append(run_build(library, f"bench_{name}", sink_format, use_async))
+            if use_store and sink_format == "directory" and run == 0:
+                assert_linked(f"bench_{name}")
+        finally:
+            os.chdir(previous_cwd)
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+    total = median(r["total_s"] for r in runs)
+    result = {
+        "params": params,
+        "sink": sink_format,
+        "async": use_async,
+        "asset_store": use_store,
+        "files": library["files"],
+        "bytes": library["bytes"],
+        "copy_s": median(r["copy_s"] for r in runs),
+        "xml_s": median(r["xml_s"] for r in runs),
+        "total_s": total,
+        "throughput_mib_s": library["bytes"] / (1024 * KB) / total if total else None,
+        "runs": runs,
+    }
+    print(f"[{name}] copy {result['copy_s']:.3f}s  xml {result['xml_s']:.3f}s  "
+          f"total {total:.3f}s  ({result['throughput_mib_s']:.1f} MiB/s)")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default="small,medium,large")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--with-converter", action="store_true", help="Also run XmlToYmtConverter.exe")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--verbose", action="store_true", help="Show build log messages")
+    parser.add_argument("--sink", default="directory",
+                        help="Output sink: directory, memory, zip, tar, tar.gz or tar.zst")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Copy with the asyncio pipeline")
+    parser.add_argument("--asset-store", action="store_true", help="Link stream files from the asset store")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        # The synthetic library has no needed/ templates; keep their errors out of the report
+        logging.disable(logging.ERROR)
+    if args.asset_store:
+        # DirectorySink reads its own copy of the setting; file_handler saves the store index
+        output_sinks.USE_ASSET_STORE = file_handler.USE_ASSET_STORE = True
+    if not args.with_converter:
+        ymt.convert_xml_to_ymt = lambda xml_file, ymt_file: None
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="ped-bench-") as workdir:
+        for name in args.scales.split(","):
+            results[name] = benchmark_scale(name, SCALES[name], args.repeats, workdir, args.sink,
+                                            args.use_async, args.asset_store)
+
+    path = write_results("build", results, args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
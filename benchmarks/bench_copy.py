@@ -0,0 +1,130 @@
+"""Raw file copy throughput and CPU cost per copy method.
+
+Usage: python benchmarks/bench_copy.py [--sizes-mib 1,8,64] [--files 8] [--repeats 3] [--dir DIR] [--output FILE]
+
+Copies a set of random files with shutil.copy (the old path), shutil.copyfile,
+every fastcopy method this platform offers and a few copy_pipeline stage sets
+(against hashing and copying separately), and reports MiB/s plus user
+and system CPU seconds per GiB. Sources stay in the page cache between runs,
+so this measures the copy path itself rather than the disk. Use --dir to
+benchmark a particular file system (e.g. a network share or btrfs, where
+copy_file_range can reflink). Results go to benchmarks/results/copy-<time>.json.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from common import median, write_results
+
+import asset_store
+import copy_pipeline
+import fastcopy
+
+MIB = 1024 * 1024
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def cpu_times():
+    """(user, system) CPU seconds of this process, at rusage resolution where available."""
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return usage.ru_utime, usage.ru_stime
+    times = os.times()
+    return times.user, times.system
+
+
+def make_sources(folder, size, count):
+    paths = []
+    for index in range(count):
+        path = os.path.join(folder, f"src_{size // MIB}m_{index}.ytd")
+        with open(path, "wb") as f:
+            remaining = size
+            while remaining:
+                chunk = min(remaining, 4 * MIB)
+                f.write(os.urandom(chunk))
+                remaining -= chunk
+        paths.append(path)
+    return paths
+
+
+def copy_methods():
+    methods = {
+        "shutil.copy": shutil.copy,
+        "shutil.copyfile": shutil.copyfile,
+        "fastcopy": fastcopy.copy_file,
+    }
+    for method in fastcopy.available_methods():
+        methods[f"fastcopy.{method}"] = lambda src, dst, method=method: fastcopy.copy_file(src, dst, method=method)
+    # Copy stages: one read shared by every stage vs hashing in a separate pass
+    methods["hash then fastcopy"] = lambda src, dst: (asset_store.file_digest(src), fastcopy.copy_file(src, dst))
+    for names in (["hash"], ["hash", "size", "verify"], ["hash", "compress"]):
+        methods[f"pipeline.{'+'.join(names)}"] = \
+            lambda src, dst, names=names: copy_pipeline.copy(src, dst, copy_pipeline.make_stages(names))
+    return methods
+
+
+def measure(copy, sources, folder):
+    targets = [os.path.join(folder, f"dst_{index}") for index in range(len(sources))]
+    user_before, system_before = cpu_times()
+    start = time.perf_counter()
+    for src, dst in zip(sources, targets):
+        copy(src, dst)
+    elapsed = time.perf_counter() - start
+    user_after, system_after = cpu_times()
+    for dst in targets:
+        os.remove(dst)
+    return {
+        "seconds": elapsed,
+        "user_s": user_after - user_before,
+        "system_s": system_after - system_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes-mib", default="1,8,64")
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--dir", default=None, help="Folder to copy in (default: a temp folder)")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    results = {"methods": fastcopy.available_methods(), "sizes": {}}
+    with tempfile.TemporaryDirectory(prefix="ped-copy-", dir=args.dir) as folder:
+        for size_mib in (int(s) for s in args.sizes_mib.split(",")):
+            size = size_mib * MIB
+            sources = make_sources(folder, size, args.files)
+            total_bytes = size * len(sources)
+            size_results = {}
+            for name, copy in copy_methods().items():
+                measure(copy, sources, folder)  # warm-up
+                runs = [measure(copy, sources, folder) for _ in range(args.repeats)]
+                seconds = median(r["seconds"] for r in runs)
+                user = median(r["user_s"] for r in runs)
+                system = median(r["system_s"] for r in runs)
+                gib = total_bytes / (1024 * MIB)
+                size_results[name] = {
+                    "seconds": seconds,
+                    "mib_s": total_bytes / MIB / seconds if seconds else None,
+                    "user_s_per_gib": user / gib,
+                    "system_s_per_gib": system / gib,
+                    "runs": runs,
+                }
+                print(f"[{size_mib:>4} MiB x {len(sources)}] {name:<26} {size_results[name]['mib_s']:>9.1f} MiB/s  "
+                      f"cpu/GiB user {user / gib:.3f}s sys {system / gib:.3f}s")
+            results["sizes"][f"{size_mib}MiB"] = size_results
+            for path in sources:
+                os.remove(path)
+
+    path = write_results("copy", results, args.output)
+    print(f"Results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
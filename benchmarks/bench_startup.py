@@ -0,0 +1,79 @@
+"""Startup benchmark: import cost of each module and time to first window.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--max-ms 1500] [--output FILE]
+
+Each measurement runs in a fresh interpreter so nothing is cached between runs.
+Time to first window comes from ``main.py --startup-bench``, which prints the
+elapsed time once the builder frame is on screen and exits.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+from common import REPO_ROOT, median, write_results
+
+IMPORT_MODULES = ["config", "ymt", "file_handler", "gui"]
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import {module}; "
+    "print(f'IMPORT_MS={{(time.perf_counter() - start) * 1000:.3f}}')"
+)
+
+
+def _run(args, marker):
+    result = subprocess.run(
+        [sys.executable] + args,
+        cwd=REPO_ROOT, capture_output=True, text=True, timeout=120
+    )
+    for line in result.stdout.splitlines():
+        if line.startswith(marker):
+            return float(line.split("=", 1)[1])
+    raise RuntimeError(f"{' '.join(args)} did not report {marker}:\n{result.stderr[-2000:]}")
+
+
+def measure_imports(runs):
+    results = {}
+    for module in IMPORT_MODULES:
+        try:
+            samples = [_run(["-c", IMPORT_SNIPPET.format(module=module)], "IMPORT_MS=") for _ in range(runs)]
+        except RuntimeError as e:
+            results[module] = {"error": str(e).splitlines()[-1]}
+            continue
+        results[module] = {"median_ms": median(samples), "samples_ms": samples}
+        print(f"import {module:<14} {median(samples):8.1f} ms")
+    return results
+
+
+def measure_first_window(runs):
+    try:
+        samples = [_run([os.path.join(REPO_ROOT, "main.py"), "--startup-bench"], "STARTUP_MS=") for _ in range(runs)]
+    except RuntimeError as e:
+        print(f"first window: unavailable ({str(e).splitlines()[-1]})")
+        return {"error": str(e).splitlines()[-1]}
+    print(f"first window         {median(samples):8.1f} ms")
+    return {"median_ms": median(samples), "samples_ms": samples}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if time to first window exceeds this")
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    results = {
+        "imports": measure_imports(args.runs),
+        "first_window": measure_first_window(args.runs),
+    }
+    path = write_results("startup", results, args.output)
+    print(f"Results written to {path}")
+
+    first_window = results["first_window"].get("median_ms")
+    if args.max_ms is not None and first_window is not None and first_window > args.max_ms:
+        print(f"FAIL: time to first window {first_window:.1f} ms exceeds {args.max_ms:.1f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Scaling benchmark and complexity gate for the ymt.py section builders.
+
+Usage: python benchmarks/bench_ymt.py [--sizes 10,100,1000,10000] [--max-exponent 1.35] [--output FILE]
+
+Synthetic ped_data with N drawables per category is fed into
+add_component_data, add_component_info, add_props_and_anchors and indent,
+and into generate_xml as a whole with the converter stubbed out. Each stage
+is timed (best of --repeats) and its peak allocation is measured with
+tracemalloc in a separate pass. The growth exponent between the two largest
+sizes, log(t2 / t1) / log(n2 / n1), must stay below --max-exponent, otherwise
+the script exits with status 1. Linear code scores about 1.0 and an
+accidental quadratic loop scores about 2.0.
+"""
+import argparse
+import gc
+import logging
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from common import write_results
+
+import ymt
+
+COMPONENT_CATEGORIES = ["shirts", "pants", "shoes", "masks"]
+PROP_CATEGORIES = ["hats", "glasses", "watches"]
+
+
+def make_ped_data(drawables, textures_per_drawable=2):
+    """Build a ped_data dict with the given number of drawables per category."""
+    ped_data = {"name": "bench"}
+    for category in COMPONENT_CATEGORIES + PROP_CATEGORIES:
+        prefix = ymt.CATEGORY_PREFIXES[category]
+        ped_data[category] = [str(i) for i in range(drawables)]
+        ped_data[f"{category}_textures"] = {
+            str(i): [f"{prefix}_diff_{i:03d}_{chr(ord('a') + t)}_uni.png" for t in range(textures_per_drawable)]
+            for i in range(drawables)
+        }
+    return ped_data
+
+
+def _section_stage(builder):
+    def run(ped_data):
+        builder(ymt.create_root(), ped_data)
+    return run
+
+
+def _indent_stage(ped_data):
+    root = ymt.create_root()
+    ymt.add_component_data(root, ped_data)
+    ymt.add_component_info(root, ped_data)
+    ymt.add_props_and_anchors(root, ped_data)
+    return root
+
+
+def _generate_xml(ped_data):
+    ymt.generate_xml(ped_data, "bench")
+
+
+# name -> (setup(ped_data) -> arg, run(arg)); only run() is measured
+STAGES = {
+    "add_component_data": (lambda d: d, _section_stage(ymt.add_component_data)),
+    "add_component_info": (lambda d: d, _section_stage(ymt.add_component_info)),
+    "add_props_and_anchors": (lambda d: d, _section_stage(ymt.add_props_and_anchors)),
+    "indent": (_indent_stage, ymt.indent),
+    "generate_xml": (lambda d: d, _generate_xml),
+}
+
+
+def measure(setup, run, ped_data, repeats):
+    """Return (best time in seconds, peak traced bytes) for one stage."""
+    best = math.inf
+    for _ in range(repeats):
+        arg = setup(ped_data)
+        # Like timeit, keep the cyclic GC out of the timings; its cost grows with heap size
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            run(arg)
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+
+    arg = setup(ped_data)
+    tracemalloc.start()
+    try:
+        run(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def growth_exponent(points):
+    """Exponent k of t ~ n^k between the two largest sizes."""
+    (n1, t1), (n2, t2) = points[-2], points[-1]
+    if t1 <= 0 or t2 <= 0 or n1 == n2:
+        return None
+    return math.log(t2 / t1) / math.log(n2 / n1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,100,1000,10000")
+    parser.add_argument("--textures", type=int, default=2, help="Textures per drawable")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max-exponent", type=float, default=1.35)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    # Per-element debug messages are not what is being measured
+    logging.disable(logging.WARNING)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    # The converter is Windows-only and not part of what is measured here
+    ymt.convert_xml_to_ymt = lambda xml_file, ymt_file: None
+
+    results = {name: {"sizes": []} for name in STAGES}
+    previous_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="ymt-bench-") as workdir:
+        os.chdir(workdir)  # generate_xml writes its temp XML to the working directory
+        try:
+            for size in sizes:
+                ped_data = make_ped_data(size, args.textures)
+                for name, (setup, run) in STAGES.items():
+                    seconds, peak = measure(setup, run, ped_data, args.repeats)
+                    results[name]["sizes"].append({"drawables": size, "seconds": seconds, "peak_bytes": peak})
+                    print(f"{name:<22} n={size:<6} {seconds * 1000:10.2f} ms  peak {peak / 1024:10.1f} KiB")
+        finally:
+            os.chdir(previous_cwd)
+
+    failures = []
+    for name, result in results.items():
+        exponent = growth_exponent([(s["drawables"], s["seconds"]) for s in result["sizes"]]) if len(sizes) > 1 else None
+        result["growth_exponent"] = exponent
+        if exponent is not None and exponent > args.max_exponent:
+            failures.append(f"{name}: growth exponent {exponent:.2f} > {args.max_exponent}")
+
+    path = write_results("ymt", {"max_exponent": args.max_exponent, "stages": results}, args.output)
+    print(f"Results written to {path}")
+
+    for name, result in results.items():
+        if result["growth_exponent"] is not None:
+            print(f"{name:<22} growth exponent {result['growth_exponent']:.2f}")
+    if failures:
+        print("FAIL:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Shared helpers for the benchmark scripts."""
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_FOLDER = os.path.join(REPO_ROOT, "benchmarks", "results")
+
+# Make the top-level modules importable when running a script directly
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+def git_revision():
+    """Return the current commit hash, or None outside a git checkout."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        )
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(name, results, output=None):
+    """Write a benchmark result file with environment metadata and return its path."""
+    now = datetime.datetime.now()
+    payload = {
+        "benchmark": name,
+        "timestamp": now.isoformat(timespec="seconds"),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if output is None:
+        os.makedirs(RESULTS_FOLDER, exist_ok=True)
+        output = os.path.join(RESULTS_FOLDER, f"{name}-{now:%Y%m%d-%H%M%S}.json")
+    with open(output, "w") as f:
+        json.dump(payload, f, indent=2)
+    return output
+
+
+def median(values):
+    ordered = sorted(values)
+    mid = len(ordered) // 2
+    if len(ordered) % 2:
+        return ordered[mid]
+    return (ordered[mid - 1] + ordered[mid]) / 2
@@ -0,0 +1,140 @@
+"""Generate a synthetic clothes library laid out the way file_handler.py expects.
+
+    <root>/male/<category>/<id>/<prefix>_<id>_u.ydd          (props: <prefix>_<id>.ydd)
+    <root>/male/<category>/<id>/textures/files/<texture>.ytd
+    <root>/male/<category>/<id>/textures/pics/<texture>.png
+    <root>/male/body/model/<id>/body_<id>_r.ydd
+    <root>/male/body/textures/<id>/uppr_diff_<id>_a_whi.ytd (+ .png)
+    <root>/face/model/<id>/head_<id>_r.ydd
+    <root>/face/textures/<id>/head_diff_<id>_a_whi.ytd      (+ .png)
+
+generate_library also returns a selection dict in the same shape the GUI
+builds (updated_dictionary), so it can be fed straight into a build.
+"""
+import os
+import struct
+import zlib
+
+from common import REPO_ROOT  # noqa: F401 (puts the repo on sys.path)
+from config import CATEGORY_PREFIXES
+
+# GUI category folders that have a prefix mapping in config.CATEGORY_PREFIXES
+DEFAULT_CATEGORIES = [
+    "accs", "bags", "chains", "decals", "glasses", "hairs", "hats",
+    "masks", "pants", "shirts", "shoes", "vests", "watches"
+]
+PROP_CATEGORIES = ["watches", "glasses", "hats"]
+
+_BLOCK_SIZE = 64 * 1024
+_BLOCK = os.urandom(_BLOCK_SIZE)
+
+
+def _write_blob(path, size, tag, unique=True):
+    """Write size bytes; unique files start with their own tag so contents differ."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    header = (tag.encode() + b"\0") if unique else b""
+    with open(path, "wb") as f:
+        f.write(header[:size])
+        remaining = size - min(len(header), size)
+        while remaining > 0:
+            chunk = _BLOCK[:min(remaining, _BLOCK_SIZE)]
+            f.write(chunk)
+            remaining -= len(chunk)
+
+
+def png_bytes(width, height, seed=0):
+    """Encode a small RGB gradient PNG without needing PIL."""
+    rows = []
+    for y in range(height):
+        row = bytearray([0])  # Filter type: none
+        for x in range(width):
+            row += bytes(((x * 7 + seed) & 0xFF, (y * 5 + seed * 3) & 0xFF, (seed * 11) & 0xFF))
+        rows.append(bytes(row))
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) +
+            chunk(b"IDAT", zlib.compress(b"".join(rows))) + chunk(b"IEND", b""))
+
+
+def _write_png(path, size, seed):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(png_bytes(size, size, seed))
+
+
+def generate_library(root, categories=None, items_per_category=10, textures_per_item=3,
+                     texture_size=256 * 1024, model_size=128 * 1024, pic_size=64,
+                     head_items=2, body_items=2, duplicate_textures=False):
+    """Create a library under root and return its paths plus a full selection.
+
+    duplicate_textures makes every texture byte-identical, like the shared
+    shirts/pants textures in the real library.
+    """
+    categories = DEFAULT_CATEGORIES if categories is None else categories
+    male_path = os.path.join(root, "male")
+    face_path = os.path.join(root, "face")
+    body_path = os.path.join(male_path, "body")
+
+    selection = {}
+    stats = {"files": 0, "bytes": 0}
+
+    def blob(path, size, tag, unique=True):
+        _write_blob(path, size, tag, unique)
+        stats["files"] += 1
+        stats["bytes"] += size
+
+    for category in categories:
+        prefix = CATEGORY_PREFIXES[category]
+        selection[category] = []
+        selection[f"{category}_textures"] = {}
+        for item in range(1, items_per_category + 1):
+            item_dir = os.path.join(male_path, category, str(item))
+            if category in PROP_CATEGORIES:
+                model_name = f"{prefix}_{item:03d}.ydd"
+            else:
+                model_name = f"{prefix}_{item:03d}_u.ydd"
+            blob(os.path.join(item_dir, model_name), model_size, f"{category}/{item}/model")
+
+            textures = []
+            for index in range(textures_per_item):
+                name = f"{prefix}_diff_{item:03d}_{chr(ord('a') + index)}_uni"
+                blob(os.path.join(item_dir, "textures", "files", f"{name}.ytd"), texture_size,
+                     f"{category}/{item}/{name}", unique=not duplicate_textures)
+                _write_png(os.path.join(item_dir, "textures", "pics", f"{name}.png"), pic_size, item + index)
+                textures.append(f"{name}.png")
+
+            selection[category].append(str(item))
+            selection[f"{category}_textures"][str(item)] = textures
+
+    # Head lives next to the gender folders, body inside them
+    for option, base, model_prefix, texture_prefix, count in (
+        ("head", face_path, "head", "head", head_items),
+        ("body", body_path, "body", "uppr", body_items),
+    ):
+        selection[option] = []
+        selection[f"{option}_textures"] = {}
+        for item in range(count):
+            model_dir = os.path.join(base, "model", str(item))
+            blob(os.path.join(model_dir, f"{model_prefix}_{item:03d}_r.ydd"), model_size, f"{option}/{item}/model")
+            _write_png(os.path.join(model_dir, f"{texture_prefix}_{item:03d}_r.png"), pic_size, item)
+
+            texture_name = f"{texture_prefix}_diff_{item:03d}_a_whi"
+            texture_dir = os.path.join(base, "textures", str(item))
+            blob(os.path.join(texture_dir, f"{texture_name}.ytd"), texture_size, f"{option}/{item}/texture")
+            _write_png(os.path.join(texture_dir, f"{texture_name}.png"), pic_size, item)
+
+            selection[option].append(str(item))
+            selection[f"{option}_textures"][str(item)] = [f"{texture_name}.png"]
+
+    return {
+        "root": root,
+        "male_path": male_path,
+        "face_path": face_path,
+        "body_path": body_path,
+        "selection": selection,
+        "files": stats["files"],
+        "bytes": stats["bytes"],
+    }
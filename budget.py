@@ -0,0 +1,171 @@
+"""Streaming-memory budget of a ped: how many bytes of textures (.ytd) and
+drawables (.ydd) it streams, per category, which files are the largest and
+which textures are larger than the configured size.
+
+Reports are plain dicts so they can be logged, shown in the GUI or dumped as
+JSON. They can be made from a build plan (before anything is copied) or from a
+built resource folder.
+"""
+import os
+import logging
+from config import (BUDGET_PED_MIB, BUDGET_CATEGORY_MIB, BUDGET_FILE_MIB, BUDGET_TEXTURE_MAX_SIZE,
+                    BUDGET_TOP_FILES, CATEGORY_PREFIXES)
+from metrics import REGISTRY
+from ytd import get_texture_index, oversized_textures
+
+logger = logging.getLogger(__name__)
+
+MIB = 1024 * 1024
+BUDGET_SUFFIXES = (".ytd", ".ydd")
+
+BUDGET_WARNINGS = REGISTRY.counter("budget_warnings_total", "Budget thresholds exceeded by planned or built peds")
+
+# Longest prefix first so "p_head" wins over "head"; shared prefixes keep the first category
+_PREFIXES = sorted(((prefix, category) for category, prefix in CATEGORY_PREFIXES.items()),
+                   key=lambda pair: len(pair[0]), reverse=True)
+
+
+def stream_category(rel_path):
+    """Selection category of a stream file, from its name (ig_test^jbib_000_u.ydd -> shirts)."""
+    name = os.path.basename(rel_path)
+    if "^" not in name:
+        return "other"
+    component = name.split("^", 1)[1]
+    for prefix, category in _PREFIXES:
+        if component.startswith(prefix + "_"):
+            return category
+    # Categories without a prefix mapping (body) are named as they are
+    return component.split("_", 1)[0]
+
+
+def budget_report(ped_name, files, top=BUDGET_TOP_FILES):
+    """Build the budget report of ped_name from (rel_path, size, path) triples.
+
+    path is a readable copy of the file (source or output), or None for
+    generated content. Texture sizes are read from .ytd files that have one.
+    """
+    categories = {}
+    total = ytd = ydd = 0
+    budgeted = []
+    oversized = []
+    index = get_texture_index()
+    for rel_path, size, path in files:
+        total += size
+        suffix = os.path.splitext(rel_path)[1].lower()
+        if suffix not in BUDGET_SUFFIXES:
+            continue
+        budgeted.append((rel_path, size))
+        entry = categories.setdefault(stream_category(rel_path), {"ytd_bytes": 0, "ydd_bytes": 0, "files": 0})
+        entry[f"{suffix[1:]}_bytes"] += size
+        entry["files"] += 1
+        if suffix == ".ytd":
+            ytd += size
+            if path:
+                for texture in oversized_textures(index.get(path), BUDGET_TEXTURE_MAX_SIZE):
+                    oversized.append({"path": rel_path, "texture": texture["name"], "width": texture["width"],
+                                      "height": texture["height"], "format": texture["format"]})
+        else:
+            ydd += size
+    index.save()
+
+    for entry in categories.values():
+        entry["bytes"] = entry["ytd_bytes"] + entry["ydd_bytes"]
+    budgeted.sort(key=lambda pair: pair[1], reverse=True)
+
+    warnings = []
+    if ytd + ydd > BUDGET_PED_MIB * MIB:
+        warnings.append(f"{ped_name} streams {(ytd + ydd) / MIB:.1f} MiB (budget {BUDGET_PED_MIB:g} MiB)")
+    for category, entry in sorted(categories.items(), key=lambda pair: pair[1]["bytes"], reverse=True):
+        if entry["bytes"] > BUDGET_CATEGORY_MIB * MIB:
+            warnings.append(f"{category} is {entry['bytes'] / MIB:.1f} MiB (budget {BUDGET_CATEGORY_MIB:g} MiB)")
+    for rel_path, size in budgeted:
+        if size <= BUDGET_FILE_MIB * MIB:
+            break
+        warnings.append(f"{os.path.basename(rel_path)} is {size / MIB:.1f} MiB (budget {BUDGET_FILE_MIB:g} MiB)")
+    for entry in oversized:
+        warnings.append(f"{os.path.basename(entry['path'])}: texture {entry['texture']} is "
+                        f"{entry['width']}x{entry['height']} (max {BUDGET_TEXTURE_MAX_SIZE})")
+    BUDGET_WARNINGS.inc(len(warnings))
+
+    return {
+        "ped": ped_name,
+        "total_bytes": total,
+        "ytd_bytes": ytd,
+        "ydd_bytes": ydd,
+        "categories": dict(sorted(categories.items(), key=lambda pair: pair[1]["bytes"], reverse=True)),
+        "largest": [{"path": rel_path, "bytes": size, "category": stream_category(rel_path)}
+                    for rel_path, size in budgeted[:top]],
+        "oversized_textures": oversized,
+        "thresholds_mib": {"ped": BUDGET_PED_MIB, "category": BUDGET_CATEGORY_MIB, "file": BUDGET_FILE_MIB},
+        "texture_max_size": BUDGET_TEXTURE_MAX_SIZE,
+        "warnings": warnings,
+    }
+
+
+def plan_files(plan):
+    """(rel_path, size, source) of every file in a PlanningSink, sized from the sources."""
+    for rel_path, (kind, payload) in plan.ops.items():
+        if kind == "file":
+            yield rel_path, os.path.getsize(payload), payload
+        else:
+            yield rel_path, len(payload), None
+
+
+def folder_files(folder):
+    """(rel_path, size, path) of every file in a built resource folder."""
+    for dirpath, _, filenames in os.walk(folder):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            yield os.path.relpath(path, folder).replace(os.sep, "/"), os.path.getsize(path), path
+
+
+def log_report(report):
+    """Log a report's totals, and its warnings as warnings."""
+    logger.info(f"Budget of {report['ped']}: {report['ytd_bytes'] / MIB:.1f} MiB ytd, "
+                f"{report['ydd_bytes'] / MIB:.1f} MiB ydd")
+    for warning in report["warnings"]:
+        logger.warning(f"Budget: {warning}")
+
+
+def format_report(report):
+    """Human-readable report (GUI)."""
+    lines = [
+        f"{report['ped']}: {(report['ytd_bytes'] + report['ydd_bytes']) / MIB:.1f} MiB streamed "
+        f"({report['ytd_bytes'] / MIB:.1f} MiB textures, {report['ydd_bytes'] / MIB:.1f} MiB models)",
+        "",
+    ]
+    if report["warnings"]:
+        lines += ["Warnings:"] + [f"  ! {warning}" for warning in report["warnings"]] + [""]
+    lines.append("By category:")
+    for category, entry in report["categories"].items():
+        lines.append(f"  {category:<12} {entry['bytes'] / MIB:8.2f} MiB  "
+                     f"(ytd {entry['ytd_bytes'] / MIB:.2f}, ydd {entry['ydd_bytes'] / MIB:.2f}, {entry['files']} files)")
+    lines += ["", "Largest files:"]
+    for entry in report["largest"]:
+        lines.append(f"  {entry['bytes'] / MIB:8.2f} MiB  {os.path.basename(entry['path'])}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import json
+    import argparse
+    from config import TARGET_FOLDER, setup_logging
+
+    parser = argparse.ArgumentParser(description="Report the streaming-memory budget of a ped as JSON")
+    parser.add_argument("ped", help="Ped name")
+    parser.add_argument("--selection", help="Plan from this selection JSON instead of reading output/<ped>")
+    parser.add_argument("--gender", choices=["male", "female"], default="male")
+    args = parser.parse_args()
+
+    setup_logging()
+    if args.selection:
+        from builder import plan_ped
+        with open(args.selection, "r", encoding="utf-8") as f:
+            selection = json.load(f)
+        report = budget_report(args.ped, plan_files(plan_ped(selection, args.ped, args.gender)))
+    else:
+        folder = os.path.join(TARGET_FOLDER, args.ped)
+        if not os.path.isdir(folder):
+            parser.error(f"{folder} does not exist; build the ped or pass --selection")
+        report = budget_report(args.ped, folder_files(folder))
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,322 @@
+import os
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import threading
+from config import BUILD_JOURNAL_PATH, BUILD_HEARTBEAT_STALE_SECONDS
+from metrics import REGISTRY
+from output_sinks import OutputSink
+
+logger = logging.getLogger(__name__)
+
+# Identifies this process; a running build belongs to the session that started or resumed it
+SESSION_ID = uuid.uuid4().hex
+HOST = socket.gethostname()
+# Seconds between heartbeat writes of a running build (record_op refreshes it)
+HEARTBEAT_INTERVAL = 10
+
+RUNNING, SUCCEEDED, FAILED, ABANDONED = "running", "succeeded", "failed", "abandoned"
+
+OPS_SKIPPED = REGISTRY.counter("journal_ops_skipped_total", "File operations skipped because a resumed build already did them")
+OPS_RECORDED = REGISTRY.counter("journal_ops_recorded_total", "File operations recorded in the build journal")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    id TEXT PRIMARY KEY,
+    ped_name TEXT NOT NULL,
+    gender TEXT NOT NULL,
+    output_format TEXT NOT NULL,
+    selection TEXT NOT NULL,
+    paths TEXT,
+    state TEXT NOT NULL,
+    session TEXT NOT NULL,
+    owner_pid INTEGER,
+    owner_host TEXT,
+    declined_at REAL,
+    error TEXT,
+    started_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS ops (
+    build_id TEXT NOT NULL REFERENCES builds(id) ON DELETE CASCADE,
+    rel_path TEXT NOT NULL,
+    src TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    done_at REAL NOT NULL,
+    PRIMARY KEY (build_id, rel_path)
+);
+CREATE INDEX IF NOT EXISTS builds_state ON builds(state);
+"""
+
+# Columns added after the first release, for journals created before them
+MIGRATIONS = {"owner_pid": "INTEGER", "owner_host": "TEXT", "declined_at": "REAL"}
+
+
+def _owner_alive(pid):
+    """Whether a process of this host with that pid is still running (None if unknown)."""
+    if os.name != "posix":
+        # os.kill(pid, 0) would send CTRL_C_EVENT on Windows; rely on the heartbeat
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return None
+    return True
+
+
+class BuildJournal:
+    """Durable SQLite record of builds and of every file each build has written.
+
+    A build is "running" until it finishes. Failed builds, and running ones
+    whose owner is gone, can be resumed: file operations already recorded as
+    done, whose output is still in place, are skipped. A running build records
+    its owner's pid and host and refreshes updated_at as it writes, so a build
+    another process (the build server, a second GUI) is still working on is
+    never taken for an interrupted one. Ops of successful builds are dropped,
+    since they are never needed.
+    """
+
+    def __init__(self, path=BUILD_JOURNAL_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        # WAL keeps per-op commits cheap without giving up crash safety
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(SCHEMA)
+        columns = {row["name"] for row in self._db.execute("PRAGMA table_info(builds)")}
+        for column, kind in MIGRATIONS.items():
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE builds ADD COLUMN {column} {kind}")
+        self._heartbeats = {}
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def start_build(self, ped_name, gender, output_format, selection, paths=None):
+        """Record a new build and return its id. Unfinished builds of the same ped are abandoned."""
+        build_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._lock:
+            with self._db:
+                self._db.execute("BEGIN")
+                self._db.execute(
+                    "UPDATE builds SET state = ?, finished_at = ? WHERE ped_name = ? AND state IN (?, ?)",
+                    (ABANDONED, now, ped_name, RUNNING, FAILED))
+                self._db.execute(
+                    "INSERT INTO builds (id, ped_name, gender, output_format, selection, paths, state, session,"
+                    " owner_pid, owner_host, started_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (build_id, ped_name, gender, output_format, json.dumps(selection),
+                     json.dumps(paths) if paths else None, RUNNING, SESSION_ID, os.getpid(), HOST, now, now))
+        logger.debug("Journal: started build %s for %s", build_id, ped_name)
+        return build_id
+
+    def resume_build(self, build_id):
+        """Claim an interrupted build for this session and return its record."""
+        self._execute("UPDATE builds SET state = ?, session = ?, owner_pid = ?, owner_host = ?, error = NULL,"
+                      " declined_at = NULL, updated_at = ?, finished_at = NULL WHERE id = ?",
+                      (RUNNING, SESSION_ID, os.getpid(), HOST, time.time(), build_id))
+        return self.get_build(build_id)
+
+    def finish_build(self, build_id, error=None):
+        state = FAILED if error else SUCCEEDED
+        now = time.time()
+        with self._lock:
+            with self._db:
+                self._db.execute("BEGIN")
+                self._db.execute("UPDATE builds SET state = ?, error = ?, updated_at = ?, finished_at = ? WHERE id = ?",
+                                 (state, error, now, now, build_id))
+                if state == SUCCEEDED:
+                    self._db.execute("DELETE FROM ops WHERE build_id = ?", (build_id,))
+        logger.debug("Journal: build %s %s", build_id, state)
+
+    def abandon_build(self, build_id):
+        """Give up on an interrupted build; it will no longer be offered for resume."""
+        self._execute("UPDATE builds SET state = ?, finished_at = ? WHERE id = ?", (ABANDONED, time.time(), build_id))
+        self._execute("DELETE FROM ops WHERE build_id = ?", (build_id,))
+
+    def get_build(self, build_id):
+        rows = self._execute("SELECT * FROM builds WHERE id = ?", (build_id,))
+        return _build_record(rows[0]) if rows else None
+
+    def decline_resume(self, build_id):
+        """Stop offering a build for resume; its staged files stay until the ped is built again."""
+        self._execute("UPDATE builds SET declined_at = ? WHERE id = ?", (time.time(), build_id))
+
+    def interrupted_builds(self, include_declined=False):
+        """Builds that can be resumed: failed ones and running ones whose owner is gone.
+
+        Builds whose resume was declined are left out unless include_declined.
+        """
+        rows = self._execute(
+            "SELECT * FROM builds WHERE state = ? OR (state = ? AND session != ?) ORDER BY started_at",
+            (FAILED, RUNNING, SESSION_ID))
+        return [_build_record(row) for row in rows
+                if (include_declined or row["declined_at"] is None)
+                and (row["state"] == FAILED or self._orphaned(row))]
+
+    @staticmethod
+    def _orphaned(row):
+        """Whether a running build of another session has lost its owner."""
+        if row["owner_pid"] is not None and row["owner_host"] == HOST:
+            alive = _owner_alive(row["owner_pid"])
+            if alive is not None:
+                return not alive
+        # Another host, or no way to ask: the owner is gone once it stops writing heartbeats
+        return time.time() - row["updated_at"] > BUILD_HEARTBEAT_STALE_SECONDS
+
+    def done_ops(self, build_id):
+        """Map of rel_path -> (src, size, mtime_ns) for operations the build completed."""
+        rows = self._execute("SELECT rel_path, src, size, mtime_ns FROM ops WHERE build_id = ?", (build_id,))
+        return {row["rel_path"]: (row["src"], row["size"], row["mtime_ns"]) for row in rows}
+
+    def record_op(self, build_id, rel_path, src, size, mtime_ns):
+        now = time.time()
+        self._execute("INSERT OR REPLACE INTO ops (build_id, rel_path, src, size, mtime_ns, done_at)"
+                      " VALUES (?, ?, ?, ?, ?, ?)", (build_id, rel_path, src, size, mtime_ns, now))
+        OPS_RECORDED.inc()
+        self.heartbeat(build_id, now)
+
+    def heartbeat(self, build_id, now=None):
+        """Mark a running build as alive (written at most every HEARTBEAT_INTERVAL seconds)."""
+        now = now or time.time()
+        if now - self._heartbeats.get(build_id, 0) < HEARTBEAT_INTERVAL:
+            return
+        self._heartbeats[build_id] = now
+        self._execute("UPDATE builds SET updated_at = ? WHERE id = ? AND state = ?", (now, build_id, RUNNING))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _build_record(row):
+    record = dict(row)
+    record["selection"] = json.loads(record["selection"])
+    record["paths"] = json.loads(record["paths"]) if record["paths"] else None
+    return record
+
+
+class JournaledSink(OutputSink):
+    """Wrap a DirectorySink so each written file is recorded in the journal.
+
+    Files the journal already has for this build are skipped if the output is
+    still there with the source's size and the source is unchanged. Aborting
+    keeps what was written so the build can be resumed.
+    """
+
+    def __init__(self, sink, journal, build_id):
+        super().__init__()
+        self.sink = sink
+        self.concurrent_writes = sink.concurrent_writes
+        self.stage_results = sink.stage_results
+        self.journal = journal
+        self.build_id = build_id
+        self._done = journal.done_ops(build_id)
+        if self._done:
+            logger.info(f"Resuming build {build_id}: {len(self._done)} files already written")
+
+    def _is_done(self, rel_path, src, st):
+        done = self._done.get(rel_path)
+        if done is None or done != (src, st.st_size, st.st_mtime_ns):
+            return False
+        try:
+            return os.path.getsize(self.sink.path(rel_path)) == st.st_size
+        except OSError:
+            return False
+
+    def write_file(self, rel_path, src):
+        src = os.path.abspath(src)
+        st = os.stat(src)
+        self._record(rel_path)
+        if self._is_done(rel_path, src, st):
+            OPS_SKIPPED.inc()
+            return
+        self.sink.write_file(rel_path, src)
+        self.journal.record_op(self.build_id, rel_path, src, st.st_size, st.st_mtime_ns)
+
+    def already_written(self, rel_path, src):
+        src = os.path.abspath(src)
+        if rel_path not in self._done or not self._is_done(rel_path, src, os.stat(src)):
+            return False
+        self._record(rel_path)
+        OPS_SKIPPED.inc()
+        return True
+
+    def write_prefetched(self, rel_path, data, src, st=None):
+        src = os.path.abspath(src)
+        st = st or os.stat(src)
+        self._record(rel_path)
+        self.sink.write_prefetched(rel_path, data, src, st)
+        self.journal.record_op(self.build_id, rel_path, src, st.st_size, st.st_mtime_ns)
+
+    def write_copy(self, rel_path, copied_rel_path, src):
+        src = os.path.abspath(src)
+        st = os.stat(src)
+        self._record(rel_path)
+        self.sink.write_copy(rel_path, copied_rel_path, src)
+        self.journal.record_op(self.build_id, rel_path, src, st.st_size, st.st_mtime_ns)
+
+    def write_bytes(self, rel_path, data):
+        # Meta files are tiny and rendered per build, so they are always rewritten
+        self._record(rel_path)
+        self.sink.write_bytes(rel_path, data)
+
+    def commit(self):
+        self.sink.commit()
+        super().commit()
+
+    def abort(self):
+        # Keep partial output for resume; the sink's own abort would delete it
+        self.sink.closed = True
+        super().abort()
+
+
+_journal = None
+_journal_lock = threading.Lock()
+
+
+def get_journal():
+    """Return the process-wide build journal."""
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = BuildJournal()
+        return _journal
+
+
+if __name__ == "__main__":
+    import argparse
+    from config import setup_logging
+
+    parser = argparse.ArgumentParser(description="Inspect and resume journaled builds")
+    parser.add_argument("command", choices=["list", "resume", "abandon"])
+    parser.add_argument("build_id", nargs="?")
+    args = parser.parse_args()
+
+    setup_logging()
+    journal = get_journal()
+    if args.command == "list":
+        for build in journal.interrupted_builds():
+            print(f"{build['id']}  {build['ped_name']:<24} {build['state']:<8} {build['error'] or ''}")
+    elif not args.build_id:
+        parser.error(f"{args.command} needs a build id")
+    elif args.command == "resume":
+        from builder import resume_build
+        resume_build(args.build_id)
+    else:
+        from builder import abandon_build
+        abandon_build(args.build_id)
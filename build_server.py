@@ -0,0 +1,356 @@
+import os
+import re
+import json
+import time
+import asyncio
+import uuid
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import BUILD_SERVER_HOST, BUILD_SERVER_PORT, BUILD_WORKERS, CATEGORY_PREFIXES, OUTPUT_FORMAT
+from metrics import REGISTRY
+from output_sinks import ARCHIVE_FORMATS
+
+logger = logging.getLogger(__name__)
+
+MAX_REQUEST_BYTES = 1024 * 1024
+# Finished jobs stay listed this long, and at most this many of them, before they are forgotten
+FINISHED_JOB_TTL = 3600
+FINISHED_JOBS_KEPT = 500
+PED_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_\-]{1,64}$")
+OUTPUT_FORMATS = ("directory",) + ARCHIVE_FORMATS
+# Selection keys a build understands: head and body plus every clothes category
+SELECTION_CATEGORIES = {"head", "body", *CATEGORY_PREFIXES}
+
+JOBS_SUBMITTED = REGISTRY.counter("build_jobs_submitted_total", "Build jobs accepted by the build server")
+JOBS_SUCCEEDED = REGISTRY.counter("build_jobs_succeeded_total", "Build jobs that finished successfully")
+JOBS_FAILED = REGISTRY.counter("build_jobs_failed_total", "Build jobs that raised an error")
+JOB_SECONDS = REGISTRY.histogram(
+    "build_job_seconds", "Run time of a build job",
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+)
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class BuildJob:
+    """One submitted ped build and its progress."""
+
+    def __init__(self, definition):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = definition["name"]
+        self.gender = definition.get("gender", "male")
+        self.output_format = definition.get("format", OUTPUT_FORMAT)
+        self.selection = definition["selection"]
+        self.state = QUEUED
+        self.progress = 0.0
+        self.status = "Queued"
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+
+    def update(self, progress, status=None):
+        self.progress = round(progress, 4)
+        if status:
+            self.status = status
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "gender": self.gender,
+            "format": self.output_format,
+            "state": self.state,
+            "progress": self.progress,
+            "status": self.status,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def _is_texture_name(texture):
+    """A plain <name>.png file name, with no folders or parent references."""
+    return (isinstance(texture, str) and texture.lower().endswith(".png") and ".." not in texture
+            and "/" not in texture and "\\" not in texture and texture == os.path.basename(texture))
+
+
+def validate_definition(definition):
+    """Check a submitted ped definition, raising ValueError with a readable message."""
+    if not isinstance(definition, dict):
+        raise ValueError("Build definition must be a JSON object")
+    name = definition.get("name")
+    if not isinstance(name, str) or not PED_NAME_PATTERN.match(name):
+        raise ValueError("'name' must be 1-64 letters, digits, '_' or '-'")
+    if definition.get("gender", "male") not in ("male", "female"):
+        raise ValueError("'gender' must be 'male' or 'female'")
+    if definition.get("format", OUTPUT_FORMAT) not in OUTPUT_FORMATS:
+        raise ValueError(f"'format' must be one of {', '.join(OUTPUT_FORMATS)}")
+
+    selection = definition.get("selection")
+    if not isinstance(selection, dict) or not selection:
+        raise ValueError("'selection' must be a non-empty object")
+    for category, value in selection.items():
+        option = category[:-len("_textures")] if category.endswith("_textures") else category
+        if option not in SELECTION_CATEGORIES:
+            raise ValueError(f"Unknown category '{option}'")
+        if category.endswith("_textures"):
+            if not isinstance(value, dict) or not all(isinstance(t, list) for t in value.values()):
+                raise ValueError(f"'{category}' must map item ids to lists of texture files")
+            for textures in value.values():
+                for texture in textures:
+                    if not _is_texture_name(texture):
+                        raise ValueError(f"'{category}' has an invalid texture file name: {texture!r}")
+        elif not isinstance(value, list) or not all(str(item).isdigit() for item in value):
+            raise ValueError(f"'{category}' must be a list of numeric item ids")
+    if not any(value for key, value in selection.items() if not key.endswith("_textures")):
+        raise ValueError("Please select at least one item")
+
+
+class BuildQueue:
+    """Runs submitted builds on a worker pool, one build per ped name at a time.
+
+    Two builds of the same ped would write the same files, so later builds of a
+    name wait in a per-name queue and are only handed to the pool when the
+    running one finishes. Workers never block waiting for a name.
+    """
+
+    def __init__(self, workers=BUILD_WORKERS):
+        self.jobs = {}
+        self._lock = threading.Lock()
+        # Ped name -> jobs waiting for the running build of that name
+        self._waiting = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="build")
+        REGISTRY.gauge("build_jobs_queued", "Build jobs waiting for a worker").set_function(
+            lambda: self._count(QUEUED))
+        REGISTRY.gauge("build_jobs_running", "Build jobs currently running").set_function(
+            lambda: self._count(RUNNING))
+
+    def _count(self, state):
+        with self._lock:
+            return sum(1 for job in self.jobs.values() if job.state == state)
+
+    def submit(self, definition):
+        validate_definition(definition)
+        job = BuildJob(definition)
+        with self._lock:
+            self._prune()
+            self.jobs[job.id] = job
+            if job.name in self._waiting:
+                self._waiting[job.name].append(job)
+            else:
+                self._waiting[job.name] = deque()
+                job.future = self._executor.submit(self._run, job)
+        JOBS_SUBMITTED.inc()
+        logger.info(f"Queued build {job.id} for ped {job.name}")
+        return job
+
+    def _prune(self):
+        """Forget finished jobs past FINISHED_JOB_TTL or beyond FINISHED_JOBS_KEPT (lock held)."""
+        finished = [job for job in self.jobs.values() if job.state in FINISHED_STATES and job.finished_at]
+        cutoff = time.time() - FINISHED_JOB_TTL
+        finished.sort(key=lambda job: job.finished_at, reverse=True)
+        for index, job in enumerate(finished):
+            if index >= FINISHED_JOBS_KEPT or job.finished_at < cutoff:
+                del self.jobs[job.id]
+
+    def _start_next(self, name):
+        """Hand the next waiting build of name to the pool, or release the name."""
+        with self._lock:
+            self._prune()
+            waiting = self._waiting.get(name)
+            while waiting:
+                job = waiting.popleft()
+                if job.state == QUEUED:
+                    job.future = self._executor.submit(self._run, job)
+                    return
+            self._waiting.pop(name, None)
+
+    def _run(self, job):
+        from builder import build_ped_async
+
+        try:
+            # Checked and switched under the lock so cancel() can't slip in between
+            with self._lock:
+                if job.state != QUEUED:
+                    return
+                job.state = RUNNING
+                job.started_at = time.time()
+                job.update(0.0, "Running")
+            try:
+                with JOB_SECONDS.time():
+                    # Each worker thread drives its own event loop for the async copy pipeline
+                    asyncio.run(build_ped_async(job.selection, job.name, job.gender, job.update, job.output_format))
+                job.state = SUCCEEDED
+                JOBS_SUCCEEDED.inc()
+                logger.info(f"Build {job.id} ({job.name}) finished")
+            except Exception as e:
+                job.state = FAILED
+                job.error = str(e)
+                job.status = "Failed"
+                JOBS_FAILED.inc()
+                logger.error(f"Build {job.id} ({job.name}) failed: {e}")
+            finally:
+                job.finished_at = time.time()
+        finally:
+            self._start_next(job.name)
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return [job.to_dict() for job in self.jobs.values()]
+
+    def cancel(self, job_id):
+        """Cancel a job that has not started yet. Returns True if it was cancelled."""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.state != QUEUED:
+                return False
+            job.state = CANCELLED
+            job.status = "Cancelled"
+            job.finished_at = time.time()
+        # A job already handed to the pool returns at once and starts the next build of its name
+        return True
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+class BuildRequestHandler(BaseHTTPRequestHandler):
+    """JSON API: POST /builds, GET /builds, GET|DELETE /builds/<id>, GET /health, GET /metrics."""
+
+    server_version = "PedCreatorBuildServer/1.0"
+
+    @property
+    def queue(self):
+        return self.server.build_queue
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _job_id(self):
+        parts = self.path.rstrip("/").split("/")
+        return parts[2] if len(parts) == 3 and parts[1] == "builds" else None
+
+    def do_GET(self):
+        path = self.path.rstrip("/")
+        if path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif path == "/metrics":
+            body = REGISTRY.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif path == "/builds":
+            self._send_json(200, {"builds": self.queue.list()})
+        elif self._job_id():
+            job = self.queue.get(self._job_id())
+            if job is None:
+                self._send_json(404, {"error": "Unknown build"})
+            else:
+                self._send_json(200, job.to_dict())
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def _foreign_origin(self):
+        """Whether the request comes from a web page other than this server's own origin."""
+        origin = self.headers.get("Origin")
+        if origin is None:
+            return False
+        port = self.server.server_port
+        return origin not in (f"http://{BUILD_SERVER_HOST}:{port}", f"http://localhost:{port}")
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/builds":
+            self._send_json(404, {"error": "Not found"})
+            return
+        # Browsers send simple (text/plain, form) cross-site POSTs without a CORS preflight,
+        # so any page could queue builds unless the type and origin are checked
+        if self._foreign_origin():
+            self._send_json(403, {"error": "Cross-origin requests are not allowed"})
+            return
+        content_type = (self.headers.get("Content-Type") or "").split(";", 1)[0].strip().lower()
+        if content_type != "application/json":
+            self._send_json(415, {"error": "Content-Type must be application/json"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            self._send_json(400, {"error": "Invalid Content-Length"})
+            return
+        if length <= 0 or length > MAX_REQUEST_BYTES:
+            self._send_json(413 if length else 400, {"error": "Request body must be 1 byte to 1 MiB of JSON"})
+            return
+        try:
+            definition = json.loads(self.rfile.read(length))
+            job = self.queue.submit(definition)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        self.send_response(202)
+        body = json.dumps(job.to_dict()).encode("utf-8")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Location", f"/builds/{job.id}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_DELETE(self):
+        job_id = self._job_id()
+        if self._foreign_origin():
+            self._send_json(403, {"error": "Cross-origin requests are not allowed"})
+        elif not job_id or self.queue.get(job_id) is None:
+            self._send_json(404, {"error": "Unknown build"})
+        elif self.queue.cancel(job_id):
+            self._send_json(200, self.queue.get(job_id).to_dict())
+        else:
+            self._send_json(409, {"error": "Build already started"})
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def create_server(port=BUILD_SERVER_PORT, workers=BUILD_WORKERS):
+    """Create the build server on localhost; call serve_forever() to run it."""
+    server = ThreadingHTTPServer((BUILD_SERVER_HOST, port), BuildRequestHandler)
+    server.daemon_threads = True
+    server.build_queue = BuildQueue(workers)
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+    from config import setup_logging
+
+    parser = argparse.ArgumentParser(description="Run the local ped build server")
+    parser.add_argument("--port", type=int, default=BUILD_SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=BUILD_WORKERS)
+    args = parser.parse_args()
+
+    setup_logging()
+    server = create_server(args.port, args.workers)
+    logger.info(f"Build server listening on http://{BUILD_SERVER_HOST}:{server.server_port} "
+                f"with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.build_queue.shutdown()
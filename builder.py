@@ -0,0 +1,316 @@
+import os
+import shutil
+import asyncio
+import logging
+import tempfile
+from pathlib import Path
+from config import MALE_PATH, FEMALE_PATH, OUTPUT_FORMAT, PREFLIGHT_BEFORE_BUILD, TARGET_FOLDER, USE_BUILD_JOURNAL
+from build_journal import JournaledSink, get_journal
+from file_handler import FileHandler
+from output_sinks import open_sink, staging_path
+from budget import log_report
+from tracing import build_trace, traced
+from ymt import generate_xml
+
+logger = logging.getLogger(__name__)
+
+# Share of the progress bar given to copying; the rest covers the YMT step
+COPY_PROGRESS_SHARE = 0.9
+
+
+def split_selection(selected_options):
+    """Group a selection by the library each part is copied from (head, body, clothes)."""
+    groups = {"head": {}, "body": {}, "clothes": {}}
+    for key, value in selected_options.items():
+        if key == "name":
+            continue
+        option = key[:-len("_textures")] if key.endswith("_textures") else key
+        group = option if option in ("head", "body") else "clothes"
+        groups[group][key] = value
+    return groups
+
+
+def base_paths(gender):
+    """Library roots for each selection group of a gender."""
+    base_path = MALE_PATH if gender == "male" else FEMALE_PATH
+    return {
+        # Head is outside MALE_PATH/FEMALE_PATH
+        "head": os.path.join(os.path.dirname(MALE_PATH), "face"),
+        # Body is inside MALE_PATH/FEMALE_PATH
+        "body": os.path.join(base_path, "body"),
+        "clothes": base_path,
+    }
+
+
+def count_items(selected_options):
+    return sum(len(items) for category, items in selected_options.items()
+               if not category.endswith("_textures") and category != "name")
+
+
+def preflight(selected_options, gender="male", paths=None):
+    """Check the selection before a build; raises PreflightError if it cannot produce a ped."""
+    from preflight import PreflightError, check_selection, log_report
+
+    report = check_selection(selected_options, gender, paths)
+    log_report(report)
+    if not report["buildable"]:
+        raise PreflightError(report)
+    return report
+
+
+def plan_ped(selected_options, ped_name, gender="male", paths=None):
+    """Resolve every file a build of the selection would write, without copying anything."""
+    from async_pipeline import PlanningSink
+
+    paths = paths or base_paths(gender)
+    plan = PlanningSink()
+    for group, options in split_selection(selected_options).items():
+        if count_items(options):
+            FileHandler.copy_files(options, ped_name, paths[group], None, plan)
+    return plan
+
+
+def plan_budget(selected_options, ped_name, gender="male", paths=None):
+    """Streaming-memory budget report of a selection, before it is built."""
+    return FileHandler.budget_report(ped_name, plan_ped(selected_options, ped_name, gender, paths))
+
+
+@traced("builder.build_ped", args=lambda selected_options, ped_name, *a, **kw: {"ped": ped_name})
+def build_ped(selected_options, ped_name, gender="male", progress_callback=None, output_format=None, paths=None,
+              journal=None, build_id=None):
+    """Build a ped resource without the GUI: copy assets, meta files and the YMT.
+
+    Each part of the selection is copied from its own library root, so items are
+    only looked up where they can exist. progress_callback(fraction, status) is
+    called as items are processed. Folder builds are recorded in the build
+    journal; pass build_id to continue an interrupted one. The selection is
+    checked first (preflight.py), so a build that would fail does so before
+    anything is copied.
+    """
+    groups = split_selection(selected_options)
+    paths = paths or base_paths(gender)
+    output_format = output_format or OUTPUT_FORMAT
+    total_items = sum(count_items(options) for options in groups.values()) or 1
+    if PREFLIGHT_BEFORE_BUILD:
+        preflight(selected_options, gender, paths)
+
+    def report(fraction, status=None):
+        if progress_callback:
+            progress_callback(fraction, status)
+
+    sink, journal, build_id = _open_build_sink(selected_options, ped_name, gender, output_format, paths,
+                                               journal, build_id)
+    try:
+        _run_build(selected_options, ped_name, groups, paths, sink, total_items, report)
+    except Exception as e:
+        if build_id:
+            journal.finish_build(build_id, str(e))
+        raise
+    if build_id:
+        journal.finish_build(build_id)
+
+    report(1.0, "Complete!")
+    logger.info(f"Built ped {ped_name} ({total_items} items)")
+    return sink
+
+
+def _open_build_sink(selected_options, ped_name, gender, output_format, paths, journal, build_id):
+    # Archives are written in one pass and cannot be resumed, so only folders are journaled
+    if output_format == "directory" and (journal or USE_BUILD_JOURNAL):
+        journal = journal or get_journal()
+        if not build_id:
+            # A fresh build replaces any unfinished one of the same ped
+            for stale in journal.interrupted_builds(include_declined=True):
+                if stale["ped_name"] == ped_name:
+                    _discard_staging(stale)
+            build_id = journal.start_build(ped_name, gender, output_format, selected_options, paths)
+        # Staging is keyed by the build so a resumed build finds what it already wrote
+        sink = open_sink(ped_name, output_format, staging_id=build_id)
+        return JournaledSink(sink, journal, build_id), journal, build_id
+    return open_sink(ped_name, output_format), journal, None
+
+
+def _discard_staging(build):
+    shutil.rmtree(staging_path(Path(TARGET_FOLDER) / build["ped_name"], build["id"]), ignore_errors=True)
+
+
+def _write_ymt(selected_options, ped_name, sink):
+    """Generate the YMT and add it to the resource's stream folder."""
+    with tempfile.TemporaryDirectory(prefix="ped-ymt-") as ymt_dir:
+        ymt_file = generate_xml(dict(selected_options, name=ped_name), ped_name, ymt_dir)
+        if ymt_file and os.path.exists(ymt_file):
+            sink.write_file(f"stream/{ped_name}.ymt", ymt_file)
+        else:
+            logger.warning(f"No YMT was produced for {ped_name}")
+
+
+def _run_build(selected_options, ped_name, groups, paths, sink, total_items, report):
+    done_items = 0
+    # Record a Chrome trace of the build when PED_CREATOR_TRACE=1.
+    # All copy passes write into one sink (a folder or an archive).
+    with build_trace(ped_name), sink:
+        for group, options in groups.items():
+            group_items = count_items(options)
+            if not group_items:
+                continue
+
+            offset = done_items
+
+            def group_progress(fraction, status=None, offset=offset, group_items=group_items):
+                report(COPY_PROGRESS_SHARE * (offset + fraction * group_items) / total_items, status)
+
+            FileHandler.copy_files(options, ped_name, paths[group], group_progress, sink)
+            done_items += group_items
+
+        report(COPY_PROGRESS_SHARE, "Generating YMT")
+        _write_ymt(selected_options, ped_name, sink)
+
+
+async def build_ped_async(selected_options, ped_name, gender="male", progress_callback=None, output_format=None,
+                          paths=None, journal=None, build_id=None, read_limit=None, write_limit=None):
+    """Async build_ped: resolve every file first, then copy them with many reads in flight.
+
+    Meant for high-latency sources such as network shares. Blocking work runs
+    on threads, so this can be awaited from any event loop.
+    """
+    from async_pipeline import execute_plan
+
+    groups = split_selection(selected_options)
+    paths = paths or base_paths(gender)
+    output_format = output_format or OUTPUT_FORMAT
+    total_items = sum(count_items(options) for options in groups.values()) or 1
+    if PREFLIGHT_BEFORE_BUILD:
+        await asyncio.to_thread(preflight, selected_options, gender, paths)
+
+    def report(fraction, status=None):
+        if progress_callback:
+            progress_callback(fraction, status)
+
+    sink, journal, build_id = _open_build_sink(selected_options, ped_name, gender, output_format, paths,
+                                               journal, build_id)
+    try:
+        with build_trace(ped_name), sink:
+            report(0.0, "Resolving files")
+            plan = await asyncio.to_thread(plan_ped, selected_options, ped_name, gender, paths)
+            log_report(FileHandler.budget_report(ped_name, plan))
+
+            await execute_plan(plan, sink, lambda fraction, status=None: report(COPY_PROGRESS_SHARE * fraction, status),
+                               read_limit, write_limit)
+
+            report(COPY_PROGRESS_SHARE, "Generating YMT")
+            await asyncio.to_thread(_write_ymt, selected_options, ped_name, sink)
+    except Exception as e:
+        if build_id:
+            journal.finish_build(build_id, str(e))
+        raise
+    if build_id:
+        journal.finish_build(build_id)
+
+    report(1.0, "Complete!")
+    logger.info(f"Built ped {ped_name} ({total_items} items, {len(plan.ops)} files)")
+    return sink
+
+
+async def build_resource_async(resource_name, peds, output_format=None, progress_callback=None,
+                               read_limit=None, write_limit=None):
+    """Build several peds into one resource with a merged peds.meta and one fxmanifest.lua.
+
+    peds is a list of definitions like the build server takes: {"name",
+    "selection", "gender"}. All peds are planned together, so a library file
+    used by several peds (and the shared ped.yft) is read once however many
+    stream names it gets. Resource builds are not journaled.
+    """
+    from async_pipeline import PlanningSink, execute_plan
+
+    ped_names = [ped["name"] for ped in peds]
+    if not ped_names:
+        raise ValueError("A resource needs at least one ped")
+    if len(set(ped_names)) != len(ped_names):
+        raise ValueError("Ped names in a resource must be unique")
+    output_format = output_format or OUTPUT_FORMAT
+    if PREFLIGHT_BEFORE_BUILD:
+        for ped in peds:
+            await asyncio.to_thread(preflight, ped["selection"], ped.get("gender", "male"), ped.get("paths"))
+
+    def report(fraction, status=None):
+        if progress_callback:
+            progress_callback(fraction, status)
+
+    sink = open_sink(resource_name, output_format)
+    with build_trace(resource_name), sink:
+        report(0.0, "Resolving files")
+        plan = PlanningSink()
+        for ped in peds:
+            paths = ped.get("paths") or base_paths(ped.get("gender", "male"))
+            for group, options in split_selection(ped["selection"]).items():
+                if count_items(options):
+                    await asyncio.to_thread(FileHandler.copy_files, options, ped["name"], paths[group], None, plan)
+
+        # copy_files wrote a single-ped peds.meta for each ped; replace it with the merged one
+        peds_meta = FileHandler.render_peds_meta(ped_names)
+        if peds_meta is not None:
+            plan.write_bytes("peds.meta", peds_meta)
+
+        await execute_plan(plan, sink, lambda fraction, status=None: report(COPY_PROGRESS_SHARE * fraction, status),
+                           read_limit, write_limit)
+
+        for index, ped in enumerate(peds):
+            report(COPY_PROGRESS_SHARE + (1 - COPY_PROGRESS_SHARE) * index / len(peds), f"Generating YMT for {ped['name']}")
+            await asyncio.to_thread(_write_ymt, ped["selection"], ped["name"], sink)
+
+    report(1.0, "Complete!")
+    logger.info(f"Built resource {resource_name} with {len(peds)} peds "
+                f"({len(plan.ops)} files from {len(plan.sources())} sources)")
+    return sink
+
+
+def build_resource(resource_name, peds, output_format=None, progress_callback=None):
+    """Blocking build_resource_async."""
+    return asyncio.run(build_resource_async(resource_name, peds, output_format, progress_callback))
+
+
+def abandon_build(build_id, journal=None):
+    """Give up on an interrupted build and delete its staged files."""
+    journal = journal or get_journal()
+    build = journal.get_build(build_id)
+    if build is not None:
+        _discard_staging(build)
+    journal.abandon_build(build_id)
+
+
+def resume_build(build_id, progress_callback=None, journal=None):
+    """Continue an interrupted build from the journal, skipping files it already wrote."""
+    journal = journal or get_journal()
+    build = journal.resume_build(build_id)
+    if build is None:
+        raise ValueError(f"Unknown build: {build_id}")
+    logger.info(f"Resuming build {build_id} of {build['ped_name']}")
+    return build_ped(build["selection"], build["ped_name"], build["gender"], progress_callback,
+                     build["output_format"], build["paths"], journal, build_id)
+
+
+if __name__ == "__main__":
+    import json
+    import argparse
+    from config import setup_logging
+    from build_server import OUTPUT_FORMATS, PED_NAME_PATTERN, validate_definition
+
+    parser = argparse.ArgumentParser(description="Build several peds into one FiveM resource")
+    parser.add_argument("resource", help="Resource (output folder or archive) name")
+    parser.add_argument("definitions", help="JSON file with a list of ped definitions")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default=OUTPUT_FORMAT)
+    args = parser.parse_args()
+
+    setup_logging()
+    if not PED_NAME_PATTERN.match(args.resource):
+        parser.error("resource must be 1-64 letters, digits, '_' or '-'")
+    with open(args.definitions, "r", encoding="utf-8") as f:
+        definitions = json.load(f)
+    if not isinstance(definitions, list):
+        parser.error("definitions must be a JSON list of ped definitions")
+    try:
+        for definition in definitions:
+            validate_definition(definition)
+    except ValueError as e:
+        parser.error(str(e))
+    build_resource(args.resource, definitions, args.format)
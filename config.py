@@ -1,27 +1,175 @@
 # config.py
 import os
+import atexit
 import logging
 from logging import handlers
 
 
-# deleteting last log when starting
-with open ("logs/ped_creator.log", "w") as f:
-    f.write("")
+# Logging settings (level can be overridden with PED_CREATOR_LOG_LEVEL)
+LOG_FOLDER = "logs"
+LOG_FILE = os.path.join(LOG_FOLDER, "ped_creator.log")
+LOG_LEVEL = os.environ.get("PED_CREATOR_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,  # Set the logging level to DEBUG
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("logs/ped_creator.log"),
-        logging.StreamHandler()
-    ]
+_log_queue = None
+_log_listener = None
+
+
+def setup_logging(level=None):
+    """Route all logging through a queue drained by a background writer thread.
+
+    Must be called explicitly by entry points (importing config has no side
+    effects). Only the main process owns the log file. The returned queue can be
+    handed to worker processes, which forward their records with
+    setup_worker_logging. Calling this more than once is a no-op.
+    """
+    global _log_queue, _log_listener
+    if _log_listener is not None:
+        return _log_queue
+
+    import multiprocessing  # Only needed once logging is actually set up
+
+    os.makedirs(LOG_FOLDER, exist_ok=True)
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    file_handler = handlers.RotatingFileHandler(
+        LOG_FILE,
+        maxBytes=LOG_MAX_BYTES,
+        backupCount=LOG_BACKUP_COUNT,
+        encoding="utf-8",
+        delay=True
+    )
+    # Start every run with a fresh log, keeping the previous one as a backup
+    if os.path.exists(LOG_FILE) and os.path.getsize(LOG_FILE) > 0:
+        file_handler.doRollover()
+    file_handler.setFormatter(formatter)
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+
+    _log_queue = multiprocessing.Queue(-1)
+    _log_listener = handlers.QueueListener(_log_queue, file_handler, stream_handler, respect_handler_level=True)
+    _log_listener.start()
+    atexit.register(stop_logging)
+
+    _install_queue_handler(_log_queue, level)
+    return _log_queue
+
+
+def setup_worker_logging(log_queue, level=None):
+    """Forward a worker process' records to the main process (pool initializer)."""
+    _install_queue_handler(log_queue, level)
+
+
+def stop_logging():
+    """Flush pending records and stop the background writer."""
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+
+def get_log_queue():
+    """Return the queue worker processes should log to, if logging is set up."""
+    return _log_queue
+
+
+def _install_queue_handler(log_queue, level):
+    root = logging.getLogger()
+    # Replace anything a previous basicConfig left behind
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(handlers.QueueHandler(log_queue))
+    root.setLevel(level or LOG_LEVEL)
+
+    # Silence PIL's noisy debug logs
+    logging.getLogger('concurrent.futures').setLevel(logging.WARNING)
+    logging.getLogger('PIL').setLevel(logging.WARNING)
+    logging.getLogger('customtkinter').setLevel(logging.WARNING)
+
+
+# Build tracing (set PED_CREATOR_TRACE=1 to write a Chrome trace per build)
+TRACE_BUILDS = os.environ.get("PED_CREATOR_TRACE", "") == "1"
+TRACE_FOLDER = "traces"
+
+# Metrics snapshots (Prometheus text + JSON) are written here on demand and at exit
+METRICS_FOLDER = "metrics"
+
+# Built peds are written to output/<ped>, or to output/<ped>.<format> when
+# PED_CREATOR_OUTPUT_FORMAT is an archive format (zip, tar, tar.gz, tar.zst)
+TARGET_FOLDER = "output"
+OUTPUT_FORMAT = os.environ.get("PED_CREATOR_OUTPUT_FORMAT", "directory").lower()
+
+# Local build server (build_server.py); only ever listens on localhost
+BUILD_SERVER_HOST = "127.0.0.1"
+BUILD_SERVER_PORT = int(os.environ.get("PED_CREATOR_BUILD_PORT", "8765"))
+BUILD_WORKERS = int(os.environ.get("PED_CREATOR_BUILD_WORKERS", "2"))
+
+# Async copy pipeline: source reads in flight (network share) and local writes in flight
+ASYNC_READ_CONCURRENCY = int(os.environ.get("PED_CREATOR_READ_CONCURRENCY", "16"))
+ASYNC_WRITE_CONCURRENCY = int(os.environ.get("PED_CREATOR_WRITE_CONCURRENCY", "4"))
+
+# Builds are journaled in SQLite so an interrupted build can resume where it stopped
+USE_BUILD_JOURNAL = os.environ.get("PED_CREATOR_BUILD_JOURNAL", "1") == "1"
+BUILD_JOURNAL_PATH = os.path.join(TARGET_FOLDER, ".build_journal.sqlite3")
+# A running build of another process or host whose journal heartbeat is older than this
+# is treated as interrupted (builds refresh it while they write files)
+BUILD_HEARTBEAT_STALE_SECONDS = int(os.environ.get("PED_CREATOR_BUILD_HEARTBEAT_STALE", "300"))
+
+# Content-addressed asset store (set PED_CREATOR_ASSET_STORE=1 to link stream files
+# to shared blobs under output/.store instead of copying them into every ped)
+USE_ASSET_STORE = os.environ.get("PED_CREATOR_ASSET_STORE", "") == "1"
+ASSET_STORE_FOLDER = os.path.join(TARGET_FOLDER, ".store")
+
+# Stages every folder copy runs over the single read of its source (copy_pipeline.py),
+# e.g. "hash,verify". None by default, so copies stay in the kernel.
+COPY_STAGES = [name.strip() for name in os.environ.get("PED_CREATOR_COPY_STAGES", "").split(",") if name.strip()]
+
+# Preflight (preflight.py): directory listings in flight, and whether builds check the
+# selection first and refuse one that cannot produce a ped
+PREFLIGHT_WORKERS = int(os.environ.get("PED_CREATOR_PREFLIGHT_WORKERS", "16"))
+PREFLIGHT_BEFORE_BUILD = os.environ.get("PED_CREATOR_PREFLIGHT", "1") == "1"
+
+# Streaming-memory budget (budget.py): warn when a ped's stream files, one category
+# or a single file exceed these sizes in MiB. Clients hitch loading oversized peds.
+BUDGET_PED_MIB = float(os.environ.get("PED_CREATOR_BUDGET_PED_MIB", "64"))
+BUDGET_CATEGORY_MIB = float(os.environ.get("PED_CREATOR_BUDGET_CATEGORY_MIB", "24"))
+BUDGET_FILE_MIB = float(os.environ.get("PED_CREATOR_BUDGET_FILE_MIB", "16"))
+# Textures wider or taller than this many pixels are flagged (read from the .ytd headers)
+BUDGET_TEXTURE_MAX_SIZE = int(os.environ.get("PED_CREATOR_BUDGET_TEXTURE_SIZE", "2048"))
+BUDGET_TOP_FILES = 10
+
+# Parsed .ytd texture dictionaries (ytd.py), cached per file size and mtime
+TEXTURE_INDEX_PATH = os.path.join(TARGET_FOLDER, ".texture_index.json")
+
+# Preview PNGs generated from .ytd files (previews.py) for items without hand-made pics
+PREVIEW_MAX_SIZE = 256
+PREVIEW_WORKERS = int(os.environ.get("PED_CREATOR_PREVIEW_WORKERS", "0")) or None  # None: one per CPU
+
+# Perceptual hashes of preview PNGs (phash.py): previews at most PHASH_DISTANCE bits
+# apart (of 64) are reported as duplicates
+PHASH_INDEX_PATH = os.path.join(TARGET_FOLDER, ".phash_index.json")
+PHASH_DISTANCE = int(os.environ.get("PED_CREATOR_PHASH_DISTANCE", "6"))
+PHASH_WORKERS = int(os.environ.get("PED_CREATOR_PHASH_WORKERS", "0")) or None  # None: one per CPU
+
+# Precomputed GUI thumbnails (thumbnails.py): every (width, height, mode) the GUI shows.
+# "fit" keeps the aspect ratio like Image.thumbnail, "stretch" is a LANCZOS resize.
+THUMBNAIL_CACHE_FOLDER = os.path.join("cache", "thumbnails")
+THUMBNAIL_SIZES = (
+    (100, 100, "fit"),      # texture dropdowns and item previews
+    (75, 75, "fit"),        # selected texture grid
+    (65, 65, "fit"),
+    (50, 50, "fit"),        # texture picker preview
+    (140, 35, "stretch"),   # selected texture button
+    (100, 100, "stretch"),  # selected texture preview label
 )
 
-# Silence PIL's noisy debug logs
-logging.getLogger('concurrent.futures').setLevel(logging.WARNING)
-logging.getLogger('PIL').setLevel(logging.WARNING)
-logging.getLogger('customtkinter').setLevel(logging.WARNING)
+# GUI image cache: decoded images for the most recent views, plus encoded
+# thumbnails (a few KiB each) for thousands more, bounded by total bytes
+IMAGE_CACHE_HOT_ENTRIES = 100
+IMAGE_CACHE_WARM_MIB = float(os.environ.get("PED_CREATOR_IMAGE_CACHE_WARM_MIB", "64"))
 
 # Create your application logger
 logger = logging.getLogger(__name__)
@@ -0,0 +1,141 @@
+import os
+import errno
+import logging
+import threading
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Largest request handed to the kernel in one call
+KERNEL_CHUNK = 64 * 1024 * 1024
+# Size of the reusable buffer for the user-space fallback
+BUFFER_SIZE = 1024 * 1024
+
+METHODS = ("copy_file_range", "sendfile", "buffered")
+
+# Errors meaning "this copy method can't be used here", not "the copy failed"
+_UNSUPPORTED = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP,
+                errno.ENOTSOCK, errno.EBADF, errno.ETXTBSY}
+
+_COPIES = {method: REGISTRY.counter(f"fastcopy_{method}_total", f"Files copied with {method}")
+           for method in METHODS}
+_FALLBACKS = REGISTRY.counter("fastcopy_fallbacks_total", "Copy methods that were unsupported and fell through")
+
+# Methods the kernel rejected with ENOSYS are not tried again in this process
+_disabled = set()
+_local = threading.local()
+
+
+class _Unsupported(Exception):
+    pass
+
+
+def _buffer():
+    # One buffer per thread, reused by every buffered copy on it
+    buf = getattr(_local, "buffer", None)
+    if buf is None:
+        buf = _local.buffer = bytearray(BUFFER_SIZE)
+    return buf
+
+
+def _kernel_loop(call, src_fd, dst_fd, name, size):
+    copied = 0
+    while True:
+        try:
+            sent = call(src_fd, dst_fd)
+        except OSError as e:
+            if e.errno in _UNSUPPORTED and copied == 0:
+                if e.errno == errno.ENOSYS:
+                    _disabled.add(name)
+                raise _Unsupported(e) from e
+            raise
+        if sent == 0:
+            if copied == 0 and size > 0:
+                # Some file systems (procfs, FUSE, CIFS, overlay) report EOF instead of an error
+                raise _Unsupported(f"{name} copied nothing of {size} bytes")
+            return copied
+        copied += sent
+
+
+def _copy_file_range(src_fd, dst_fd, size):
+    return _kernel_loop(lambda s, d: os.copy_file_range(s, d, KERNEL_CHUNK), src_fd, dst_fd, "copy_file_range", size)
+
+
+def _sendfile(src_fd, dst_fd, size):
+    return _kernel_loop(lambda s, d: os.sendfile(d, s, None, KERNEL_CHUNK), src_fd, dst_fd, "sendfile", size)
+
+
+def _buffered(src_fd, dst_fd, size):
+    buf = _buffer()
+    view = memoryview(buf)
+    copied = 0
+    while True:
+        n = os.readv(src_fd, [buf]) if hasattr(os, "readv") else _readinto(src_fd, buf)
+        if n == 0:
+            return copied
+        written = 0
+        while written < n:
+            written += os.write(dst_fd, view[written:n])
+        copied += n
+
+
+def _readinto(fd, buf):
+    data = os.read(fd, len(buf))
+    buf[:len(data)] = data
+    return len(data)
+
+
+_IMPLEMENTATIONS = {
+    "copy_file_range": _copy_file_range,
+    "sendfile": _sendfile,
+    "buffered": _buffered,
+}
+
+
+def available_methods():
+    """Copy methods this platform offers, fastest first."""
+    methods = []
+    if hasattr(os, "copy_file_range"):
+        methods.append("copy_file_range")
+    if hasattr(os, "sendfile") and os.name == "posix":
+        methods.append("sendfile")
+    methods.append("buffered")
+    return [method for method in methods if method not in _disabled]
+
+
+def copy_file(src, dst, method=None, preallocate=True):
+    """Copy file contents from src to dst without permission bits or metadata.
+
+    Tries copy_file_range (in-kernel, and a reflink or server-side copy where
+    the file system supports one), then sendfile, then a buffered copy through
+    a reused 1 MiB buffer. The destination is preallocated to the source size
+    where posix_fallocate exists. Pass method to force one (benchmarks).
+    A kernel method that copies nothing of a non-empty file is treated as
+    unsupported, and a copy that stops short raises OSError.
+    Returns the number of bytes copied.
+    """
+    methods = [method] if method else available_methods()
+    with open(src, "rb", buffering=0) as fsrc, open(dst, "wb", buffering=0) as fdst:
+        src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+        size = os.fstat(src_fd).st_size
+        if preallocate and size and hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(dst_fd, 0, size)
+            except OSError as e:
+                logger.debug("Preallocation failed for %s: %s", dst, e)
+
+        for name in methods:
+            try:
+                copied = _IMPLEMENTATIONS[name](src_fd, dst_fd, size)
+            except _Unsupported as e:
+                logger.debug("%s unavailable for %s (%s)", name, src, e)
+                _FALLBACKS.inc()
+                continue
+            if copied < size:
+                if os.fstat(src_fd).st_size != copied:
+                    raise OSError(errno.EIO, f"Short copy of {src}: {copied} of {size} bytes")
+                # The source shrank while it was copied; drop the preallocated tail
+                os.ftruncate(dst_fd, copied)
+            _COPIES[name].inc()
+            return copied
+    raise OSError(errno.ENOTSUP, f"No copy method available for {src}")
@@ -1,21 +1,66 @@
 import os
-import shutil
+import copy
+import time
+import xml.etree.ElementTree as ET
 from config import *
 from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from metrics import REGISTRY
+from tracing import span, traced
+from asset_store import get_store
+from output_sinks import DirectorySink
+from listing_cache import dir_exists, listing_cache, path_exists
+from budget import budget_report, folder_files, plan_files
+
+FILES_COPIED = REGISTRY.counter("files_copied_total", "Asset files copied into ped resources")
+BYTES_COPIED = REGISTRY.counter("bytes_copied_total", "Asset bytes copied into ped resources")
+COPY_SECONDS = REGISTRY.histogram("file_copy_seconds", "Time to copy a single asset file")
+ITEM_FAILURES = REGISTRY.counter("item_failures_total", "Selected items that produced no files")
+TEXTURE_MISSES = REGISTRY.counter("texture_misses_total", "Selected textures whose .ytd was not found")
+MODEL_MISSES = REGISTRY.counter("model_misses_total", "Selected items whose model file was not found")
+COPY_RUNS = REGISTRY.counter("copy_runs_total", "copy_files runs started")
+COPY_RUN_FAILURES = REGISTRY.counter("copy_run_failures_total", "copy_files runs that failed")
+COPY_RUN_SECONDS = REGISTRY.histogram(
+    "copy_run_seconds", "Duration of a copy_files run",
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+)
+
+def _asset_span_args(asset_data):
+    return {"category": asset_data[0], "item": asset_data[1]}
 
-TARGET_FOLDER = "output"
 
 class FileHandler:
     @staticmethod
+    def _exists(path):
+        """Check a source path against the build's cached directory listings"""
+        return path_exists(path)
+
+    @staticmethod
+    def _dir_exists(path):
+        """Check a source folder, listing it once for the file checks that follow"""
+        return dir_exists(path)
+
+    @staticmethod
+    def _copy(src, sink, rel_path):
+        """Write a single file to the output sink, timed as a trace span"""
+        if sink.deferred:
+            # Only planning; the async pipeline does (and measures) the copy
+            sink.write_file(rel_path, src)
+            return
+        with span("copy", "io", src=src), COPY_SECONDS.time():
+            sink.write_file(rel_path, src)
+        FILES_COPIED.inc()
+        # Copy stages (copy_pipeline) already counted the bytes they read; no need to stat again
+        results = sink.stage_results.get(rel_path)
+        BYTES_COPIED.inc(results["bytes"] if results else os.path.getsize(src))
+
+    @staticmethod
+    @traced("FileHandler._process_head_asset", args=_asset_span_args)
     def _process_head_asset(asset_data):
         """Process assets for the head category."""
-        category, item, textures, final_target, ped_name, base_path, model_counts, texture_variants = asset_data
-        logger.debug(f"START PROCESSING - Category: {category}, Item: {item}")
-
-        temp_prefix = f"__temp_{ped_name}__"
-        temp_files = []
+        category, item, textures, sink, ped_name, base_path, model_counts, texture_variants = asset_data
+        logger.debug("START PROCESSING - Category: %s, Item: %s", category, item)
 
         try:
             # Special path for head textures
@@ -26,13 +71,13 @@ class FileHandler:
             success = False
 
             # Handle textures (only copy selected textures)
-            if texture_dir and texture_dir.exists():
-                logger.debug(f"FOUND TEXTURE DIR: {texture_dir}")
+            if texture_dir and FileHandler._dir_exists(texture_dir):
+                logger.debug("FOUND TEXTURE DIR: %s", texture_dir)
                 for texture in textures:  # Only process textures from the selected list
                     texture_file = texture.replace(".png", ".ytd")  # Convert .png to .ytd
                     texture_path = texture_dir / texture_file
 
-                    if texture_path.exists():
+                    if FileHandler._exists(texture_path):
                         # Determine the texture variant (a, b, c, etc.)
                         variant = chr(ord('a') + texture_variants.get((category, model_counts[category]), 0))
                         texture_variants[(category, model_counts[category])] = texture_variants.get((category, model_counts[category]), 0) + 1
@@ -40,35 +85,27 @@ class FileHandler:
                         # Texture final name for head
                         texture_final_name = f"{ped_name}^{CATEGORY_PREFIXES[category]}_diff_{model_counts[category]:03d}_{variant}_uni.ytd"
 
-                        texture_temp = Path(final_target) / f"{temp_prefix}{texture_final_name}"
-                        texture_final = Path(final_target) / texture_final_name
-
-                        logger.debug(f"COPYING: {texture_path} -> {texture_final}")
-                        shutil.copy(str(texture_path), str(texture_temp))
-                        os.rename(str(texture_temp), str(texture_final))
-                        temp_files.append(texture_temp)
+                        logger.debug("COPYING: %s -> %s", texture_path, texture_final_name)
+                        FileHandler._copy(str(texture_path), sink, f"stream/{texture_final_name}")
                         success = True
                     else:
-                        logger.debug(f"TEXTURE NOT FOUND: {texture_path}")
+                        logger.debug("TEXTURE NOT FOUND: %s", texture_path)
+                        TEXTURE_MISSES.inc()
             else:
-                logger.debug(f"NO TEXTURE DIR AT: {texture_dir}")
+                logger.debug("NO TEXTURE DIR AT: %s", texture_dir)
 
             # Handle model (rename to match ped_name and category prefix)
             category_prefix = CATEGORY_PREFIXES.get(category, category)  # Get prefix from CATEGORY_PREFIXES
             model_file = f"{ped_name}^{category_prefix}_{model_counts[category]:03d}_r.ydd"  # Example: ig_test^head_000_u.ydd
             model_path = model_dir / f"head_{int(item):03d}_r.ydd"  # Original model file path for head
 
-            if model_path.exists():
-                model_temp = Path(final_target) / f"{temp_prefix}{model_file}"
-                model_final = Path(final_target) / model_file
-
-                logger.debug(f"COPYING: {model_path} -> {model_final}")
-                shutil.copy(str(model_path), str(model_temp))
-                os.rename(str(model_temp), str(model_final))
-                temp_files.append(model_temp)
+            if FileHandler._exists(model_path):
+                logger.debug("COPYING: %s -> %s", model_path, model_file)
+                FileHandler._copy(str(model_path), sink, f"stream/{model_file}")
                 success = True
             else:
-                logger.debug(f"NO MODEL AT: {model_path}")
+                logger.debug("NO MODEL AT: %s", model_path)
+                MODEL_MISSES.inc()
 
             # Increment the model count for this category
             model_counts[category] += 1
@@ -77,22 +114,14 @@ class FileHandler:
 
         except Exception as e:
             logger.error(f"ERROR in {category}/{item}: {str(e)}")
-            for f in temp_files:
-                try:
-                    if os.path.exists(f):
-                        os.remove(f)
-                except Exception as cleanup_error:
-                    logger.error(f"Cleanup failed for {f}: {cleanup_error}")
             return False
 
     @staticmethod
+    @traced("FileHandler._process_body_asset", args=_asset_span_args)
     def _process_body_asset(asset_data):
         """Process assets for the body category."""
-        category, item, textures, final_target, ped_name, base_path, model_counts, texture_variants = asset_data
-        logger.debug(f"START PROCESSING - Category: {category}, Item: {item}")
-
-        temp_prefix = f"__temp_{ped_name}__"
-        temp_files = []
+        category, item, textures, sink, ped_name, base_path, model_counts, texture_variants = asset_data
+        logger.debug("START PROCESSING - Category: %s, Item: %s", category, item)
 
         try:
             # Special path for body textures
@@ -103,13 +132,13 @@ class FileHandler:
             success = False
 
             # Handle textures (only copy selected textures)
-            if texture_dir and texture_dir.exists():
-                logger.debug(f"FOUND TEXTURE DIR: {texture_dir}")
+            if texture_dir and FileHandler._dir_exists(texture_dir):
+                logger.debug("FOUND TEXTURE DIR: %s", texture_dir)
                 for texture in textures:  # Only process textures from the selected list
                     texture_file = texture.replace(".png", ".ytd")  # Convert .png to .ytd
                     texture_path = texture_dir / texture_file
 
-                    if texture_path.exists():
+                    if FileHandler._exists(texture_path):
                         # Determine the texture variant (a, b, c, etc.)
                         variant = chr(ord('a') + texture_variants.get((category, model_counts[category]), 0))
                         texture_variants[(category, model_counts[category])] = texture_variants.get((category, model_counts[category]), 0) + 1
@@ -117,35 +146,27 @@ class FileHandler:
                         # Texture final name for body
                         texture_final_name = f"{ped_name}^{CATEGORY_PREFIXES[category]}_diff_{model_counts[category]:03d}_{variant}_whi.ytd"
 
-                        texture_temp = Path(final_target) / f"{temp_prefix}{texture_final_name}"
-                        texture_final = Path(final_target) / texture_final_name
-
-                        logger.debug(f"COPYING: {texture_path} -> {texture_final}")
-                        shutil.copy(str(texture_path), str(texture_temp))
-                        os.rename(str(texture_temp), str(texture_final))
-                        temp_files.append(texture_temp)
+                        logger.debug("COPYING: %s -> %s", texture_path, texture_final_name)
+                        FileHandler._copy(str(texture_path), sink, f"stream/{texture_final_name}")
                         success = True
                     else:
-                        logger.debug(f"TEXTURE NOT FOUND: {texture_path}")
+                        logger.debug("TEXTURE NOT FOUND: %s", texture_path)
+                        TEXTURE_MISSES.inc()
             else:
-                logger.debug(f"NO TEXTURE DIR AT: {texture_dir}")
+                logger.debug("NO TEXTURE DIR AT: %s", texture_dir)
 
             # Handle model (rename to match ped_name and category prefix)
             category_prefix = CATEGORY_PREFIXES.get(category, category)  # Get prefix from CATEGORY_PREFIXES
             model_file = f"{ped_name}^{category_prefix}_{model_counts[category]:03d}_r.ydd"  # Example: ig_test^body_001_u.ydd
             model_path = model_dir / f"body_{int(item):03d}_r.ydd"  # Original model file path for body
 
-            if model_path.exists():
-                model_temp = Path(final_target) / f"{temp_prefix}{model_file}"
-                model_final = Path(final_target) / model_file
-
-                logger.debug(f"COPYING: {model_path} -> {model_final}")
-                shutil.copy(str(model_path), str(model_temp))
-                os.rename(str(model_temp), str(model_final))
-                temp_files.append(model_temp)
+            if FileHandler._exists(model_path):
+                logger.debug("COPYING: %s -> %s", model_path, model_file)
+                FileHandler._copy(str(model_path), sink, f"stream/{model_file}")
                 success = True
             else:
-                logger.debug(f"NO MODEL AT: {model_path}")
+                logger.debug("NO MODEL AT: %s", model_path)
+                MODEL_MISSES.inc()
 
             # Increment the model count for this category
             model_counts[category] += 1
@@ -154,21 +175,14 @@ class FileHandler:
 
         except Exception as e:
             logger.error(f"ERROR in {category}/{item}: {str(e)}")
-            for f in temp_files:
-                try:
-                    if os.path.exists(f):
-                        os.remove(f)
-                except Exception as cleanup_error:
-                    logger.error(f"Cleanup failed for {f}: {cleanup_error}")
             return False
-        
+
     @staticmethod
+    @traced("FileHandler._process_single_asset", args=_asset_span_args)
     def _process_single_asset(asset_data):
-        category, item, textures, final_target, ped_name, base_path, model_counts, texture_variants = asset_data
-        logger.debug(f"START PROCESSING - Category: {category}, Item: {item}")
+        category, item, textures, sink, ped_name, base_path, model_counts, texture_variants = asset_data
+        logger.debug("START PROCESSING - Category: %s, Item: %s", category, item)
         
-        temp_prefix = f"__temp_{ped_name}__"
-        temp_files = []
         if category == "head":
             return FileHandler._process_head_asset(asset_data)
         elif category == "body":
@@ -182,13 +196,13 @@ class FileHandler:
                 success = False
                 
                 # Handle textures (only copy selected textures)
-                if texture_dir.exists():
-                    logger.debug(f"FOUND TEXTURE DIR: {texture_dir}")
+                if FileHandler._dir_exists(texture_dir):
+                    logger.debug("FOUND TEXTURE DIR: %s", texture_dir)
                     for texture in textures:  # Only process textures from the selected list
                         texture_file = texture.replace(".png", ".ytd")  # Convert .png to .ytd
                         texture_path = texture_dir / texture_file
                         
-                        if texture_path.exists():
+                        if FileHandler._exists(texture_path):
                             # Determine the texture variant (a, b, c, etc.)
                             variant = chr(ord('a') + texture_variants.get((category, model_counts[category]), 0))
                             texture_variants[(category, model_counts[category])] = texture_variants.get((category, model_counts[category]), 0) + 1
@@ -199,18 +213,14 @@ class FileHandler:
                             else:
                                 texture_final_name = f"{ped_name}^{CATEGORY_PREFIXES[category]}_diff_{model_counts[category]:03d}_{variant}_uni.ytd"
                             
-                            texture_temp = Path(final_target) / f"{temp_prefix}{texture_final_name}"
-                            texture_final = Path(final_target) / texture_final_name
-                            
-                            logger.debug(f"COPYING: {texture_path} -> {texture_final}")
-                            shutil.copy(str(texture_path), str(texture_temp))
-                            os.rename(str(texture_temp), str(texture_final))
-                            temp_files.append(texture_temp)
+                            logger.debug("COPYING: %s -> %s", texture_path, texture_final_name)
+                            FileHandler._copy(str(texture_path), sink, f"stream/{texture_final_name}")
                             success = True
                         else:
-                            logger.debug(f"TEXTURE NOT FOUND: {texture_path}")
+                            logger.debug("TEXTURE NOT FOUND: %s", texture_path)
+                            TEXTURE_MISSES.inc()
                 else:
-                    logger.debug(f"NO TEXTURE DIR AT: {texture_dir}")
+                    logger.debug("NO TEXTURE DIR AT: %s", texture_dir)
                 
                 # Handle model (rename to match ped_name and category prefix)
                 category_prefix = CATEGORY_PREFIXES.get(category, category)  # Get prefix from CATEGORY_PREFIXES
@@ -221,17 +231,13 @@ class FileHandler:
                     model_file = f"{ped_name}^{category_prefix}_{model_counts[category]:03d}_u.ydd"  # Example: ig_test^accs_001_u.ydd
                     model_path = model_dir / f"{category_prefix}_{int(item):03d}_u.ydd"  # Original model file path
 
-                if model_path.exists():
-                    model_temp = Path(final_target) / f"{temp_prefix}{model_file}"
-                    model_final = Path(final_target) / model_file
-                    
-                    logger.debug(f"COPYING: {model_path} -> {model_final}")
-                    shutil.copy(str(model_path), str(model_temp))
-                    os.rename(str(model_temp), str(model_final))
-                    temp_files.append(model_temp)
+                if FileHandler._exists(model_path):
+                    logger.debug("COPYING: %s -> %s", model_path, model_file)
+                    FileHandler._copy(str(model_path), sink, f"stream/{model_file}")
                     success = True
                 else:
-                    logger.debug(f"NO MODEL AT: {model_path}")
+                    logger.debug("NO MODEL AT: %s", model_path)
+                    MODEL_MISSES.inc()
                 
                 # Increment the model count for this category
                 model_counts[category] += 1
@@ -240,26 +246,30 @@ class FileHandler:
 
             except Exception as e:
                 logger.error(f"ERROR in {category}/{item}: {str(e)}")
-                for f in temp_files:
-                    try:
-                        if os.path.exists(f):
-                            os.remove(f)
-                    except Exception as cleanup_error:
-                        logger.error(f"Cleanup failed for {f}: {cleanup_error}")
                 return False
 
     @staticmethod
-    def copy_files(selected_options, ped_name, base_path, progress_callback=None):
+    @traced("FileHandler.copy_files", args=lambda selected_options, ped_name, base_path, *a, **kw: {"ped": ped_name, "base_path": base_path})
+    def copy_files(selected_options, ped_name, base_path, progress_callback=None, sink=None):
+        """Copy the selected assets and meta files of a ped into an output sink.
+
+        Without a sink the ped is staged and published to output/<ped_name> in
+        one rename, or discarded if the run fails. A caller-provided sink is
+        left for the caller to commit or abort.
+        """
         logger.debug(f"STARTING PROCESS FOR: {ped_name}")
         logger.debug(f"FROM: {base_path}")
         
-        final_target = Path("output") / ped_name / "stream"
-        os.makedirs(final_target, exist_ok=True)
-        final_target.mkdir(parents=True, exist_ok=True)
-        logger.debug(f"TO: {final_target}")
+        owns_sink = sink is None
+        if owns_sink:
+            sink = DirectorySink(Path(TARGET_FOLDER) / ped_name)
+        logger.debug(f"TO: {sink.__class__.__name__}")
+        COPY_RUNS.inc()
+        run_started = time.perf_counter()
         
         try:
             success_count = 0
+            processed_count = 0
             total_items = sum(len(items) for category, items in selected_options.items() 
                             if not category.endswith('_textures') and category != 'name')
 
@@ -267,87 +277,158 @@ class FileHandler:
             model_counts = defaultdict(lambda: 0)
             texture_variants = defaultdict(int)
 
-            # Sort categories and items for consistent processing
-            sorted_categories = sorted(selected_options.keys())
-            for category in sorted_categories:
-                if category.endswith('_textures') or category == 'name':
-                    continue
-
-                logger.debug(f"PROCESSING CATEGORY: {category}")
-                texture_category = f"{category}_textures"
-                textures = selected_options.get(texture_category, {})
-
-                # Sort items for consistent processing
-                sorted_items = sorted(selected_options[category], key=lambda x: int(x))  # Sort items as integers
-                for item in sorted_items:
-                    task_data = (
-                        category,
-                        item,
-                        textures.get(str(item), []),
-                        str(final_target),
-                        ped_name,
-                        base_path,
-                        model_counts,  # Pass model_counts to _process_single_asset
-                        texture_variants  # Pass texture_variants to _process_single_asset
-                    )
+            # Resolve source paths from one directory listing per folder instead of a probe per file
+            with listing_cache():
+                # Sort categories and items for consistent processing
+                sorted_categories = sorted(selected_options.keys())
+                for category in sorted_categories:
+                    if category.endswith('_textures') or category == 'name':
+                        continue
+
+                    logger.debug("PROCESSING CATEGORY: %s", category)
+                    texture_category = f"{category}_textures"
+                    textures = selected_options.get(texture_category, {})
+
+                    # Sort items for consistent processing
+                    sorted_items = sorted(selected_options[category], key=lambda x: int(x))  # Sort items as integers
+                    for item in sorted_items:
+                        task_data = (
+                            category,
+                            item,
+                            textures.get(str(item), []),
+                            sink,
+                            ped_name,
+                            base_path,
+                            model_counts,  # Pass model_counts to _process_single_asset
+                            texture_variants  # Pass texture_variants to _process_single_asset
+                        )
                     
-                    if FileHandler._process_single_asset(task_data):
-                        success_count += 1
-                        logger.debug(f"SUCCESS - {category}/{item}")
-                    else:
-                        logger.debug(f"FAILED - {category}/{item}")
+                        if FileHandler._process_single_asset(task_data):
+                            success_count += 1
+                            logger.debug("SUCCESS - %s/%s", category, item)
+                        else:
+                            logger.debug("FAILED - %s/%s", category, item)
+                            ITEM_FAILURES.inc()
+
+                        processed_count += 1
+                        if progress_callback:
+                            progress_callback(processed_count / total_items, f"{category}/{item}")
 
             if success_count == 0:
                 raise RuntimeError("No valid items processed")
 
             # Call the method to copy meta files
-            FileHandler._copy_meta_files(ped_name)
+            FileHandler._copy_meta_files(ped_name, sink)
 
+            if owns_sink:
+                sink.commit()
             logger.info(f"COMPLETED: {success_count} items processed")
             return True
 
         except Exception as e:
+            COPY_RUN_FAILURES.inc()
             logger.critical(f"CRITICAL ERROR: {str(e)}")
-            if final_target.exists():
-                shutil.rmtree(str(final_target))
+            if owns_sink:
+                sink.abort()
             raise
 
+        finally:
+            COPY_RUN_SECONDS.observe(time.perf_counter() - run_started)
+            if USE_ASSET_STORE:
+                get_store().save_index()
+
     @staticmethod
-    def _copy_meta_files(ped_name):
-        """Copy required meta files to target directory"""
+    @traced("FileHandler._copy_meta_files")
+    def _copy_meta_files(ped_name, sink):
+        """Copy required meta files into the output sink"""
         meta_files = {
-            "peds.meta": os.path.join(TARGET_FOLDER, ped_name),
-            "fxmanifest.lua": os.path.join(TARGET_FOLDER, ped_name),
-            "ped.yft": os.path.join(TARGET_FOLDER, ped_name, "stream")
+            "peds.meta": "",
+            "fxmanifest.lua": "",
+            "ped.yft": "stream/"
         }
         
         for meta_file, target_dir in meta_files.items():
             src = os.path.join(os.path.dirname(__file__),"needed" ,meta_file)
-            logger.debug(f"Checking source path: {src}")
+            logger.debug("Checking source path: %s", src)
             
             if os.path.exists(src):
-                os.makedirs(target_dir, exist_ok=True)
-                logger.debug(f"Directory created: {target_dir}")
-                
                 if meta_file == "peds.meta":
                     # Handle peds.meta template
                     with open(src, 'r') as file:
                         content = file.read()
                     modified_content = content.replace('ig_ped_name', ped_name)
-                    target_path = os.path.join(target_dir, meta_file)
-                    with open(target_path, 'w') as file:
-                        file.write(modified_content)
+                    sink.write_bytes(f"{target_dir}{meta_file}", modified_content)
                     logger.info(f"Copied and modified meta file: {meta_file}")
                     
                 elif meta_file == "ped.yft":
                     # Rename YFT file to match ped name
-                    target_path = os.path.join(target_dir, f"{ped_name}.yft")
-                    shutil.copy(src, target_path)
+                    sink.write_file(f"{target_dir}{ped_name}.yft", src)
                     logger.info(f"Copied and renamed YFT file to: {ped_name}.yft")
                     
                 else:
                     # Regular file copy for other files
-                    shutil.copy(src, os.path.join(target_dir, meta_file))
+                    sink.write_file(f"{target_dir}{meta_file}", src)
                     logger.info(f"Copied meta file: {meta_file}")
             else:
-                logger.error(f"Source file not found: {src}")
\ No newline at end of file
+                logger.error(f"Source file not found: {src}")
+
+    @staticmethod
+    def budget_report(ped_name, sink):
+        """Streaming-memory budget of what copy_files planned or wrote into sink"""
+        sink = getattr(sink, "sink", sink)  # JournaledSink
+        if hasattr(sink, "ops"):  # PlanningSink
+            files = plan_files(sink)
+        elif hasattr(sink, "files"):  # MemorySink
+            files = ((rel_path, len(data), None) for rel_path, data in sink.files.items())
+        elif hasattr(sink, "root"):  # DirectorySink, published or still staged
+            files = folder_files(sink.root if sink.closed else sink.staging)
+        else:
+            raise TypeError(f"Cannot size the files of a {sink.__class__.__name__}")
+        return budget_report(ped_name, files)
+
+    @staticmethod
+    def render_peds_meta(ped_names):
+        """Render one peds.meta holding an entry for every ped in ped_names.
+
+        Every template Item that mentions ig_ped_name is repeated once per ped
+        with the name filled in. Returns None if the template is missing.
+        """
+        src = os.path.join(os.path.dirname(__file__), "needed", "peds.meta")
+        if not os.path.exists(src):
+            logger.error(f"Source file not found: {src}")
+            return None
+
+        root = ET.parse(src).getroot()
+        for parent, item in list(FileHandler._ped_items(root)):
+            index = list(parent).index(item)
+            parent.remove(item)
+            for offset, ped_name in enumerate(ped_names):
+                parent.insert(index + offset, FileHandler._rename_ped(copy.deepcopy(item), ped_name))
+        ET.indent(root)
+        return '<?xml version="1.0" encoding="UTF-8"?>\n' + ET.tostring(root, encoding="unicode") + "\n"
+
+    @staticmethod
+    def _ped_items(element):
+        # Outermost <Item> elements that belong to the template ped
+        for child in element:
+            if child.tag == "Item" and FileHandler._mentions_ped(child):
+                yield element, child
+            else:
+                yield from FileHandler._ped_items(child)
+
+    @staticmethod
+    def _mentions_ped(element):
+        return any("ig_ped_name" in (node.text or "") or "ig_ped_name" in (node.tail or "")
+                   or any("ig_ped_name" in value for value in node.attrib.values())
+                   for node in element.iter())
+
+    @staticmethod
+    def _rename_ped(element, ped_name):
+        for node in element.iter():
+            if node.text:
+                node.text = node.text.replace("ig_ped_name", ped_name)
+            if node.tail:
+                node.tail = node.tail.replace("ig_ped_name", ped_name)
+            for key, value in node.attrib.items():
+                node.set(key, value.replace("ig_ped_name", ped_name))
+        return element
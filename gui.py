@@ -2,9 +2,7 @@ from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
 from tkinter import ttk, messagebox
 from functools import partial
-from ymt import generate_xml
 import customtkinter as ctk
-from PIL import Image
 from config import *
 import tkinter as tk
 import threading
@@ -177,8 +175,12 @@ class ImageDropdown(ctk.CTkFrame):
     def set_button_image(self, texture):
         try:
             if texture:
+                from PIL import Image  # Imported lazily to keep startup fast
+                from thumbnails import cached_thumbnail
+
                 image_path = os.path.join(self.images_path, texture)
-                image = Image.open(image_path)
+                # Precomputed thumbnails already have the right size, so the resize is a copy
+                image = Image.open(cached_thumbnail(image_path, (140, 35), "stretch") or image_path)
                 
                 # Use high-quality resizing
                 image = image.resize((140, 35), Image.Resampling.LANCZOS)  # Fixed size
@@ -189,7 +191,7 @@ class ImageDropdown(ctk.CTkFrame):
                 
                 # Update preview label with high-quality image
                 if self.preview_label:
-                    preview_image = Image.open(image_path)
+                    preview_image = Image.open(cached_thumbnail(image_path, (100, 100), "stretch") or image_path)
                     preview_image = preview_image.resize((100, 100), Image.Resampling.LANCZOS)  # Fixed size
                     preview_photo = ctk.CTkImage(preview_image, size=(100, 100))
                     self.preview_label.configure(image=preview_photo, text="")
@@ -284,40 +286,92 @@ import queue
 import logging
 import uuid
 import time
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
-from PIL import Image
 import customtkinter as ctk
 
 logger = logging.getLogger(__name__)
 
+from metrics import REGISTRY
+
+IMAGE_CACHE_HITS = REGISTRY.counter("image_cache_hits_total", "Image cache lookups served from memory")
+IMAGE_CACHE_MISSES = REGISTRY.counter("image_cache_misses_total", "Image cache lookups that had to load from disk")
+IMAGE_CACHE_EVICTIONS = REGISTRY.counter("image_cache_evictions_total", "Images evicted from the cache")
+IMAGE_CACHE_ENTRIES = REGISTRY.gauge("image_cache_entries", "Images currently held in all caches")
+IMAGE_CACHE_WARM_HITS = REGISTRY.counter("image_cache_warm_hits_total", "Image cache lookups decoded from the warm tier")
+IMAGE_CACHE_WARM_BYTES = REGISTRY.gauge("image_cache_warm_bytes", "Encoded thumbnail bytes held in the warm tier")
+IMAGE_LOADS = REGISTRY.counter("image_loads_total", "Images decoded by the async loader")
+IMAGE_LOAD_FAILURES = REGISTRY.counter("image_load_failures_total", "Images the async loader failed to decode")
+IMAGE_LOAD_SECONDS = REGISTRY.histogram("image_load_seconds", "Time to open and thumbnail one image")
+IMAGE_LOADER_DROPPED = REGISTRY.counter("image_loader_dropped_tasks_total", "Load requests dropped because too many were active")
+
 class ImageCache:
-    """Simple image cache implementation"""
-    def __init__(self, max_size=100):
-        self.cache = {}
+    """Two-tier image cache.
+
+    The hot tier holds decoded CTkImages for the most recently used paths. The
+    warm tier holds the encoded thumbnail bytes of many more, bounded by total
+    size; a warm hit is decoded (a small PNG, well under a millisecond) and
+    promoted to the hot tier instead of going back to disk. Both tiers are LRU.
+    """
+    def __init__(self, max_size=IMAGE_CACHE_HOT_ENTRIES, warm_bytes=int(IMAGE_CACHE_WARM_MIB * 1024 * 1024)):
+        self.cache = OrderedDict()
+        self.warm = OrderedDict()
         self.max_size = max_size
+        self.warm_bytes = warm_bytes
+        self.warm_size = 0
         self.lock = threading.Lock()
         self.categories = {}  # Map of category -> set of paths
         
     def get(self, image_path):
         with self.lock:
-            return self.cache.get(image_path)
+            image = self.cache.get(image_path)
+            if image is not None:
+                self.cache.move_to_end(image_path)
+                IMAGE_CACHE_HITS.inc()
+                return image
+            data = self.warm.get(image_path)
+            if data is not None:
+                self.warm.move_to_end(image_path)
+
+        if data is None:
+            IMAGE_CACHE_MISSES.inc()
+            return None
+        IMAGE_CACHE_WARM_HITS.inc()
+        image = decode_thumbnail(data)
+        self.put(image_path, image)
+        return image
     
-    def put(self, image_path, image, category=None):
+    def put(self, image_path, image, category=None, encoded=None):
         with self.lock:
-            # Enforce size limit with simple LRU-like eviction
-            if len(self.cache) >= self.max_size:
-                # Remove oldest item (first added)
-                if self.cache:
-                    oldest = next(iter(self.cache))
-                    del self.cache[oldest]
-            
+            if image_path in self.cache:
+                self.cache.move_to_end(image_path)
+            else:
+                # Evict the least recently used image; its bytes stay in the warm tier
+                while len(self.cache) >= self.max_size and self.cache:
+                    self.cache.popitem(last=False)
+                    IMAGE_CACHE_EVICTIONS.inc()
+                    IMAGE_CACHE_ENTRIES.dec()
+                IMAGE_CACHE_ENTRIES.inc()
             self.cache[image_path] = image
+
+            if encoded is not None and len(encoded) <= self.warm_bytes:
+                self._drop_warm(image_path)
+                self.warm[image_path] = encoded
+                self.warm_size += len(encoded)
+                while self.warm_size > self.warm_bytes:
+                    self._drop_warm(next(iter(self.warm)))
+                IMAGE_CACHE_WARM_BYTES.set(self.warm_size)
             
             # Track by category if provided
             if category:
                 if category not in self.categories:
                     self.categories[category] = set()
                 self.categories[category].add(image_path)
+
+    def _drop_warm(self, image_path):
+        data = self.warm.pop(image_path, None)
+        if data is not None:
+            self.warm_size -= len(data)
     
     def remove_category(self, category):
         with self.lock:
@@ -326,9 +380,36 @@ class ImageCache:
                 for path in self.categories[category]:
                     if path in self.cache:
                         del self.cache[path]
+                        IMAGE_CACHE_ENTRIES.dec()
+                    self._drop_warm(path)
+                IMAGE_CACHE_WARM_BYTES.set(self.warm_size)
                 # Clear category tracking
                 del self.categories[category]
 
+
+def fits_within(image_path, size):
+    """Whether a PNG is no larger than size, from its header alone"""
+    from png_probe import probe
+    info = probe(image_path)
+    return info is not None and info["width"] <= size[0] and info["height"] <= size[1]
+
+
+def encode_thumbnail(image):
+    """PNG bytes of a thumbnail for the warm cache tier (fast compression, lossless)"""
+    import io
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+def decode_thumbnail(data):
+    """CTkImage from warm-tier bytes"""
+    import io
+    from PIL import Image
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return ctk.CTkImage(image, size=image.size)
+
 class AsyncImageLoader:
     """Thread-safe image loader with lifecycle management"""
     _instances = {}  # Track instances by parent
@@ -502,6 +583,7 @@ class AsyncImageLoader:
         with self._lock:
             if len(self.active_tasks) >= self.max_concurrent_tasks:
                 logger.warning(f"Too many active tasks ({len(self.active_tasks)}), dropping: {image_path}")
+                IMAGE_LOADER_DROPPED.inc()
                 return None
             self.active_tasks.add(task_id)
         
@@ -537,16 +619,34 @@ class AsyncImageLoader:
             return
             
         try:
-            # Attempt to load image
-            image = Image.open(image_path)
-            if size:
-                image.thumbnail(size)
-            
-            # Convert to CTkImage
-            photo = ctk.CTkImage(image, size=image.size)
+            import io
+            from PIL import Image  # Imported lazily to keep startup fast
+            from thumbnails import cached_thumbnail
+
+            with IMAGE_LOAD_SECONDS.time():
+                # Prefer a precomputed thumbnail (thumbnails.py) over decoding the full PNG
+                thumbnail_path = size and cached_thumbnail(image_path, size)
+                if thumbnail_path:
+                    with open(thumbnail_path, "rb") as f:
+                        encoded = f.read()
+                    image = Image.open(io.BytesIO(encoded))
+                elif size and fits_within(image_path, size):
+                    # Already thumbnail-sized (known from the PNG header): keep the file's own bytes
+                    with open(image_path, "rb") as f:
+                        encoded = f.read()
+                    image = Image.open(io.BytesIO(encoded))
+                else:
+                    image = Image.open(image_path)
+                    if size:
+                        image.thumbnail(size)
+                    encoded = encode_thumbnail(image) if size else None
+
+                # Convert to CTkImage
+                photo = ctk.CTkImage(image, size=image.size)
+            IMAGE_LOADS.inc()
             
-            # Cache the image
-            self.image_cache.put(image_path, photo)
+            # Cache the image, and its encoded bytes for the warm tier
+            self.image_cache.put(image_path, photo, encoded=encoded)
             
             # Ensure parent widget still exists
             if not self.parent.winfo_exists():
@@ -556,6 +656,7 @@ class AsyncImageLoader:
             self.parent.after(0, lambda: callback(photo))
             
         except Exception as e:
+            IMAGE_LOAD_FAILURES.inc()
             logger.exception(f"Image load failed: {str(e)}")
             # Execute callback with None to indicate failure
             if self.parent.winfo_exists():
@@ -578,6 +679,13 @@ class AsyncImageLoader:
                 del self._instances[parent_id]
                 break
 
+REGISTRY.gauge("image_loader_queue_depth", "Image load requests waiting in all loader queues").set_function(
+    lambda: sum(loader.load_queue.qsize() for loader in list(AsyncImageLoader._instances.values()))
+)
+REGISTRY.gauge("image_loader_active_tasks", "Image load requests in flight in all loaders").set_function(
+    lambda: sum(len(loader.active_tasks) for loader in list(AsyncImageLoader._instances.values()))
+)
+
 class CategoryView(ctk.CTkFrame):
     def __init__(self, parent, category: str, base_path: str, update_callback, get_preview_image, main_app,**kwargs):
         super().__init__(parent, **kwargs)
@@ -597,7 +705,55 @@ class CategoryView(ctk.CTkFrame):
         self.texture_displays = {}
         self.item_textures = self._load_initial_state(category)
 
-        
+        # Bulk selection toolbar
+        self.bulk_frame = ctk.CTkFrame(self)
+        self.bulk_frame.pack(fill='x', padx=10, pady=(10, 0))
+
+        self.select_all_button = ctk.CTkButton(
+            self.bulk_frame,
+            text="Select All",
+            width=90,
+            command=self.select_all_items,
+            fg_color=PURPLE,
+            hover_color=HOVER_PURPLE
+        )
+        self.select_all_button.pack(side='left', padx=5, pady=5)
+
+        self.clear_all_button = ctk.CTkButton(
+            self.bulk_frame,
+            text="Clear All",
+            width=90,
+            command=self.deselect_all_items,
+            fg_color=PURPLE,
+            hover_color=HOVER_PURPLE
+        )
+        self.clear_all_button.pack(side='left', padx=5, pady=5)
+
+        self.range_start_entry = ctk.CTkEntry(self.bulk_frame, width=60, placeholder_text="From")
+        self.range_start_entry.pack(side='left', padx=(15, 2), pady=5)
+        self.range_end_entry = ctk.CTkEntry(self.bulk_frame, width=60, placeholder_text="To")
+        self.range_end_entry.pack(side='left', padx=2, pady=5)
+
+        self.select_range_button = ctk.CTkButton(
+            self.bulk_frame,
+            text="Select Range",
+            width=100,
+            command=self.select_item_range_from_entries,
+            fg_color=PURPLE,
+            hover_color=HOVER_PURPLE
+        )
+        self.select_range_button.pack(side='left', padx=5, pady=5)
+
+        self.all_textures_button = ctk.CTkButton(
+            self.bulk_frame,
+            text="All Textures",
+            width=100,
+            command=self.select_all_textures,
+            fg_color=PURPLE,
+            hover_color=HOVER_PURPLE
+        )
+        self.all_textures_button.pack(side='right', padx=5, pady=5)
+
         # Create scrollable frame for items
         self.scrollable_frame = ctk.CTkScrollableFrame(self)
         self.scrollable_frame.pack(expand=True, fill='both', padx=10, pady=10)
@@ -813,7 +969,7 @@ class CategoryView(ctk.CTkFrame):
 
     def update_texture_display(self, item_name: str):
         """Update texture display with exact sizes, wrapping, and state verification"""
-        logger.info(f"Updating texture display for {item_name} in {self.category}")
+        logger.debug("Updating texture display for %s in %s", item_name, self.category)
         
         # Validate widget existence
         if item_name not in self.texture_displays or not self.texture_displays[item_name].winfo_exists():
@@ -825,11 +981,11 @@ class CategoryView(ctk.CTkFrame):
         # Always use ground truth from main app
         texture_category = f"{self.category}_textures"
         current_textures = self.main_app.updated_dictionary.get(texture_category, {}).get(item_name, [])
-        logger.info(f"Current verified textures for {item_name}: {current_textures}")
+        logger.debug("Current verified textures for %s: %s", item_name, current_textures)
 
         # Nuclear clear of existing widgets
         for widget in display_frame.winfo_children():
-            logger.info(f"Destroying widget: {type(widget).__name__}")
+            logger.debug("Destroying widget: %s", type(widget).__name__)
             widget.destroy()
 
         if not current_textures:
@@ -843,7 +999,7 @@ class CategoryView(ctk.CTkFrame):
         size = size_map.get(num_textures, 65)
         items_per_row = min(num_textures, 4 if size == 65 else num_textures)
         
-        logger.info(f"Rendering {num_textures} texture(s) at {size}px")
+        logger.debug("Rendering %d texture(s) at %dpx", num_textures, size)
 
         # Grid layout rebuild
         row = col = 0
@@ -877,7 +1033,7 @@ class CategoryView(ctk.CTkFrame):
             
             col += 1
 
-        logger.info(f"Texture display updated for {item_name}")
+        logger.debug("Texture display updated for %s", item_name)
 
     def update_texture_with_preview(self, item_name: str, texture: str, preview_label: ctk.CTkLabel):
         """Update texture and show preview"""
@@ -917,15 +1073,71 @@ class CategoryView(ctk.CTkFrame):
     def _save_current_state(self):
         """Persist current selections to main app's state"""
         texture_category = f"{self.category}_textures"
-        logger.info(f"Saving state for {texture_category}: {self.item_textures}")
+        logger.debug("Saving state for %s: %s", texture_category, self.item_textures)
         # Update main app's dictionary with deep copy
         self.main_app.updated_dictionary[texture_category] = {
             item: textures.copy() 
             for item, textures in self.item_textures.items()
             if textures
         }
-        logger.info(f"Saved state for {texture_category}")
+        logger.debug("Saved state for %s", texture_category)
+
+    def _numbered_items(self):
+        """Items with numeric ids; other folders are listed but can't be built"""
+        return [item for item in self.all_items if item.isdigit()]
+
+    def select_all_items(self):
+        """Select every item in this category in a single update"""
+        self._apply_bulk_selection(self._numbered_items(), True)
+
+    def deselect_all_items(self):
+        """Deselect every item in this category in a single update"""
+        self._apply_bulk_selection(self._numbered_items(), False)
+
+    def select_item_range(self, start: int, end: int, selected: bool = True):
+        """Select (or deselect) every item whose number is within start..end"""
+        low, high = min(start, end), max(start, end)
+        items = [item for item in self.all_items if item.isdigit() and low <= int(item) <= high]
+        self._apply_bulk_selection(items, selected)
+
+    def select_item_range_from_entries(self):
+        """Select the item range typed into the toolbar entries"""
+        start = self.range_start_entry.get().strip()
+        end = self.range_end_entry.get().strip() or start
+        if not start.isdigit() or not end.isdigit():
+            create_message_box("error", "Please enter a valid item range", 3000)
+            return
+        self.select_item_range(int(start), int(end))
 
+    def select_all_textures(self):
+        """Add every available texture to each selected item of this category"""
+        valid_prefix = CATEGORY_PREFIXES.get(self.category)
+        textures = {}
+        for item_name in self.main_app.updated_dictionary.get(self.category, []):
+            pics_path = os.path.join(self.base_path, self.category, item_name, "textures", "pics")
+            if not os.path.isdir(pics_path):
+                continue
+            available = sorted(
+                t for t in os.listdir(pics_path)
+                if t.endswith('.png') and (not valid_prefix or t.startswith(valid_prefix))
+            )
+            if available:
+                textures[item_name] = available
+
+        if not textures:
+            create_message_box("error", "Please select items with textures first", 3000)
+            return
+        self._apply_bulk_selection(list(textures), True, textures)
+
+    def _apply_bulk_selection(self, item_names, selected, textures=None):
+        """Apply a batch of selection changes and refresh the visible page once"""
+        if not item_names:
+            return
+        # Flush pending per-item edits so the main app holds the full state
+        self._save_current_state()
+        self.main_app.update_selection_bulk(self.category, item_names, selected, textures)
+        self.item_textures = self._load_initial_state(self.category)
+        self.load_current_page()
 
     def cleanup(self):
         """Nuclear cleanup for category view"""
@@ -1512,10 +1724,6 @@ class PedCreatorGUI(ctk.CTk):
         self.grid_columnconfigure(1, weight=1)
         ctk.set_appearance_mode("dark")
 
-        # Explicitly set the logging level for your logger
-        logger.setLevel(logging.DEBUG)
-
-
         # Initialize state dictionary with all categories
         self.updated_dictionary = {
             "name": None,
@@ -1557,7 +1765,7 @@ class PedCreatorGUI(ctk.CTk):
         }
         
         # Log the initial state of the dictionary
-        logging.debug(f"Initial updated_dictionary: {self.updated_dictionary}")
+        logger.debug("Initial updated_dictionary: %s", self.updated_dictionary)
         
         self.clothes_path = MALE_PATH
         self.font = "Supernova"
@@ -1565,21 +1773,30 @@ class PedCreatorGUI(ctk.CTk):
         
         # Dictionary to store selection windows
         self.selection_windows = {}
+
+        # Ctrl+M writes the current metrics snapshot to METRICS_FOLDER
+        self.bind("<Control-m>", lambda e: self.export_metrics(notify=True))
         
-        # Create and setup main UI components
+        # Create the sidebar now; the builder frame is built right after the first paint
+        self.builder_frame = None
+        self.checkboxes = {}
         self.setup_navigation_frame()
-        self.setup_builder_frame()
-        
+
         # Configure initial state
-        self.show_builder()
+        self.after_idle(self.show_builder)
+        self.after(500, self.offer_resume_builds)
 
     def get_preview_image(self, item_path: str):
         """Get the first PNG file in the textures/pics folder to use as preview"""
         preview_path = os.path.join(item_path, "textures", "pics")
         if os.path.exists(preview_path):
-            files = sorted([f for f in os.listdir(preview_path) if f.endswith('.png')])
-            if files:
-                return os.path.join(preview_path, files[0])
+            from png_probe import probe
+
+            # Skip broken or mislabeled files using a header read instead of a decode
+            for name in sorted(f for f in os.listdir(preview_path) if f.endswith('.png')):
+                path = os.path.join(preview_path, name)
+                if probe(path) is not None:
+                    return path
         return None
 
     def open_special_selection(self, option_name: str, categories: List[str]):
@@ -1770,7 +1987,7 @@ class PedCreatorGUI(ctk.CTk):
                 self.updated_dictionary[f"{category}_textures"] = {}
 
             # Log the updated dictionary state
-            logging.debug(f"Updated dictionary after clearing data: {self.updated_dictionary}")
+            logger.debug("Updated dictionary after clearing data: %s", self.updated_dictionary)
 
             # Destroy the selection window if it exists
             if option_name in self.selection_windows:
@@ -1823,7 +2040,7 @@ class PedCreatorGUI(ctk.CTk):
                 del self.updated_dictionary[texture_category][item_name]
 
         # Log the updated dictionary state
-        logging.debug(f"Updated dictionary after texture change: {self.updated_dictionary}")
+        logger.debug("Updated dictionary after texture change: %s", self.updated_dictionary)
 
     def update_special_selection(self, category: str, model: str, texture: str | None, texture_name: str | None, selected: bool):
         """Update selection for special categories (e.g., head, body)."""
@@ -1852,14 +2069,14 @@ class PedCreatorGUI(ctk.CTk):
                     del self.updated_dictionary[texture_category][texture]
 
         # Log the updated dictionary state
-        logging.debug(f"Updated dictionary after selection change: {self.updated_dictionary}")
+        logger.debug("Updated dictionary after selection change: %s", self.updated_dictionary)
 
         # Sync checkbox states
         self._sync_checkbox_states()
 
     def update_selection(self, category, item_name, selected):
         """Central state update with texture awareness."""
-        logger.debug(f"Updating selection: category={category}, item_name={item_name}, selected={selected}")
+        logger.debug("Updating selection: category=%s, item_name=%s, selected=%s", category, item_name, selected)
         
         if selected and item_name not in self.updated_dictionary[category]:
             logger.info(f"Adding item: {item_name} to {category}")
@@ -1869,10 +2086,41 @@ class PedCreatorGUI(ctk.CTk):
             self.updated_dictionary[category].remove(item_name)
      
         # Log the updated dictionary state
-        logging.debug(f"Updated dictionary after selection change: {self.updated_dictionary}")
+        logger.debug("Updated dictionary after selection change: %s", self.updated_dictionary)
         
         return self.updated_dictionary.get(category, [] if not category.endswith('_textures') else {})
-        
+
+    def update_selection_bulk(self, category, item_names, selected, textures=None):
+        """Apply many item (and optional texture) selections as a single update."""
+        items = self.updated_dictionary.setdefault(category, [])
+
+        if selected:
+            known = set(items)
+            added = 0
+            for item_name in item_names:
+                if item_name not in known:
+                    items.append(item_name)
+                    known.add(item_name)
+                    added += 1
+
+            # Merge textures per item without duplicating existing ones
+            if textures:
+                texture_category = f"{category}_textures"
+                item_textures = self.updated_dictionary.setdefault(texture_category, {})
+                for item_name, texture_list in textures.items():
+                    current = item_textures.setdefault(item_name, [])
+                    current_set = set(current)
+                    current.extend(t for t in texture_list if t not in current_set)
+
+            logger.info(f"Bulk added {added} item(s) to {category}")
+        else:
+            removed = set(item_names)
+            before = len(items)
+            self.updated_dictionary[category] = [item for item in items if item not in removed]
+            logger.info(f"Bulk removed {before - len(self.updated_dictionary[category])} item(s) from {category}")
+
+        return self.updated_dictionary[category]
+
     def on_selection_window_close(self, option_name: str):
         """Properly handle window close and maintain selections"""
         if option_name in self.selection_windows:
@@ -1903,7 +2151,7 @@ class PedCreatorGUI(ctk.CTk):
             del self.selection_windows[option_name]
             
         # Log the updated dictionary state
-        logging.debug(f"Updated dictionary after window close: {self.updated_dictionary}")
+        logger.debug("Updated dictionary after window close: %s", self.updated_dictionary)
 
         # Update checkbox states
         self._update_checkbox_states(option_name)
@@ -1929,7 +2177,7 @@ class PedCreatorGUI(ctk.CTk):
             del self.selection_windows[option_name]
             
         # Log the updated dictionary state
-        logging.debug(f"Updated dictionary after window close: {self.updated_dictionary}")
+        logger.debug("Updated dictionary after window close: %s", self.updated_dictionary)
 
         # Update checkbox states
         self._update_checkbox_states(option_name)
@@ -1966,17 +2214,15 @@ class PedCreatorGUI(ctk.CTk):
         self.navigation_frame.grid(row=0, column=0, sticky="nsew")
         self.navigation_frame.grid_rowconfigure(4, weight=1)
 
-        logo = Image.open(self.iconpath)            
-        image = ctk.CTkImage(logo, size=(50,50))
-
         self.navigation_frame_label = ctk.CTkLabel(
             self.navigation_frame,
             text="   FiveM Ped Creator",
-            image=image,
             compound="left",
             font=ctk.CTkFont(size=15, weight="bold", family=self.font)
         )
         self.navigation_frame_label.grid(row=0, column=0, padx=20, pady=20)
+        # The logo needs PIL, so load it once the window is already on screen
+        self.after_idle(self._load_logo)
 
         self.dashboard_button = ctk.CTkButton(
             self.navigation_frame,
@@ -1993,6 +2239,17 @@ class PedCreatorGUI(ctk.CTk):
         )
         self.dashboard_button.grid(row=1, column=0, sticky="ew")
 
+    def _load_logo(self):
+        """Load the sidebar logo after the first paint"""
+        from PIL import Image
+
+        try:
+            logo = Image.open(self.iconpath)
+            image = ctk.CTkImage(logo, size=(50,50))
+            self.navigation_frame_label.configure(image=image)
+        except Exception as e:
+            logger.error(f"Failed to load logo: {e}")
+
     def _sync_checkbox_states(self):
         """Synchronize checkboxes with the updated_dictionary."""
         logger.info("Synchronizing checkbox states")
@@ -2064,6 +2321,28 @@ class PedCreatorGUI(ctk.CTk):
         )
         self.build_button.grid(row=1, column=0, sticky="ne", padx=85, pady=475)
 
+        self.budget_button = ctk.CTkButton(
+            self.builder_frame,
+            width=150,
+            text="Budget",
+            font=ctk.CTkFont(size=25, family=self.font),
+            fg_color=PURPLE,
+            hover_color=HOVER_PURPLE,
+            command=self.show_budget
+        )
+        self.budget_button.grid(row=1, column=0, sticky="ne", padx=350, pady=480)
+
+        self.check_button = ctk.CTkButton(
+            self.builder_frame,
+            width=150,
+            text="Check",
+            font=ctk.CTkFont(size=25, family=self.font),
+            fg_color=PURPLE,
+            hover_color=HOVER_PURPLE,
+            command=self.show_preflight
+        )
+        self.check_button.grid(row=1, column=0, sticky="ne", padx=350, pady=430)
+
         # Add gender selection dropdown
         self.gender_var = ctk.StringVar(value="male")  # Default to male
 
@@ -2107,7 +2386,9 @@ class PedCreatorGUI(ctk.CTk):
         logger.info(f"Updated clothes path to: {self.clothes_path}")
 
     def show_builder(self):
-        """Show the builder frame"""
+        """Show the builder frame, building it on first use"""
+        if self.builder_frame is None:
+            self.setup_builder_frame()
         self.builder_frame.grid(row=0, column=1, sticky="nsew")
 
     def create_progress_window(self):
@@ -2169,13 +2450,13 @@ class PedCreatorGUI(ctk.CTk):
         self.percentage_label.configure(text=f"{int(progress * 100)}%")
         if status:
             self.status_label.configure(text=status)
-        progress_window.update()
 
-    def build_ped(self):
+    def _selected_options(self):
+        """Return (name, selected options) for a build, or None after telling the user what is missing"""
         name = self.name_entry.get().strip()
         if not name:
             create_message_box("Error", "Please enter a ped name", 3000)
-            return
+            return None
             
         # Check if any items are selected
         any_selected = False
@@ -2196,53 +2477,198 @@ class PedCreatorGUI(ctk.CTk):
                         
         if not any_selected:
             create_message_box("Error", "Please select at least one item", 5000)
+            return None
+        return name, selected_options
+
+    def build_ped(self):
+        selection = self._selected_options()
+        if selection is None:
             return
-                    
+        name, selected_options = selection
+
+        # The build itself is headless and shared with the build server (imported lazily to keep startup fast)
+        import asyncio
+        from builder import build_ped_async
+
+        gender = self.gender_var.get()
+        self._run_build(name, lambda progress_callback: asyncio.run(
+            build_ped_async(selected_options, name, gender, progress_callback)))
+
+    def _run_build(self, name, build):
+        """Run build(progress_callback) on a worker thread behind the progress window"""
+        progress_window = self.create_progress_window()
+        updates = queue.Queue()
+
+        def progress_callback(progress, status=None):
+            updates.put(("progress", progress, status))
+
+        def worker():
+            try:
+                build(progress_callback)
+                updates.put(("done", None, None))
+            except Exception as e:
+                logger.error(f"Build of {name} failed: {e}")
+                updates.put(("error", e, None))
+
+        # Tk is only touched from the main loop, which polls the worker's updates
+        threading.Thread(target=worker, name=f"build-{name}", daemon=True).start()
+        self.after(50, self._poll_build, name, progress_window, updates)
+
+    def _poll_build(self, name, progress_window, updates):
         try:
-            # Show progress window
-            progress_window = self.create_progress_window()
-            
-            def progress_callback(progress, status=None):
-                self.update_progress(progress_window, progress, status)
-            
-            # Initialize FileHandler and process the files
-            from file_handler import FileHandler
-            # Determine base path based on gender
-            base_path = MALE_PATH if self.gender_var.get() == "male" else FEMALE_PATH
-            
-            # Handle Head and Body separately
-            if "head" in selected_options:
-                # Head is outside MALE_PATH/FEMALE_PATH
-                head_base_path = os.path.join(os.path.dirname(MALE_PATH), "face")
-                FileHandler.copy_files(selected_options, name, head_base_path, progress_callback)
-            if "body" in selected_options:
-                # Body is inside MALE_PATH/FEMALE_PATH
-                body_base_path = os.path.join(base_path, "body")
-                FileHandler.copy_files(selected_options, name, body_base_path, progress_callback)
-            
-            # Pass base_path to FileHandler
-            FileHandler.copy_files(selected_options, name, base_path, progress_callback)
+            while True:
+                kind, value, status = updates.get_nowait()
+                if kind == "progress":
+                    self.update_progress(progress_window, value, status)
+                elif kind == "done":
+                    # Complete the progress bar
+                    self.update_progress(progress_window, 1.0, "Complete!")
+                    self.after(1000, progress_window.destroy)
+
+                    # Show success message
+                    create_message_box("success", f"Ped '{name}' has been successfully created!",5000)
+                    return
+                else:
+                    progress_window.destroy()
+                    create_message_box("error", f"An error occurred while building the ped:\n{str(value)}", 10000)
+                    return
+        except queue.Empty:
+            pass
+        self.after(50, self._poll_build, name, progress_window, updates)
+
+    def show_budget(self):
+        """Plan the current selection and show its streaming-memory budget before building"""
+        selection = self._selected_options()
+        if selection is None:
+            return
+        name, selected_options = selection
+        from builder import plan_budget
 
-            # Generate the YMT XML file
-            selected_options["name"] = name
-            generate_xml(selected_options, name,)  # Pass the selected options and ped name to generate_xml
-            
-            # Complete the progress bar
-            self.update_progress(progress_window, 1.0, "Complete!")
-            self.after(1000, progress_window.destroy)
-            
-            # Show success message
-            create_message_box("success", f"Ped '{name}' has been successfully created!",5000)
+        gender = self.gender_var.get()
+        results = queue.Queue()
 
-        except Exception as e:
-            if 'progress_window' in locals():
-                progress_window.destroy()
-            create_message_box("error", f"An error occurred while building the ped:\n{str(e)}", 10000)
+        def worker():
+            try:
+                results.put(("done", plan_budget(selected_options, name, gender)))
+            except Exception as e:
+                logger.error(f"Budget report for {name} failed: {e}")
+                results.put(("error", e))
+
+        # Planning touches the library, so keep it off the Tk thread
+        self.budget_button.configure(state="disabled")
+        threading.Thread(target=worker, name=f"budget-{name}", daemon=True).start()
+        self.after(50, self._poll_budget, results)
+
+    def _poll_budget(self, results):
+        try:
+            kind, value = results.get_nowait()
+        except queue.Empty:
+            self.after(50, self._poll_budget, results)
+            return
+        self.budget_button.configure(state="normal")
+        if kind == "error":
+            create_message_box("error", f"Could not plan the ped:\n{str(value)}", 10000)
+            return
+
+        from budget import format_report
+        window = ctk.CTkToplevel(self)
+        window.title(f"Budget - {value['ped']}")
+        window.geometry("640x480")
+        window.transient(self)
+        textbox = ctk.CTkTextbox(window, font=ctk.CTkFont(size=13, family="Consolas"), wrap="none")
+        textbox.pack(fill="both", expand=True, padx=10, pady=10)
+        textbox.insert("1.0", format_report(value))
+        textbox.configure(state="disabled")
+
+    def show_preflight(self):
+        """Check the current selection against the library before building"""
+        selection = self._selected_options()
+        if selection is None:
+            return
+        name, selected_options = selection
+        from preflight import check_selection
+
+        gender = self.gender_var.get()
+        results = queue.Queue()
+
+        def worker():
+            try:
+                results.put(("done", check_selection(selected_options, gender)))
+            except Exception as e:
+                logger.error(f"Preflight of {name} failed: {e}")
+                results.put(("error", e))
+
+        self.check_button.configure(state="disabled")
+        threading.Thread(target=worker, name=f"preflight-{name}", daemon=True).start()
+        self.after(50, self._poll_preflight, name, results)
+
+    def _poll_preflight(self, name, results):
+        try:
+            kind, value = results.get_nowait()
+        except queue.Empty:
+            self.after(50, self._poll_preflight, name, results)
+            return
+        self.check_button.configure(state="normal")
+        if kind == "error":
+            create_message_box("error", f"Could not check the ped:\n{str(value)}", 10000)
+            return
+        if not value["issues"]:
+            create_message_box("success", f"'{name}' is ready to build ({value['items']} items checked)", 5000)
+            return
+
+        from preflight import format_report
+        window = ctk.CTkToplevel(self)
+        window.title(f"Check - {name}")
+        window.geometry("720x480")
+        window.transient(self)
+        textbox = ctk.CTkTextbox(window, font=ctk.CTkFont(size=13, family="Consolas"), wrap="none")
+        textbox.pack(fill="both", expand=True, padx=10, pady=10)
+        textbox.insert("1.0", format_report(value))
+        textbox.configure(state="disabled")
+
+    def offer_resume_builds(self):
+        """Offer to resume builds the journal recorded as interrupted"""
+        if not USE_BUILD_JOURNAL:
+            return
+        from build_journal import get_journal
+        from builder import abandon_build, resume_build
+
+        journal = get_journal()
+        to_resume = []
+        for build in journal.interrupted_builds():
+            name = build["ped_name"]
+            if messagebox.askyesno("Resume build", f"The build of '{name}' did not finish. Resume it now?"):
+                to_resume.append(build)
+            elif messagebox.askyesno("Discard build", f"Discard the unfinished build of '{name}'?\n"
+                                     "Choose No to keep its files; it won't be offered again.",
+                                     default=messagebox.NO):
+                # Only an explicit discard deletes the partial output
+                abandon_build(build["id"], journal)
+            else:
+                journal.decline_resume(build["id"])
+
+        if to_resume:
+            # One worker resumes them in turn, sharing the progress window
+            names = ", ".join(build["ped_name"] for build in to_resume)
+            self._run_build(names, lambda progress_callback: [
+                resume_build(build["id"], progress_callback) for build in to_resume])
+
+    def export_metrics(self, notify=False):
+        """Write the metrics registry as Prometheus text and JSON"""
+        try:
+            prom_path, json_path = REGISTRY.export(METRICS_FOLDER)
+            logger.info(f"Metrics exported to {prom_path} and {json_path}")
+            if notify:
+                create_message_box("success", f"Metrics exported to {METRICS_FOLDER}", 3000)
+        except OSError as e:
+            logger.error(f"Failed to export metrics: {e}")
 
     def _safe_destroy(self):
         """Proper cleanup sequence"""
         
         if not self._is_destroyed:
+            self.export_metrics()
+
             # Stop all image loading first
             self.image_loader.stop()
             
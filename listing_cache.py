@@ -0,0 +1,98 @@
+import os
+import logging
+import contextvars
+from contextlib import contextmanager
+from metrics import REGISTRY
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+DIR_SCANS = REGISTRY.counter("dir_scans_total", "Directories listed with os.scandir by the listing cache")
+LISTING_LOOKUPS = REGISTRY.counter("listing_lookups_total", "Path lookups answered from a cached directory listing")
+
+_active_cache = contextvars.ContextVar("listing_cache", default=None)
+_NOT_LISTED = object()
+
+
+class DirectoryListingCache:
+    """Answer exists() checks from one os.scandir per directory.
+
+    On a network share every exists() is a round trip, so each directory is
+    listed once and names are looked up in memory. Names are compared with
+    os.path.normcase, matching the file system's case rules on Windows. A
+    directory whose parent listing lacks it is known missing without a scan.
+    """
+
+    def __init__(self):
+        self._listings = {}
+
+    def listing(self, directory):
+        """Return {normcased name: is_dir} for a directory, or None if it does not exist."""
+        directory = os.path.abspath(directory)
+        key = os.path.normcase(directory)
+        if key in self._listings:
+            return self._listings[key]
+
+        parent, name = os.path.split(directory)
+        parent_listing = self._listings.get(os.path.normcase(parent), _NOT_LISTED)
+        if parent_listing is not _NOT_LISTED and (parent_listing is None or not parent_listing.get(os.path.normcase(name))):
+            # The parent was already listed and has no such folder
+            self._listings[key] = None
+            return None
+
+        with span("scandir", "io", path=directory):
+            try:
+                with os.scandir(directory) as entries:
+                    listing = {os.path.normcase(entry.name): entry.is_dir() for entry in entries}
+            except (FileNotFoundError, NotADirectoryError):
+                listing = None
+            except OSError as e:
+                logger.debug("Could not list %s: %s", directory, e)
+                listing = None
+        DIR_SCANS.inc()
+        self._listings[key] = listing
+        return listing
+
+    def exists(self, path):
+        parent, name = os.path.split(os.path.abspath(path))
+        listing = self.listing(parent)
+        LISTING_LOOKUPS.inc()
+        return listing is not None and os.path.normcase(name) in listing
+
+    def __len__(self):
+        return len(self._listings)
+
+
+@contextmanager
+def listing_cache():
+    """Cache directory listings for the duration of the block (per thread/task).
+
+    Nested blocks share the outermost cache.
+    """
+    cache = _active_cache.get()
+    if cache is not None:
+        yield cache
+        return
+    cache = DirectoryListingCache()
+    token = _active_cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _active_cache.reset(token)
+        logger.debug("Listing cache: %d directories listed", len(cache))
+
+
+def dir_exists(path):
+    """Whether a folder exists; with a cache active this lists it for later lookups."""
+    cache = _active_cache.get()
+    if cache is None:
+        return os.path.isdir(path)
+    return cache.listing(path) is not None
+
+
+def path_exists(path):
+    """exists() answered from the active listing cache, or the file system without one."""
+    cache = _active_cache.get()
+    if cache is None:
+        return os.path.exists(path)
+    return cache.exists(path)
@@ -1,10 +1,34 @@
-import customtkinter as ctk
-from gui import PedCreatorGUI
+import time
+
+# Taken before anything heavy is imported so startup timing covers the imports
+_START = time.perf_counter()
+
+import sys
+from config import logger, setup_logging
 
 # main.py
-def main():
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    startup_bench = "--startup-bench" in argv
+
+    setup_logging()
+
+    # Imported here so the GUI (customtkinter, window classes) loads after logging is ready
+    from gui import PedCreatorGUI
+
     app = PedCreatorGUI()
+
+    def on_first_window():
+        app.update_idletasks()
+        elapsed_ms = (time.perf_counter() - _START) * 1000
+        logger.info(f"Time to first window: {elapsed_ms:.1f} ms")
+        if startup_bench:
+            print(f"STARTUP_MS={elapsed_ms:.3f}", flush=True)
+            app.destroy()
+
+    # Runs after the deferred builder frame has been created
+    app.after_idle(on_first_window)
     app.mainloop()  # Let Tkinter handle destruction automatically
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,228 @@
+"""In-process metrics registry: counters, gauges and latency histograms.
+
+Components update the shared REGISTRY as they work; export it on demand as a
+Prometheus text-format file (e.g. for node_exporter's textfile collector) or a
+JSON snapshot.
+"""
+import contextlib
+import json
+import math
+import os
+import threading
+import time
+
+METRIC_PREFIX = "ped_creator_"
+
+# Upper bounds in seconds, tuned for per-file copies and image loads
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        return repr(value)
+    return str(value)
+
+
+class Counter:
+    """Monotonically increasing count"""
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def samples(self):
+        return [(self.name, "", self._value)]
+
+    def snapshot(self):
+        return self._value
+
+
+class Gauge:
+    """Value that can go up and down, or be computed when read"""
+    kind = "gauge"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._value = 0
+        self._function = None
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        with self._lock:
+            self._value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self._value -= amount
+
+    def set_function(self, function):
+        """Compute the value with function() every time it is read"""
+        self._function = function
+
+    @property
+    def value(self):
+        if self._function is not None:
+            try:
+                return self._function()
+            except Exception:
+                return float("nan")
+        return self._value
+
+    def samples(self):
+        return [(self.name, "", self.value)]
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram:
+    """Distribution of observed values in cumulative buckets"""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * len(self.buckets)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._sum += value
+            self._count += 1
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[index] += 1
+                    break
+
+    @contextlib.contextmanager
+    def time(self):
+        """Observe the duration of the block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def _cumulative(self):
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        cumulative, running = [], 0
+        for bucket_count in counts:
+            running += bucket_count
+            cumulative.append(running)
+        return cumulative, total, count
+
+    def samples(self):
+        cumulative, total, count = self._cumulative()
+        samples = [
+            (f"{self.name}_bucket", f'{{le="{_format_value(float(bound))}"}}', bucket_count)
+            for bound, bucket_count in zip(self.buckets, cumulative)
+        ]
+        samples.append((f"{self.name}_bucket", '{le="+Inf"}', count))
+        samples.append((f"{self.name}_sum", "", total))
+        samples.append((f"{self.name}_count", "", count))
+        return samples
+
+    def snapshot(self):
+        cumulative, total, count = self._cumulative()
+        return {
+            "count": count,
+            "sum": total,
+            "buckets": {str(bound): bucket_count for bound, bucket_count in zip(self.buckets, cumulative)},
+        }
+
+
+class MetricsRegistry:
+    """Named collection of metrics; getters create a metric on first use"""
+    def __init__(self, prefix=METRIC_PREFIX):
+        self.prefix = prefix
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, **kwargs):
+        full_name = f"{self.prefix}{name}"
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = cls(full_name, help_text, **kwargs)
+                self._metrics[full_name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {full_name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help_text=""):
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name, help_text=""):
+        return self._get_or_create(Gauge, name, help_text)
+
+    def histogram(self, name, help_text="", buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+
+    def metrics(self):
+        with self._lock:
+            return sorted(self._metrics.values(), key=lambda metric: metric.name)
+
+    def to_prometheus(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample_name, labels, value in metric.samples():
+                lines.append(f"{sample_name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Return all metric values as a JSON-serializable dict"""
+        return {
+            "timestamp": time.time(),
+            "metrics": {metric.name: {"type": metric.kind, "value": metric.snapshot()} for metric in self.metrics()},
+        }
+
+    def write_prometheus(self, path):
+        _write_atomic(path, self.to_prometheus())
+
+    def write_json(self, path):
+        _write_atomic(path, json.dumps(self.snapshot(), indent=2))
+
+    def export(self, folder, name="ped_creator"):
+        """Write <name>.prom and <name>.json into folder and return both paths"""
+        prom_path = os.path.join(folder, f"{name}.prom")
+        json_path = os.path.join(folder, f"{name}.json")
+        self.write_prometheus(prom_path)
+        self.write_json(json_path)
+        return prom_path, json_path
+
+
+def _write_atomic(path, text):
+    # Readers (e.g. a textfile collector) must never see a half-written file
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+
+REGISTRY = MetricsRegistry()
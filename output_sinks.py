@@ -0,0 +1,421 @@
+import io
+import os
+import re
+import sys
+import time
+import uuid
+import ctypes
+import shutil
+import logging
+import tarfile
+import zipfile
+from pathlib import Path
+from config import COPY_STAGES, TARGET_FOLDER, USE_ASSET_STORE
+from copy_pipeline import copy, make_stages, write
+from fastcopy import copy_file
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FORMATS = ("zip", "tar", "tar.gz", "tar.zst")
+STAGING_FOLDER = ".staging"
+# A publish is a couple of renames; a lock older than this was left by a crash
+PUBLISH_LOCK_STALE_SECONDS = 30
+
+# RSC7 resources are already deflated; recompressing them only costs time
+STORED_SUFFIXES = (".ytd", ".ydd", ".yft", ".ymt")
+
+
+class OutputSink:
+    """Destination for the files of one built ped resource.
+
+    Paths are relative to the resource root and use forward slashes
+    ("peds.meta", "stream/ig_test^jbib_000_u.ydd"). Sinks are context managers:
+    leaving the block commits, an exception aborts.
+    """
+
+    # Whether write_* may be called from several threads at once
+    concurrent_writes = True
+    # True for sinks that only record what would be written (see async_pipeline)
+    deferred = False
+
+    def __init__(self):
+        self.written = []
+        # rel_path -> results of the copy stages run while writing it (copy_pipeline)
+        self.stage_results = {}
+        self._seen = set()
+        self.closed = False
+
+    def write_file(self, rel_path, src):
+        """Add the file at src under rel_path."""
+        raise NotImplementedError
+
+    def write_bytes(self, rel_path, data):
+        """Add data (bytes or str) under rel_path."""
+        raise NotImplementedError
+
+    def write_prefetched(self, rel_path, data, src, st=None):
+        """Add the already-read content of src under rel_path."""
+        self.write_bytes(rel_path, data)
+
+    def write_copy(self, rel_path, copied_rel_path, src):
+        """Add src under rel_path as well; copied_rel_path already holds it."""
+        self.write_file(rel_path, src)
+
+    def already_written(self, rel_path, src):
+        """Whether rel_path holds src from an earlier, interrupted run."""
+        return False
+
+    def commit(self):
+        """Finish the resource; nothing may be written afterwards."""
+        self.closed = True
+
+    def abort(self):
+        """Discard whatever this sink has written."""
+        self.closed = True
+
+    def _record(self, rel_path):
+        # Returns False for a path this sink already holds
+        if rel_path in self._seen:
+            return False
+        self._seen.add(rel_path)
+        self.written.append(rel_path)
+        return True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.closed:
+            return False
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+
+class DirectorySink(OutputSink):
+    """Write the resource as a folder (output/<ped>).
+
+    Files are written into a private staging folder (output/.staging/<ped>-<id>).
+    Commit publishes the finished resource with a directory rename. A previous
+    version is swapped out atomically where the OS can (renameat2 on Linux),
+    otherwise moved aside first and only deleted once the new one is in place,
+    so nobody ever sees a half-built resource. If a crash leaves only the
+    moved-aside copy, it is restored the next time a sink opens that resource;
+    a per-resource lock file keeps that from racing another sink's publish.
+    Abort just drops the staging folder.
+
+    Copies run the configured copy stages (COPY_STAGES) over their single read
+    of the source. Store links are hashed by the store instead.
+    """
+
+    def __init__(self, root, use_store=None, staging_id=None, stages=None):
+        super().__init__()
+        self.root = Path(root)
+        restore_previous(self.root)
+        self.use_store = USE_ASSET_STORE if use_store is None else use_store
+        self.stages = COPY_STAGES if stages is None else stages
+        self.staging_id = staging_id or uuid.uuid4().hex[:12]
+        self.staging = staging_path(self.root, self.staging_id)
+
+    def path(self, rel_path):
+        return self.staging / rel_path
+
+    def _write(self, rel_path, write):
+        target = self.path(rel_path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        write(target)
+        self._record(rel_path)
+
+    def _keep(self, rel_path, results):
+        if self.stages:
+            self.stage_results[rel_path] = results
+
+    def write_file(self, rel_path, src):
+        if self.use_store:
+            from asset_store import get_store
+            self._write(rel_path, lambda target: get_store().link(src, target))
+        else:
+            self._write(rel_path, lambda target: self._keep(rel_path, copy(src, target, make_stages(self.stages))))
+
+    def write_bytes(self, rel_path, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._write(rel_path, lambda target: self._keep(rel_path, write(data, target, make_stages(self.stages))))
+
+    def write_prefetched(self, rel_path, data, src, st=None):
+        if self.use_store:
+            # The store links by content hash and reuses blobs it already holds
+            self.write_file(rel_path, src)
+        else:
+            self.write_bytes(rel_path, data)
+
+    def write_copy(self, rel_path, copied_rel_path, src):
+        if self.use_store:
+            self.write_file(rel_path, src)
+        else:
+            # Copy the staged file rather than going back to the library; same content, same results
+            self._write(rel_path, lambda target: copy_file(self.path(copied_rel_path), target))
+            if copied_rel_path in self.stage_results:
+                self.stage_results[rel_path] = self.stage_results[copied_rel_path]
+
+    def commit(self):
+        self.staging.mkdir(parents=True, exist_ok=True)
+        if self.root.exists() and _exchange(self.staging, self.root):
+            # Swapped in one step; the staging folder now holds the previous version
+            shutil.rmtree(self.staging, ignore_errors=True)
+            logger.debug("Published %s (%d files)", self.root, len(self.written))
+            super().commit()
+            return
+        # The resource is missing between the two renames; the lock keeps restore_previous out
+        _lock_publish(self.root, wait=True)
+        try:
+            previous = None
+            if self.root.exists():
+                # Directories can't be renamed over one another on Windows, so swap in two steps
+                previous = staging_path(self.root, f"{self.staging_id}-previous")
+                os.rename(self.root, previous)
+            try:
+                os.rename(self.staging, self.root)
+            except OSError:
+                if previous is not None:
+                    os.rename(previous, self.root)
+                raise
+            if previous is not None:
+                shutil.rmtree(previous, ignore_errors=True)
+        finally:
+            _unlock_publish(self.root)
+        logger.debug("Published %s (%d files)", self.root, len(self.written))
+        super().commit()
+
+    def abort(self):
+        shutil.rmtree(self.staging, ignore_errors=True)
+        self.written.clear()
+        super().abort()
+
+
+_RENAME_EXCHANGE = 2
+_AT_FDCWD = -100
+_renameat2 = None
+
+
+def _exchange(a, b):
+    """Atomically swap two directories with renameat2(RENAME_EXCHANGE); False if unsupported."""
+    global _renameat2
+    if not sys.platform.startswith("linux"):
+        return False
+    if _renameat2 is None:
+        libc = ctypes.CDLL(None, use_errno=True)
+        _renameat2 = getattr(libc, "renameat2", False)
+    if not _renameat2:
+        return False
+    if _renameat2(_AT_FDCWD, os.fsencode(a), _AT_FDCWD, os.fsencode(b), _RENAME_EXCHANGE) == 0:
+        return True
+    logger.debug("renameat2 exchange failed for %s: errno %d", b, ctypes.get_errno())
+    return False
+
+
+def _publish_lock_path(root):
+    return root.parent / STAGING_FOLDER / f"{root.name}.publish.lock"
+
+
+def _lock_publish(root, wait):
+    """Take a resource's publish lock; without wait, False if another process holds it."""
+    lock = _publish_lock_path(root)
+    deadline = time.monotonic() + PUBLISH_LOCK_STALE_SECONDS
+    while True:
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            pass
+        try:
+            if time.time() - os.stat(lock).st_mtime > PUBLISH_LOCK_STALE_SECONDS:
+                logger.warning(f"Removing stale publish lock {lock}")
+                os.unlink(lock)
+                continue
+        except FileNotFoundError:
+            continue
+        if not wait or time.monotonic() > deadline:
+            return False
+        time.sleep(0.05)
+
+
+def _unlock_publish(root):
+    try:
+        os.unlink(_publish_lock_path(root))
+    except FileNotFoundError:
+        pass
+
+
+def _previous_versions(root):
+    pattern = re.compile(rf"{re.escape(root.name)}-[0-9a-f]+-previous")
+    try:
+        return [entry for entry in (root.parent / STAGING_FOLDER).iterdir()
+                if pattern.fullmatch(entry.name) and entry.is_dir()]
+    except OSError:
+        return []
+
+
+def restore_previous(root):
+    """Put back the previous version of a resource if a crash mid-publish left only that.
+
+    Does nothing while another sink is publishing the resource (it holds the publish lock).
+    """
+    root = Path(root)
+    if root.exists() or not _previous_versions(root):
+        return False
+    if not _lock_publish(root, wait=False):
+        logger.debug("Not restoring %s: a publish is in progress", root)
+        return False
+    try:
+        candidates = _previous_versions(root)
+        if root.exists() or not candidates:
+            return False
+        latest = max(candidates, key=lambda entry: entry.stat().st_mtime)
+        os.rename(latest, root)
+    finally:
+        _unlock_publish(root)
+    logger.warning(f"Restored {root} from {latest.name} left by an interrupted publish")
+    return True
+
+
+def staging_path(root, staging_id):
+    """Staging folder for a resource: a sibling of the output so publishing is a rename."""
+    root = Path(root)
+    return root.parent / STAGING_FOLDER / f"{root.name}-{staging_id}"
+
+
+class MemorySink(OutputSink):
+    """Keep the resource in a dict of path -> bytes (tests and benchmarks)."""
+
+    def __init__(self):
+        super().__init__()
+        self.files = {}
+
+    def write_file(self, rel_path, src):
+        with open(src, "rb") as f:
+            self.write_bytes(rel_path, f.read())
+
+    def write_bytes(self, rel_path, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self._record(rel_path)
+        self.files[rel_path] = data
+
+    def abort(self):
+        self.files.clear()
+        self.written.clear()
+        super().abort()
+
+
+class ArchiveSink(OutputSink):
+    """Stream the resource into a zip or tar archive in a single sequential pass.
+
+    Entries are stored under <prefix>/ so the archive unpacks to the resource
+    folder. The archive is written to <path>.tmp and renamed on commit. Archive
+    entries cannot be replaced, so the first write of a path wins.
+    """
+
+    concurrent_writes = False
+
+    def __init__(self, path, fmt=None, prefix=None, compresslevel=None):
+        super().__init__()
+        self.path = Path(path)
+        self.fmt = fmt or archive_format(self.path)
+        if self.fmt not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unsupported archive format: {self.fmt}")
+        self.prefix = prefix.strip("/") + "/" if prefix else ""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._temp_path = self.path.with_name(self.path.name + ".tmp")
+        self._raw = open(self._temp_path, "wb")
+        self._compressor = None
+
+        if self.fmt == "zip":
+            self._archive = zipfile.ZipFile(self._raw, "w", zipfile.ZIP_DEFLATED,
+                                            compresslevel=compresslevel)
+        elif self.fmt == "tar.zst":
+            try:
+                import zstandard
+            except ImportError:
+                self._raw.close()
+                os.remove(self._temp_path)
+                raise RuntimeError("tar.zst output requires the 'zstandard' package")
+            self._compressor = zstandard.ZstdCompressor(level=3 if compresslevel is None else compresslevel)
+            self._stream = self._compressor.stream_writer(self._raw, closefd=False)
+            self._archive = tarfile.open(fileobj=self._stream, mode="w|")
+        else:
+            mode = "w|gz" if self.fmt == "tar.gz" else "w|"
+            self._archive = tarfile.open(fileobj=self._raw, mode=mode)
+
+    def _arcname(self, rel_path):
+        return self.prefix + rel_path
+
+    def write_file(self, rel_path, src):
+        if not self._record(rel_path):
+            logger.debug("Skipping duplicate archive entry: %s", rel_path)
+            return
+        if self.fmt == "zip":
+            compress_type = zipfile.ZIP_STORED if rel_path.lower().endswith(STORED_SUFFIXES) else None
+            self._archive.write(src, self._arcname(rel_path), compress_type=compress_type)
+        else:
+            info = self._archive.gettarinfo(src, self._arcname(rel_path))
+            info.uid = info.gid = 0
+            info.uname = info.gname = ""
+            with open(src, "rb") as f:
+                self._archive.addfile(info, f)
+
+    def write_bytes(self, rel_path, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if not self._record(rel_path):
+            logger.debug("Skipping duplicate archive entry: %s", rel_path)
+            return
+        if self.fmt == "zip":
+            compress_type = zipfile.ZIP_STORED if rel_path.lower().endswith(STORED_SUFFIXES) else None
+            self._archive.writestr(self._arcname(rel_path), data, compress_type=compress_type)
+        else:
+            info = tarfile.TarInfo(self._arcname(rel_path))
+            info.size = len(data)
+            self._archive.addfile(info, io.BytesIO(data))
+
+    def _close(self):
+        self._archive.close()
+        if self._compressor is not None:
+            self._stream.close()
+        self._raw.close()
+
+    def commit(self):
+        self._close()
+        os.replace(self._temp_path, self.path)
+        logger.info(f"Wrote archive {self.path} ({len(self.written)} files)")
+        super().commit()
+
+    def abort(self):
+        try:
+            self._close()
+        finally:
+            if os.path.exists(self._temp_path):
+                os.remove(self._temp_path)
+        super().abort()
+
+
+def archive_format(path):
+    """Guess the archive format from a file name."""
+    name = str(path).lower()
+    for fmt in sorted(ARCHIVE_FORMATS, key=len, reverse=True):
+        if name.endswith("." + fmt):
+            return fmt
+    if name.endswith(".tgz"):
+        return "tar.gz"
+    raise ValueError(f"Cannot tell the archive format of {path}")
+
+
+def open_sink(ped_name, fmt="directory", target_folder=TARGET_FOLDER, staging_id=None):
+    """Create the sink a ped build writes to: output/<ped> or output/<ped>.<fmt>."""
+    if fmt == "directory":
+        return DirectorySink(Path(target_folder) / ped_name, staging_id=staging_id)
+    if fmt == "memory":
+        return MemorySink()
+    return ArchiveSink(Path(target_folder) / f"{ped_name}.{fmt}", fmt, prefix=ped_name)
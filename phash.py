@@ -0,0 +1,380 @@
+"""Perceptual hashes of texture previews, to find duplicate and near-duplicate textures.
+
+Each preview PNG gets a 64-bit DCT hash (the pHash scheme): the image is
+reduced to 32x32 grayscale, transformed with a 2D DCT, and the 8x8 lowest
+frequencies are compared with their median. Visually identical textures end
+up a few bits apart however they were re-encoded or resized. Hashes are cached
+per (path, size, mtime) in output/.phash_index.json and queried through a
+BK-tree, so "near-duplicates of X" only compares against a fraction of the
+library. Needs NumPy and Pillow.
+"""
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from config import PHASH_DISTANCE, PHASH_INDEX_PATH, PHASH_WORKERS, get_log_queue, setup_worker_logging
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 8
+SAMPLE_SIZE = 32
+
+HASHES_COMPUTED = REGISTRY.counter("phash_computed_total", "Perceptual hashes computed from preview PNGs")
+HASH_FAILURES = REGISTRY.counter("phash_failures_total", "Preview PNGs that could not be hashed")
+INDEX_HITS = REGISTRY.counter("phash_index_hits_total", "Perceptual hash lookups served from the index")
+
+_dct = None
+
+
+def _dct_matrix():
+    """Orthonormal DCT-II basis for SAMPLE_SIZE points (computed once per process)."""
+    global _dct
+    if _dct is None:
+        import numpy as np
+        k = np.arange(SAMPLE_SIZE)[:, None]
+        i = np.arange(SAMPLE_SIZE)[None, :]
+        matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * SAMPLE_SIZE)) * np.sqrt(2 / SAMPLE_SIZE)
+        matrix[0] /= np.sqrt(2)
+        _dct = matrix
+    return _dct
+
+
+def image_hash(image):
+    """64-bit perceptual hash of a PIL image, as an int."""
+    import numpy as np
+    from PIL import Image
+
+    pixels = np.asarray(image.convert("L").resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.LANCZOS), dtype=np.float64)
+    dct = _dct_matrix()
+    low = (dct @ pixels @ dct.T)[:HASH_SIZE, :HASH_SIZE].ravel()
+    # The DC term is the mean brightness; leave it out of the median
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def file_hash(path):
+    """Perceptual hash of the image at path."""
+    from PIL import Image
+
+    with Image.open(path) as image:
+        return image_hash(image)
+
+
+def distance(a, b):
+    """Hamming distance between two hashes."""
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """Burkhard-Keller tree over Hamming distance: near-neighbour queries without a full scan.
+
+    Paths with the same hash share a node.
+    """
+
+    def __init__(self, items=()):
+        self.root = None
+        self.size = 0
+        for hash_value, path in items:
+            self.add(hash_value, path)
+
+    def add(self, hash_value, path):
+        self.size += 1
+        if self.root is None:
+            self.root = (hash_value, [path], {})
+            return
+        node = self.root
+        while True:
+            d = distance(hash_value, node[0])
+            if d == 0:
+                node[1].append(path)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = (hash_value, [path], {})
+                return
+            node = child
+
+    def search(self, hash_value, max_distance):
+        """(distance, path) of every entry within max_distance of hash_value, nearest first."""
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node_hash, paths, children = stack.pop()
+            d = distance(hash_value, node_hash)
+            if d <= max_distance:
+                found += [(d, path) for path in paths]
+            # Triangle inequality: only children at d +- max_distance can hold matches
+            for child_distance, child in children.items():
+                if d - max_distance <= child_distance <= d + max_distance:
+                    stack.append(child)
+        found.sort()
+        return found
+
+
+def _is_preview(dirpath, filename):
+    # textures/pics/<name>.png for clothes, textures/<id>/<name>.png for head and body
+    parts = os.path.normcase(dirpath).split(os.sep)
+    return filename.lower().endswith(".png") and "textures" in parts[-2:]
+
+
+def preview_paths(root):
+    """Every texture preview PNG under a library root."""
+    return [os.path.join(dirpath, filename)
+            for dirpath, _, filenames in os.walk(root) for filename in filenames if _is_preview(dirpath, filename)]
+
+
+def texture_path(png_path):
+    """The .ytd a preview PNG stands for."""
+    folder, name = os.path.split(png_path)
+    ytd_name = os.path.splitext(name)[0] + ".ytd"
+    if os.path.basename(folder).lower() == "pics":
+        return os.path.join(os.path.dirname(folder), "files", ytd_name)
+    return os.path.join(folder, ytd_name)
+
+
+def _hash_job(path):
+    try:
+        return path, format(file_hash(path), "016x"), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+class PHashIndex:
+    """Perceptual hashes of preview PNGs, cached per (path, size, mtime).
+
+    Persisted to a JSON file like the texture index; PNGs that fail to decode
+    are cached with their error until they change.
+    """
+
+    def __init__(self, path=PHASH_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = None
+        self._dirty = False
+        # BK-tree over every hash, built on first query and dropped when a hash changes
+        self._tree = None
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def save(self):
+        """Persist the index (written atomically)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+    def _fresh(self, path, st):
+        entry = self._load().get(path)
+        return entry if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns else None
+
+    def _store(self, path, st, hash_hex, error):
+        self._load()[path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": hash_hex, "error": error}
+        self._dirty = True
+        self._tree = None
+        if error:
+            HASH_FAILURES.inc()
+            logger.debug("Could not hash %s: %s", path, error)
+        else:
+            HASHES_COMPUTED.inc()
+
+    def get(self, path):
+        """Hash of the PNG at path as an int, or None if it cannot be decoded."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            entry = self._fresh(path, st)
+        if entry:
+            INDEX_HITS.inc()
+        else:
+            _, hash_hex, error = _hash_job(path)
+            with self._lock:
+                self._store(path, st, hash_hex, error)
+                entry = self._entries[path]
+        return int(entry["hash"], 16) if entry["hash"] else None
+
+    def scan(self, root, workers=PHASH_WORKERS, progress_callback=None):
+        """Hash every preview under root that changed since the last scan; returns (files, hashed, errors)."""
+        stats = {}
+        for path in preview_paths(root):
+            path = os.path.abspath(path)
+            try:
+                stats[path] = os.stat(path)
+            except OSError:
+                continue
+        with self._lock:
+            stale = [path for path, st in stats.items() if not self._fresh(path, st)]
+        INDEX_HITS.inc(len(stats) - len(stale))
+
+        errors = 0
+        if stale:
+            log_queue = get_log_queue()
+            # Decoding and the DCT are CPU-bound, so they get processes rather than threads
+            with ProcessPoolExecutor(max_workers=workers,
+                                     initializer=setup_worker_logging if log_queue else None,
+                                     initargs=(log_queue,) if log_queue else ()) as executor:
+                for done, (path, hash_hex, error) in enumerate(executor.map(_hash_job, stale, chunksize=32), 1):
+                    with self._lock:
+                        self._store(path, stats[path], hash_hex, error)
+                    errors += bool(error)
+                    if progress_callback:
+                        progress_callback(done / len(stale), path)
+        self.save()
+        return len(stats), len(stale), errors
+
+    def tree(self):
+        """BK-tree of every hash in the index, rebuilt only after the index changed."""
+        with self._lock:
+            if self._tree is None:
+                self._tree = BKTree((int(entry["hash"], 16), path)
+                                    for path, entry in self._load().items() if entry["hash"])
+            return self._tree
+
+    def hashes(self, root=None):
+        """{path: hash} of every hashed PNG (under root, if given) that still exists."""
+        prefix = os.path.join(os.path.normcase(os.path.abspath(root)), "") if root else ""
+        with self._lock:
+            entries = list(self._load().items())
+        return {path: int(entry["hash"], 16) for path, entry in entries
+                if entry["hash"] and os.path.normcase(path).startswith(prefix) and os.path.exists(path)}
+
+
+def near_duplicates(index, path, max_distance=PHASH_DISTANCE, root=None):
+    """(distance, path) of the indexed previews within max_distance of the one at path."""
+    target = index.get(path)
+    if target is None:
+        return []
+    path = os.path.abspath(path)
+    prefix = os.path.join(os.path.normcase(os.path.abspath(root)), "") if root else ""
+    # The index may still list previews deleted since the last scan
+    return [(d, other) for d, other in index.tree().search(target, max_distance)
+            if other != path and os.path.normcase(other).startswith(prefix) and os.path.exists(other)]
+
+
+def clusters(hashes, max_distance=PHASH_DISTANCE):
+    """Groups of paths whose hashes chain together within max_distance (union-find over a BK-tree)."""
+    paths = list(hashes)
+    parent = {path: path for path in paths}
+
+    def find(path):
+        while parent[path] != path:
+            parent[path] = parent[parent[path]]
+            path = parent[path]
+        return path
+
+    tree = BKTree((hashes[path], path) for path in paths)
+    for path in paths:
+        for _, other in tree.search(hashes[path], max_distance):
+            a, b = find(path), find(other)
+            if a != b:
+                parent[b] = a
+
+    groups = {}
+    for path in paths:
+        groups.setdefault(find(path), []).append(path)
+    return sorted((sorted(group) for group in groups.values() if len(group) > 1), key=len, reverse=True)
+
+
+def _item(path, root):
+    # category/item of a preview, e.g. shirts/12 from <root>/shirts/12/textures/pics/x.png
+    parts = os.path.relpath(path, root).split(os.sep)
+    return "/".join(parts[:2]) if len(parts) > 2 else parts[0]
+
+
+def duplicate_report(index, root, max_distance=PHASH_DISTANCE):
+    """Duplicate clusters of the previews under root, with the texture bytes each one wastes."""
+    hashes = index.hashes(root)
+    report = []
+    reclaimable = 0
+    for group in clusters(hashes, max_distance):
+        sizes = []
+        for path in group:
+            try:
+                sizes.append(os.path.getsize(texture_path(path)))
+            except OSError:
+                sizes.append(0)
+        # Keeping one texture per cluster, the rest is what the duplicates cost
+        wasted = sum(sizes) - max(sizes)
+        reclaimable += wasted
+        report.append({
+            "paths": group,
+            "items": sorted({_item(path, root) for path in group}),
+            # Clusters are chained, so the widest pair can be further apart than the match distance
+            "max_distance": max(distance(hashes[a], hashes[b]) for i, a in enumerate(group) for b in group[i + 1:]),
+            "texture_bytes": sum(sizes),
+            "reclaimable_bytes": wasted,
+        })
+    report.sort(key=lambda cluster: cluster["reclaimable_bytes"], reverse=True)
+    return {
+        "root": root,
+        "distance": max_distance,
+        "images": len(hashes),
+        "clusters": report,
+        "duplicates": sum(len(cluster["paths"]) - 1 for cluster in report),
+        "reclaimable_bytes": reclaimable,
+    }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_phash_index():
+    """Return the process-wide perceptual hash index."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = PHashIndex()
+        return _index
+
+
+if __name__ == "__main__":
+    import argparse
+    from config import MALE_PATH, FEMALE_PATH, setup_logging
+
+    parser = argparse.ArgumentParser(description="Find duplicate and near-duplicate textures by perceptual hash")
+    parser.add_argument("roots", nargs="*", help="Library folders (default: the male and female libraries and face)")
+    parser.add_argument("--near", metavar="PNG", help="List the previews that look like this one")
+    parser.add_argument("--distance", type=int, default=PHASH_DISTANCE, help="Most differing bits (of 64) to match")
+    parser.add_argument("--workers", type=int, default=PHASH_WORKERS)
+    parser.add_argument("--json", action="store_true", help="Print the duplicate report as JSON")
+    args = parser.parse_args()
+
+    setup_logging()
+    index = get_phash_index()
+    roots = args.roots or [MALE_PATH, FEMALE_PATH, os.path.join(os.path.dirname(MALE_PATH), "face")]
+    for root in roots:
+        started = time.perf_counter()
+        files, hashed, errors = index.scan(root, args.workers)
+        logger.info(f"{root}: {files} previews, {hashed} hashed ({errors} unreadable) "
+                    f"in {time.perf_counter() - started:.1f}s")
+
+    if args.near:
+        for d, path in near_duplicates(index, args.near, args.distance):
+            print(f"{d:2d}  {path}")
+    else:
+        reports = [duplicate_report(index, root, args.distance) for root in roots]
+        if args.json:
+            print(json.dumps(reports, indent=2))
+            raise SystemExit
+        for report in reports:
+            print(f"{report['root']}: {report['duplicates']} duplicates of {report['images']} previews in "
+                  f"{len(report['clusters'])} clusters, {report['reclaimable_bytes'] / (1024 * 1024):.1f} MiB reclaimable")
+            for cluster in report["clusters"]:
+                print(f"  {cluster['reclaimable_bytes'] / (1024 * 1024):7.2f} MiB  {', '.join(cluster['items'])}")
+                for path in cluster["paths"]:
+                    print(f"      {os.path.relpath(path, report['root'])}")
@@ -0,0 +1,293 @@
+"""Check a selection, or a whole library, for problems before anything is copied.
+
+A build only notices missing files as it copies them (TEXTURE NOT FOUND / NO
+MODEL AT in the debug log) and fails with "No valid items processed" once the
+time is spent. Preflight resolves the same paths FileHandler would, one
+directory listing per folder on a thread pool, and returns a report:
+
+    {"scope", "target", "items", "errors", "warnings", "buildable", "seconds",
+     "issues": [{"severity", "code", "category", "item", "path", "message"}]}
+
+buildable is None for library reports.
+
+Issue codes: non_numeric_item, unknown_category, missing_texture_dir,
+missing_texture, missing_model, prefix_mismatch, empty_item, nothing_to_build
+(selections) and orphan_preview, no_preview (libraries).
+"""
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from config import CATEGORY_PREFIXES, FEMALE_PATH, MALE_PATH, PREFLIGHT_WORKERS
+from builder import base_paths, split_selection
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+PROP_CATEGORIES = ("watches", "glasses", "hats")
+# Folders of the face and body libraries, laid out as model/<id> and textures/<id>
+SPECIAL_CATEGORIES = {"head": "head", "body": "body"}
+
+PREFLIGHT_RUNS = REGISTRY.counter("preflight_runs_total", "Selections and libraries checked by preflight")
+PREFLIGHT_ISSUES = REGISTRY.counter("preflight_issues_total", "Problems found by preflight")
+
+
+class PreflightError(ValueError):
+    """The selection cannot produce a ped; the report says why."""
+
+    def __init__(self, report):
+        super().__init__(f"Preflight found {report['errors']} errors: "
+                         + "; ".join(issue["message"] for issue in report["issues"] if issue["severity"] == "error")[:500])
+        self.report = report
+
+
+def _issue(severity, code, category, item, path, message):
+    return {"severity": severity, "code": code, "category": category, "item": item,
+            "path": str(path) if path else None, "message": message}
+
+
+def _listing(directory):
+    """Names in a directory, or None if it does not exist."""
+    try:
+        with os.scandir(directory) as entries:
+            return {entry.name: entry.is_dir() for entry in entries}
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    except OSError as e:
+        logger.debug("Could not list %s: %s", directory, e)
+        return None
+
+
+def _has(listing, name):
+    # Match the file system's case rules on Windows, as the listing cache does
+    return listing is not None and os.path.normcase(name) in {os.path.normcase(n) for n in listing}
+
+
+def model_name(category, item):
+    """File name of an item's model in the library (as FileHandler looks it up)."""
+    if category in SPECIAL_CATEGORIES:
+        return f"{SPECIAL_CATEGORIES[category]}_{int(item):03d}_r.ydd"
+    prefix = CATEGORY_PREFIXES.get(category, category)
+    if category in PROP_CATEGORIES:
+        return f"{prefix}_{int(item):03d}.ydd"
+    return f"{prefix}_{int(item):03d}_u.ydd"
+
+
+def item_folders(category, item, textures, base_path):
+    """(texture folder, model folder) FileHandler reads one selected item from."""
+    if category in SPECIAL_CATEGORIES:
+        # Head and body textures live in a folder named after the first selected texture
+        texture_dir = os.path.join(base_path, "textures", str(textures[0])) if textures else None
+        return texture_dir, os.path.join(base_path, "model", str(item))
+    item_dir = os.path.join(base_path, category, str(item))
+    return os.path.join(item_dir, "textures", "files"), item_dir
+
+
+def _check_model(category, item, model_dir, model_listing, issues):
+    """Whether the item's model exists, recording why not."""
+    expected = model_name(category, item)
+    if _has(model_listing, expected):
+        return True
+    path = os.path.join(model_dir, expected)
+    others = sorted(name for name in model_listing or () if name.lower().endswith(".ydd"))
+    if others:
+        issues.append(_issue("error", "prefix_mismatch", category, item, path,
+                             f"{category}/{item}: expected {expected}, found {', '.join(others)}"))
+    else:
+        issues.append(_issue("warning", "missing_model", category, item, path,
+                             f"{category}/{item}: no model {expected}"))
+    return False
+
+
+def check_item(category, item, textures, base_path):
+    """Issues of one selected item, and whether the build would copy anything for it."""
+    issues = []
+    if not str(item).isdigit():
+        issues.append(_issue("error", "non_numeric_item", category, item, None,
+                             f"{category}/{item}: item ids must be numbers (the build would stop here)"))
+        return issues, False
+    if category not in SPECIAL_CATEGORIES and category not in CATEGORY_PREFIXES:
+        issues.append(_issue("error", "unknown_category", category, item, None,
+                             f"{category}: no stream prefix in CATEGORY_PREFIXES"))
+        return issues, False
+
+    texture_dir, model_dir = item_folders(category, item, textures, base_path)
+    found = 0
+    if texture_dir:
+        texture_listing = _listing(texture_dir)
+        if texture_listing is None:
+            issues.append(_issue("warning", "missing_texture_dir", category, item, texture_dir,
+                                 f"{category}/{item}: no texture folder"))
+        else:
+            for texture in textures:
+                ytd = texture.replace(".png", ".ytd")
+                if _has(texture_listing, ytd):
+                    found += 1
+                else:
+                    issues.append(_issue("warning", "missing_texture", category, item, os.path.join(texture_dir, ytd),
+                                         f"{category}/{item}: no {ytd} for {texture}"))
+
+    if _check_model(category, item, model_dir, _listing(model_dir), issues):
+        found += 1
+    if not found:
+        issues.append(_issue("error", "empty_item", category, item, model_dir,
+                             f"{category}/{item}: nothing would be copied"))
+    return issues, bool(found)
+
+
+def _report(scope, target, items, issues, started, buildable=None):
+    issues.sort(key=lambda issue: (issue["severity"] != "error", issue["category"] or "", str(issue["item"] or "")))
+    errors = sum(issue["severity"] == "error" for issue in issues)
+    PREFLIGHT_RUNS.inc()
+    PREFLIGHT_ISSUES.inc(len(issues))
+    return {
+        "scope": scope,
+        "target": target,
+        "items": items,
+        "errors": errors,
+        "warnings": len(issues) - errors,
+        "buildable": buildable,
+        "seconds": time.perf_counter() - started,
+        "issues": issues,
+    }
+
+
+def check_selection(selected_options, gender="male", paths=None, workers=PREFLIGHT_WORKERS):
+    """Report on a selection as build_ped would copy it (see the module docstring)."""
+    started = time.perf_counter()
+    paths = paths or base_paths(gender)
+    tasks = []
+    for group, options in split_selection(selected_options).items():
+        for category, items in options.items():
+            if category.endswith("_textures"):
+                continue
+            textures = options.get(f"{category}_textures", {})
+            tasks += [(group, category, item, textures.get(str(item), []), paths[group]) for item in items]
+
+    issues = []
+    copied = {}
+    # Every check is a couple of directory listings: latency-bound on a network share
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="preflight") as executor:
+        futures = [(task[0], executor.submit(check_item, *task[1:])) for task in tasks]
+        for group, future in futures:
+            item_issues, ok = future.result()
+            issues += item_issues
+            copied[group] = copied.get(group, False) or ok
+
+    for group, ok in copied.items():
+        if not ok:
+            issues.append(_issue("error", "nothing_to_build", None, None, paths[group],
+                                 f"No {group} item has any files; the build would fail"))
+    buildable = not any(issue["code"] in ("nothing_to_build", "non_numeric_item") for issue in issues)
+    return _report("selection", gender, len(tasks), issues, started, buildable)
+
+
+def _check_library_item(category, item, base_path):
+    """Issues of one library item folder: its model and its previews against its textures."""
+    issues = []
+    texture_dir, model_dir = item_folders(category, item, [item], base_path)
+    _check_model(category, item, model_dir, _listing(model_dir), issues)
+
+    if category in SPECIAL_CATEGORIES:
+        # Previews sit next to the textures
+        pics_dir = files_dir = texture_dir
+    else:
+        pics_dir, files_dir = os.path.join(model_dir, "textures", "pics"), texture_dir
+    pics = {name[:-4] for name in _listing(pics_dir) or () if name.lower().endswith(".png")}
+    files = {name[:-4] for name in _listing(files_dir) or () if name.lower().endswith(".ytd")}
+    for name in sorted(pics - files):
+        issues.append(_issue("error", "orphan_preview", category, item, os.path.join(pics_dir, f"{name}.png"),
+                             f"{category}/{item}: {name}.png can be selected but has no {name}.ytd"))
+    for name in sorted(files - pics):
+        issues.append(_issue("warning", "no_preview", category, item, os.path.join(files_dir, f"{name}.ytd"),
+                             f"{category}/{item}: {name}.ytd has no preview and cannot be selected"))
+    return issues
+
+
+def check_library(gender="male", paths=None, workers=PREFLIGHT_WORKERS):
+    """Report on every item of a gender's library (see the module docstring)."""
+    started = time.perf_counter()
+    paths = paths or base_paths(gender)
+    issues = []
+    tasks = []
+
+    def items_of(category, folder):
+        for name, is_dir in sorted((_listing(folder) or {}).items()):
+            if not is_dir:
+                continue
+            if not name.isdigit():
+                issues.append(_issue("error", "non_numeric_item", category, name, os.path.join(folder, name),
+                                     f"{category}/{name}: item folders must be numbers"))
+            else:
+                yield name
+
+    for category in ("head", "body"):
+        base = paths[category]
+        tasks += [(category, item, base) for item in items_of(category, os.path.join(base, "model"))]
+    clothes = paths["clothes"]
+    for category, is_dir in sorted((_listing(clothes) or {}).items()):
+        if not is_dir or category == "body":
+            continue
+        if category not in CATEGORY_PREFIXES:
+            issues.append(_issue("warning", "unknown_category", category, None, os.path.join(clothes, category),
+                                 f"{category}: no stream prefix in CATEGORY_PREFIXES, its items cannot be built"))
+            continue
+        tasks += [(category, item, clothes) for item in items_of(category, os.path.join(clothes, category))]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="preflight") as executor:
+        for item_issues in executor.map(lambda task: _check_library_item(*task), tasks):
+            issues += item_issues
+    return _report("library", gender, len(tasks), issues, started)
+
+
+def log_report(report):
+    """Log a report's counts, and its errors as warnings."""
+    logger.info(f"Preflight of {report['scope']} ({report['target']}): {report['items']} items, "
+                f"{report['errors']} errors, {report['warnings']} warnings in {report['seconds']:.2f}s")
+    for issue in report["issues"]:
+        if issue["severity"] == "error":
+            logger.warning(f"Preflight: {issue['message']}")
+        else:
+            logger.debug(f"Preflight: {issue['message']}")
+
+
+def format_report(report):
+    """Human-readable report (GUI)."""
+    lines = [
+        f"Checked {report['items']} items in {report['seconds']:.2f}s: "
+        f"{report['errors']} errors, {report['warnings']} warnings",
+        "",
+    ]
+    if report["buildable"] is False:
+        lines += ["This selection cannot be built as it is.", ""]
+    for severity, title in (("error", "Errors:"), ("warning", "Warnings:")):
+        messages = [issue["message"] for issue in report["issues"] if issue["severity"] == severity]
+        if messages:
+            lines += [title] + [f"  {'!' if severity == 'error' else '-'} {message}" for message in messages] + [""]
+    if not report["issues"]:
+        lines.append("No problems found.")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import sys
+    import json
+    import argparse
+    from config import setup_logging
+
+    parser = argparse.ArgumentParser(description="Check a selection or a library before building")
+    parser.add_argument("--selection", help="Selection JSON to check (default: check the whole library)")
+    parser.add_argument("--gender", choices=["male", "female"], default="male")
+    parser.add_argument("--workers", type=int, default=PREFLIGHT_WORKERS)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    setup_logging()
+    if args.selection:
+        with open(args.selection, "r", encoding="utf-8") as f:
+            report = check_selection(json.load(f), args.gender, workers=args.workers)
+    else:
+        logger.info(f"Checking {MALE_PATH if args.gender == 'male' else FEMALE_PATH}")
+        report = check_library(args.gender, workers=args.workers)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    sys.exit(1 if report["errors"] else 0)
@@ -0,0 +1,139 @@
+"""Generate the preview PNGs the GUI shows for textures, straight from the .ytd.
+
+Items are only selectable once textures/pics has a PNG per .ytd in
+textures/files (head and body keep both side by side), so libraries with
+missing pics can be filled in here. Decoding needs NumPy and Pillow.
+"""
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from config import PREVIEW_MAX_SIZE, PREVIEW_WORKERS, get_log_queue, setup_worker_logging
+from metrics import REGISTRY
+from tracing import span
+from ytd import read_texture_dictionary, read_texture_level
+
+logger = logging.getLogger(__name__)
+
+PREVIEWS_GENERATED = REGISTRY.counter("previews_generated_total", "Preview PNGs rendered from .ytd files")
+PREVIEW_FAILURES = REGISTRY.counter("preview_failures_total", "Preview PNGs that could not be rendered")
+
+# Texture name endings that are not the diffuse map
+_NON_DIFFUSE = ("_n", "_s", "_normal", "_spec", "_mask")
+
+
+def pics_path(ytd_path):
+    """Where the GUI looks for the preview of a .ytd."""
+    folder, name = os.path.split(ytd_path)
+    png_name = os.path.splitext(name)[0] + ".png"
+    if os.path.basename(folder).lower() == "files" and os.path.basename(os.path.dirname(folder)).lower() == "textures":
+        return os.path.join(os.path.dirname(folder), "pics", png_name)
+    return os.path.join(folder, png_name)
+
+
+def preview_texture(textures):
+    """The texture of a dictionary that best represents it: the diffuse map if there is one."""
+    for texture in textures:
+        if "diff" in texture["name"].lower():
+            return texture
+    for texture in textures:
+        if not texture["name"].lower().endswith(_NON_DIFFUSE):
+            return texture
+    return textures[0] if textures else None
+
+
+def preview_level(texture, max_size=PREVIEW_MAX_SIZE):
+    """Smallest mip level that is still at least max_size on its longer side."""
+    level = 0
+    while (level + 1 < texture["levels"]
+           and max(texture["width"] >> (level + 1), texture["height"] >> (level + 1)) >= max_size):
+        level += 1
+    return level
+
+
+def render_preview(ytd_path, png_path=None, max_size=PREVIEW_MAX_SIZE):
+    """Decode a .ytd's preview texture and save it as a PNG thumbnail. Returns the PNG path."""
+    import bcn
+    from PIL import Image
+
+    png_path = png_path or pics_path(ytd_path)
+    with span("preview.render", "cpu", path=ytd_path):
+        texture = preview_texture(read_texture_dictionary(ytd_path)["textures"])
+        if texture is None:
+            raise ValueError(f"{ytd_path} has no textures")
+        # Decoding a small mip is far cheaper than the top one and looks the same once scaled down
+        data, width, height = read_texture_level(ytd_path, texture, preview_level(texture, max_size))
+        image = Image.fromarray(bcn.decode(data, width, height, texture["format"]))
+        image.thumbnail((max_size, max_size))
+
+        os.makedirs(os.path.dirname(png_path), exist_ok=True)
+        tmp_path = f"{png_path}.{os.getpid()}.tmp"
+        image.save(tmp_path, "PNG")
+        os.replace(tmp_path, png_path)
+    return png_path
+
+
+def missing_pics(root):
+    """(ytd, png) pairs under root whose preview PNG does not exist yet."""
+    missing = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.lower().endswith(".ytd"):
+                ytd_path = os.path.join(dirpath, filename)
+                png_path = pics_path(ytd_path)
+                if not os.path.exists(png_path):
+                    missing.append((ytd_path, png_path))
+    return missing
+
+
+def _render_job(job):
+    ytd_path, png_path, max_size = job
+    try:
+        render_preview(ytd_path, png_path, max_size)
+        return ytd_path, None
+    except Exception as e:
+        return ytd_path, str(e)
+
+
+def fill_missing_pics(root, workers=PREVIEW_WORKERS, max_size=PREVIEW_MAX_SIZE, progress_callback=None):
+    """Render every missing preview under root on a process pool. Returns (generated, failed)."""
+    jobs = [(ytd_path, png_path, max_size) for ytd_path, png_path in missing_pics(root)]
+    if not jobs:
+        return 0, 0
+
+    log_queue = get_log_queue()
+    generated = failed = 0
+    # Block decoding is CPU-bound NumPy work, so it gets processes rather than threads
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=setup_worker_logging if log_queue else None,
+                             initargs=(log_queue,) if log_queue else ()) as executor:
+        for done, (ytd_path, error) in enumerate(executor.map(_render_job, jobs, chunksize=8), 1):
+            if error:
+                failed += 1
+                PREVIEW_FAILURES.inc()
+                logger.warning(f"No preview for {ytd_path}: {error}")
+            else:
+                generated += 1
+                PREVIEWS_GENERATED.inc()
+            if progress_callback:
+                progress_callback(done / len(jobs), ytd_path)
+    return generated, failed
+
+
+if __name__ == "__main__":
+    import argparse
+    from config import MALE_PATH, FEMALE_PATH, setup_logging
+
+    parser = argparse.ArgumentParser(description="Generate missing preview PNGs from .ytd files")
+    parser.add_argument("roots", nargs="*", help="Library folders (default: the male and female libraries and face)")
+    parser.add_argument("--workers", type=int, default=PREVIEW_WORKERS)
+    parser.add_argument("--size", type=int, default=PREVIEW_MAX_SIZE, help="Longest side of the previews in pixels")
+    args = parser.parse_args()
+
+    setup_logging()
+    roots = args.roots or [MALE_PATH, FEMALE_PATH, os.path.join(os.path.dirname(MALE_PATH), "face")]
+    for root in roots:
+        started = time.perf_counter()
+        generated, failed = fill_missing_pics(root, args.workers, args.size)
+        logger.info(f"{root}: {generated} previews generated, {failed} failed "
+                    f"in {time.perf_counter() - started:.1f}s")
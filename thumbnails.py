@@ -0,0 +1,146 @@
+"""Precomputed GUI thumbnails.
+
+The GUI shows library PNGs at a handful of fixed sizes. Decoding a full PNG
+and resizing it the first time a category is browsed is slow, so this module
+renders every size ahead of time into cache/thumbnails. Each cached file
+carries its source's mtime, so a thumbnail is fresh exactly when the mtimes
+match. Run python thumbnails.py after new clothes land (e.g. nightly).
+"""
+import os
+import time
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from config import THUMBNAIL_CACHE_FOLDER, THUMBNAIL_SIZES, get_log_queue, setup_worker_logging
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_HITS = REGISTRY.counter("thumbnail_cache_hits_total", "GUI images served from a precomputed thumbnail")
+THUMBNAILS_RENDERED = REGISTRY.counter("thumbnails_rendered_total", "Thumbnails written to the thumbnail cache")
+
+
+def thumbnail_path(src, width, height, mode="fit", cache_folder=THUMBNAIL_CACHE_FOLDER):
+    """Cache location of src rendered at width x height."""
+    key = hashlib.sha1(os.path.normcase(os.path.abspath(src)).encode("utf-8")).hexdigest()
+    return os.path.join(cache_folder, key[:2], f"{key}-{width}x{height}-{mode}.png")
+
+
+def cached_thumbnail(src, size, mode="fit", cache_folder=THUMBNAIL_CACHE_FOLDER):
+    """Path of an up-to-date thumbnail of src, or None if there is none."""
+    path = thumbnail_path(src, size[0], size[1], mode, cache_folder)
+    try:
+        fresh = os.stat(path).st_mtime_ns == os.stat(src).st_mtime_ns
+    except OSError:
+        return None
+    if fresh:
+        THUMBNAIL_HITS.inc()
+        return path
+    return None
+
+
+def render_thumbnails(src, sizes=THUMBNAIL_SIZES, cache_folder=THUMBNAIL_CACHE_FOLDER, force=False):
+    """Render the stale sizes of src from one decode. Returns (thumbnails written, bytes read)."""
+    from PIL import Image
+
+    st = os.stat(src)
+    targets = [(width, height, mode, thumbnail_path(src, width, height, mode, cache_folder))
+               for width, height, mode in sizes]
+    if not force:
+        targets = [target for target in targets
+                   if not os.path.exists(target[3]) or os.stat(target[3]).st_mtime_ns != st.st_mtime_ns]
+    if not targets:
+        return 0, 0
+
+    with Image.open(src) as image:
+        image.load()
+        for width, height, mode, path in targets:
+            # Same operations the GUI would otherwise run on every first view
+            if mode == "stretch":
+                thumbnail = image.resize((width, height), Image.Resampling.LANCZOS)
+            else:
+                thumbnail = image.copy()
+                thumbnail.thumbnail((width, height))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            thumbnail.save(tmp_path, "PNG", compress_level=1)
+            os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+            os.replace(tmp_path, path)
+    return len(targets), st.st_size
+
+
+def library_images(root):
+    """Every PNG under a library root."""
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.lower().endswith(".png"):
+                yield os.path.join(dirpath, filename)
+
+
+def _render_job(job):
+    src, cache_folder, force = job
+    try:
+        written, read = render_thumbnails(src, cache_folder=cache_folder, force=force)
+        return written, read, None
+    except Exception as e:
+        return 0, 0, f"{src}: {e}"
+
+
+def precompute(roots, workers=None, cache_folder=THUMBNAIL_CACHE_FOLDER, force=False):
+    """Render every missing or stale thumbnail under roots on a process pool.
+
+    Returns a summary with counts, timings and throughput.
+    """
+    started = time.perf_counter()
+    jobs = [(src, cache_folder, force) for root in roots for src in library_images(root)]
+    scanned = time.perf_counter()
+
+    images = written = read = failed = 0
+    log_queue = get_log_queue()
+    # PNG decoding and resampling are CPU-bound, so each worker is a process
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=setup_worker_logging if log_queue else None,
+                             initargs=(log_queue,) if log_queue else ()) as executor:
+        for job_written, job_read, error in executor.map(_render_job, jobs, chunksize=32):
+            if error:
+                failed += 1
+                logger.warning(f"Thumbnail failed for {error}")
+            elif job_written:
+                images += 1
+                written += job_written
+                read += job_read
+    THUMBNAILS_RENDERED.inc(written)
+
+    elapsed = time.perf_counter() - started
+    render_seconds = time.perf_counter() - scanned
+    return {
+        "sources": len(jobs),
+        "rendered_sources": images,
+        "up_to_date": len(jobs) - images - failed,
+        "failed": failed,
+        "thumbnails_written": written,
+        "scan_seconds": scanned - started,
+        "seconds": elapsed,
+        "images_per_second": images / render_seconds if render_seconds else 0.0,
+        "mib_per_second": read / (1024 * 1024) / render_seconds if render_seconds else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    import json
+    import argparse
+    from config import MALE_PATH, FEMALE_PATH, setup_logging
+
+    parser = argparse.ArgumentParser(description="Precompute the GUI's thumbnails for the clothes library")
+    parser.add_argument("roots", nargs="*", help="Library folders (default: the male and female libraries and face)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--cache", default=THUMBNAIL_CACHE_FOLDER)
+    parser.add_argument("--force", action="store_true", help="Re-render thumbnails that are up to date")
+    args = parser.parse_args()
+
+    setup_logging()
+    roots = args.roots or [MALE_PATH, FEMALE_PATH, os.path.join(os.path.dirname(MALE_PATH), "face")]
+    summary = precompute([root for root in roots if os.path.isdir(root)], args.workers, args.cache, args.force)
+    logger.info(f"Thumbnails: {summary['rendered_sources']} images rendered, {summary['up_to_date']} up to date, "
+                f"{summary['failed']} failed, {summary['images_per_second']:.1f} images/s")
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,179 @@
+"""Span tracing for builds, exported as Chrome trace-event JSON.
+
+Spans are only recorded while a trace is active, so instrumented code pays a
+single context variable lookup otherwise. Each build_trace records into its own
+Tracer, held in a context variable, so concurrent builds write separate files;
+code that hands work to a thread pool must run it in a copy of the context
+(asyncio.to_thread does). Trace files open in Perfetto (https://ui.perfetto.dev)
+or chrome://tracing.
+"""
+import contextlib
+import contextvars
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+
+from config import TRACE_BUILDS, TRACE_FOLDER, logger
+
+
+class _NullSpan:
+    """Span used while tracing is off"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer._record(self.name, self.category, self.start, end, self.args)
+        return False
+
+
+class Tracer:
+    """Collects complete ("X") trace events from any thread."""
+    def __init__(self):
+        self._events = None  # None while no trace is active
+        self._thread_names = {}
+        self._origin = 0
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        return self._events is not None
+
+    def start(self):
+        with self._lock:
+            self._events = []
+            self._thread_names = {}
+            self._origin = time.perf_counter_ns()
+
+    def stop(self):
+        """Stop recording and return the collected events (with thread names)."""
+        with self._lock:
+            events, self._events = self._events or [], None
+            pid = os.getpid()
+            for tid, thread_name in self._thread_names.items():
+                events.append({
+                    "name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                    "args": {"name": thread_name}
+                })
+            return events
+
+    def span(self, name, cat="build", **args):
+        if self._events is None:
+            return _NULL_SPAN
+        return _Span(self, name, cat, args)
+
+    def _record(self, name, category, start, end, args):
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (start - self._origin) / 1000,  # Microseconds
+            "dur": (end - start) / 1000,
+            "pid": os.getpid(),
+            "tid": thread.ident,
+        }
+        if args:
+            event["args"] = {key: str(value) for key, value in args.items()}
+        with self._lock:
+            if self._events is not None:
+                self._events.append(event)
+                self._thread_names.setdefault(thread.ident, thread.name)
+
+
+# Tracer of the build running in this context; None while not tracing
+_current = contextvars.ContextVar("tracer", default=None)
+
+
+def current_tracer():
+    """Tracer recording the calling context's build, or None."""
+    return _current.get()
+
+
+def span(name, cat="build", **args):
+    """Context manager timing a block as a trace span (cat is the trace category)."""
+    tracer = _current.get()
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name, cat, **args)
+
+
+def traced(name=None, cat="build", args=None):
+    """Decorator timing every call of a function as a span.
+
+    args, if given, is called with the function's arguments and returns a dict
+    of span arguments (e.g. the category/item being processed).
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*call_args, **call_kwargs):
+            tracer = _current.get()
+            if tracer is None:
+                return func(*call_args, **call_kwargs)
+            span_args = args(*call_args, **call_kwargs) if args else {}
+            with tracer.span(span_name, cat, **span_args):
+                return func(*call_args, **call_kwargs)
+        return wrapper
+    return decorator
+
+
+def write_trace(path, events):
+    """Write events as a Chrome trace-event JSON file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+@contextlib.contextmanager
+def build_trace(ped_name, enabled=None):
+    """Trace everything inside the block into traces/<ped_name>-<time>.trace.json.
+
+    Does nothing unless enabled (defaults to the PED_CREATOR_TRACE setting) or
+    when this context is already recording a trace from an outer block.
+    """
+    enabled = TRACE_BUILDS if enabled is None else enabled
+    if not enabled or _current.get() is not None:
+        yield None
+        return
+
+    path = os.path.join(TRACE_FOLDER, f"{ped_name}-{datetime.datetime.now():%Y%m%d-%H%M%S}.trace.json")
+    tracer = Tracer()
+    tracer.start()
+    token = _current.set(tracer)
+    try:
+        with tracer.span("build", ped=ped_name):
+            yield path
+    finally:
+        _current.reset(token)
+        events = tracer.stop()
+        try:
+            write_trace(path, events)
+            logger.info(f"Build trace written to {path}")
+        except OSError as e:
+            logger.error(f"Failed to write build trace {path}: {e}")
@@ -5,20 +5,9 @@ import json
 import sys
 import os
 
-# Clear the log file before starting
-if os.path.exists("logs/ymt_generator.log"):
-    with open("logs/ymt_generator.log", "w") as f:
-        f.write("")
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,  # Set logging level to INFO
-    format="%(asctime)s - %(levelname)s - %(message)s",  # Log format
-    handlers=[
-        logging.FileHandler("logs/ymt_generator.log"),  # Log to a file
-        logging.StreamHandler()  # Log to the console
-    ]
-)
+from tracing import span, traced
+
+logger = logging.getLogger(__name__)
 
 # Category prefixes mapping
 CATEGORY_PREFIXES = {
@@ -56,6 +45,11 @@ COMPONENT_SLOTS = [
     "jbib"   # Slot 12
 ]
 
+# Category for each component prefix (first match wins, so "accs" beats "under shirt")
+SLOT_CATEGORIES = {}
+for _category, _prefix in CATEGORY_PREFIXES.items():
+    SLOT_CATEGORIES.setdefault(_prefix, _category)
+
 # Function to add indentation and line breaks to the XML
 def indent(elem, level=0):
     indent_str = "  "  # Two spaces per level
@@ -76,14 +70,14 @@ def indent(elem, level=0):
 # Function to create XML root and global flags
 def create_root():
     root = ET.Element("CPedVariationInfo")
-    logging.info("Root XML element created.")
+    logger.debug("Root XML element created.")
 
     # Add global flags
     ET.SubElement(root, "bHasTexVariations", value="true")
     ET.SubElement(root, "bHasDrawblVariations", value="true")
     ET.SubElement(root, "bHasLowLODs", value="false")
     ET.SubElement(root, "bIsSuperLOD", value="false")
-    logging.info("Global flags added to XML.")
+    logger.debug("Global flags added to XML.")
 
     return root
 
@@ -94,17 +88,17 @@ def generate_avail_comp(root, ped_data):
     current_id = 0  # Start from 0
 
     for slot in COMPONENT_SLOTS:
-        category = next((k for k, v in CATEGORY_PREFIXES.items() if v == slot), None)
+        category = SLOT_CATEGORIES.get(slot)
         if category and category in ped_data:
             avail_comp_list.append(str(current_id))
             current_id += 1
-            logging.info(f"Component '{slot}' (category: {category}) found. Assigned ID: {current_id - 1}")
+            logger.debug("Component '%s' (category: %s) found. Assigned ID: %d", slot, category, current_id - 1)
         else:
             avail_comp_list.append("255")
-            logging.info(f"Component '{slot}' not found. Assigned ID: 255")
+            logger.debug("Component '%s' not found. Assigned ID: 255", slot)
 
     avail_comp.text = " ".join(avail_comp_list)
-    logging.info(f"Generated availComp: {avail_comp.text}")
+    logger.info("Generated availComp: %s", avail_comp.text)
 
 # Function to add component items
 def add_component_item(comp_data, component_id, textures):
@@ -132,22 +126,22 @@ def add_component_item(comp_data, component_id, textures):
         cloth_data = ET.SubElement(drawbl_item, "clothData")
         ET.SubElement(cloth_data, "ownsCloth", value="false")
 
-    logging.info(f"Added component item with ID: {component_id} and {total_textures} textures.")
+    logger.debug("Added component item with ID: %s and %d textures.", component_id, total_textures)
 
 # Function to add component data
 def add_component_data(root, ped_data):
     comp_data = ET.SubElement(root, "aComponentData3", itemType="CPVComponentData")
-    logging.info("Component data section added to XML.")
+    logger.debug("Component data section added to XML.")
 
     for slot in COMPONENT_SLOTS:
-        category = next((k for k, v in CATEGORY_PREFIXES.items() if v == slot), None)
+        category = SLOT_CATEGORIES.get(slot)
         if category and f"{category}_textures" in ped_data:
             textures = ped_data[f"{category}_textures"]
             add_component_item(comp_data, slot, textures)
 
 def add_component_info(root, ped_data):
     comp_infos = ET.SubElement(root, "compInfos", itemType="CComponentInfo")
-    logging.info("Component info section added to XML.")
+    logger.debug("Component info section added to XML.")
 
     # Mapping of component categories to their respective IDs
     COMPONENT_IDS = {
@@ -173,7 +167,7 @@ def add_component_info(root, ped_data):
             # Get the component ID based on the category
             component_id = COMPONENT_IDS.get(CATEGORY_PREFIXES.get(category, ""), -1)
             if component_id == -1:
-                logging.warning(f"Unknown category: {category}. Skipping component info.")
+                logger.warning("Unknown category: %s. Skipping component info.", category)
                 continue
 
             # Get the drawable indices for this category
@@ -208,7 +202,7 @@ def add_component_info(root, ped_data):
         # Set drawable index (infoHash_FA1F27BF)
         ET.SubElement(comp_info, "hash_FA1F27BF", value=str(item["drawable_index"]))
 
-        logging.info(f"Added component info for component ID: {item['component_id']}, drawable index: {item['drawable_index']}")
+        logger.debug("Added component info for component ID: %s, drawable index: %s", item["component_id"], item["drawable_index"])
 
 # Function to add props and anchors
 def add_props_and_anchors(root, ped_data):
@@ -260,7 +254,7 @@ def add_props_and_anchors(root, ped_data):
                 anchor_name = f"ANCHOR_{prop_prefix.upper()}".replace("_P", "")
             
             ET.SubElement(anchor_item, "anchor").text = anchor_name
-            logging.info(f"Added anchor for {prop_prefix} with props: {props_text}")
+            logger.debug("Added anchor for %s with props: %s", prop_prefix, props_text)
 
 # Function to add prop items
 def add_prop_item(prop_meta_data, prop_id, textures, prop_prefix):
@@ -296,66 +290,75 @@ def add_prop_item(prop_meta_data, prop_id, textures, prop_prefix):
     ET.SubElement(prop_item, "propId", value=str(prop_id))
     ET.SubElement(prop_item, "hash_AC887A91", value="0")
 
-    logging.info(f"Added prop item with ID: {prop_id} and {len(textures)} textures for category: {prop_prefix}.")
+    logger.debug("Added prop item with ID: %s and %d textures for category: %s.", prop_id, len(textures), prop_prefix)
 
 # Function to convert XML to YMT using an external tool
+@traced("convert_xml_to_ymt", args=lambda xml_file, ymt_file: {"ymt_file": ymt_file})
 def convert_xml_to_ymt(xml_file, ymt_file):
     try:
         # Replace 'XmlToYmtConverter.exe' with the actual path to your C# executable
         subprocess.run(["ymtexe/XmlToYmtConverter.exe", xml_file, ymt_file], check=True)
-        logging.info(f"Successfully converted {xml_file} to {ymt_file}")
+        logger.info(f"Successfully converted {xml_file} to {ymt_file}")
     except subprocess.CalledProcessError as e:
-        logging.error(f"Failed to convert XML to YMT: {e}")
+        logger.error(f"Failed to convert XML to YMT: {e}")
 
 # Main function to generate the XML
-def generate_xml(ped_data, ped_name):
+@traced("generate_xml", args=lambda ped_data, ped_name, *a, **kw: {"ped": ped_name})
+def generate_xml(ped_data, ped_name, output_dir=None):
+    """Write {ped_name}.ymt into output_dir (the working directory by default) and return its path"""
     # Create XML root
     root = create_root()
 
     # Generate availComp
-    generate_avail_comp(root, ped_data)
+    with span("generate_avail_comp", "xml"):
+        generate_avail_comp(root, ped_data)
 
     # Add component data
-    add_component_data(root, ped_data)
+    with span("add_component_data", "xml"):
+        add_component_data(root, ped_data)
 
     # Add component info
-    add_component_info(root, ped_data)
+    with span("add_component_info", "xml"):
+        add_component_info(root, ped_data)
 
     # Add props and anchors
-    add_props_and_anchors(root, ped_data)
+    with span("add_props_and_anchors", "xml"):
+        add_props_and_anchors(root, ped_data)
 
     # Add DLC name
     dlc_name = ET.SubElement(root, "dlcName")
     dlc_name.text = ""  # Ensure it's empty 
-    ET.tostring(root, encoding="unicode")
-    logging.info("DLC name added to XML.")
+    logger.debug("DLC name added to XML.")
 
     # Add indentation and line breaks to the XML
-    indent(root)
-    logging.info("XML indentation and line breaks added.")
+    with span("indent", "xml"):
+        indent(root)
+    logger.debug("XML indentation and line breaks added.")
 
     # Write XML to a temporary file
-    temp_xml_file = f"{ped_name}.temp.xml"
+    temp_xml_file = os.path.join(output_dir or "", f"{ped_name}.temp.xml")
     try:
         tree = ET.ElementTree(root)
-        with open(temp_xml_file, "wb") as f:  # Open in binary mode
+        with span("write_xml", "io"), open(temp_xml_file, "wb") as f:  # Open in binary mode
             f.write(b'\xef\xbb\xbf')  # Write the UTF-8 BOM
             tree.write(f, encoding="utf-8", xml_declaration=True)
-        logging.info(f"Temporary XML file written successfully: {temp_xml_file}")
+        logger.info(f"Temporary XML file written successfully: {temp_xml_file}")
     except Exception as e:
-        logging.error(f"Failed to write temporary XML file: {e}")
+        logger.error(f"Failed to write temporary XML file: {e}")
         return
 
     # Convert the temporary XML file to YMT
-    ymt_file = f"{ped_name}.ymt"
+    ymt_file = os.path.join(output_dir or "", f"{ped_name}.ymt")
     convert_xml_to_ymt(temp_xml_file, ymt_file)
 
     # Clean up the temporary XML file
     try:
         os.remove(temp_xml_file)
-        logging.info(f"Temporary XML file removed: {temp_xml_file}")
+        logger.debug(f"Temporary XML file removed: {temp_xml_file}")
     except Exception as e:
-        logging.error(f"Failed to remove temporary XML file: {e}")
+        logger.error(f"Failed to remove temporary XML file: {e}")
+
+    return ymt_file
 
 # Function to load JSON file for testing
 def load_json_file(json_file):
@@ -363,11 +366,14 @@ def load_json_file(json_file):
         with open(json_file, "r") as f:
             return json.load(f)
     except Exception as e:
-        logging.error(f"Failed to load JSON file: {e}")
+        logger.error(f"Failed to load JSON file: {e}")
         return None
     
 # Run the script
 if __name__ == "__main__":
+    from config import setup_logging
+    setup_logging()
+
     # Load JSON file for testing
     json_file = "ymt-saved_selections.json"
     ped_data = load_json_file(json_file)
@@ -0,0 +1,328 @@
+"""Read RSC7 resource headers and the texture dictionary of .ytd files.
+
+Only the system segment (the object graph) is inflated, so a texture's size,
+format and mip count are known without touching its pixel data. Results are
+cached per (path, size, mtime) in output/.texture_index.json.
+
+RSC7 layout (as documented by CodeWalker):
+
+    0x00 magic "RSC7", 0x04 version, 0x08 system flags, 0x0C graphics flags,
+    0x10 raw deflate stream of the system segment followed by the graphics segment
+
+Pointers in the system segment are virtual: 0x5xxxxxxx points into the system
+segment, 0x6xxxxxxx into the graphics segment.
+"""
+import os
+import json
+import time
+import zlib
+import struct
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import TEXTURE_INDEX_PATH
+from metrics import REGISTRY
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+RSC7_MAGIC = b"RSC7"
+HEADER_SIZE = 16
+READ_CHUNK = 64 * 1024
+
+SYSTEM_BASE = 0x50000000
+GRAPHICS_BASE = 0x60000000
+
+# D3D formats used by GTA V textures: name, bytes per 4x4 block (compressed) or per pixel
+FORMATS = {
+    0x31545844: ("DXT1", 8, True),
+    0x33545844: ("DXT3", 16, True),
+    0x35545844: ("DXT5", 16, True),
+    0x31495441: ("ATI1", 8, True),
+    0x32495441: ("ATI2", 16, True),
+    0x20374342: ("BC7", 16, True),
+    21: ("A8R8G8B8", 4, False),
+    25: ("A1R5G5B5", 2, False),
+    28: ("A8", 1, False),
+    32: ("A8B8G8R8", 4, False),
+    50: ("L8", 1, False),
+}
+
+FORMAT_CODES = {name: code for code, (name, _, _) in FORMATS.items()}
+
+PARSES = REGISTRY.counter("ytd_parses_total", "Texture dictionaries parsed from disk")
+PARSE_FAILURES = REGISTRY.counter("ytd_parse_failures_total", "Files that could not be parsed as a texture dictionary")
+INDEX_HITS = REGISTRY.counter("ytd_index_hits_total", "Texture dictionary lookups served from the index")
+
+
+class ResourceError(ValueError):
+    """The file is not a readable RSC7 resource or texture dictionary."""
+
+
+def page_size(flags):
+    """Size in bytes of one segment, from its RSC7 flags."""
+    counts = (
+        ((flags >> 27) & 0x1) << 0,
+        ((flags >> 26) & 0x1) << 1,
+        ((flags >> 25) & 0x1) << 2,
+        ((flags >> 24) & 0x1) << 3,
+        ((flags >> 17) & 0x7F) << 4,
+        ((flags >> 11) & 0x3F) << 5,
+        ((flags >> 7) & 0xF) << 6,
+        ((flags >> 5) & 0x3) << 7,
+        ((flags >> 4) & 0x1) << 8,
+    )
+    return (0x200 << (flags & 0xF)) * sum(counts)
+
+
+def parse_header(data):
+    """Return the RSC7 header of a resource as a dict."""
+    if len(data) < HEADER_SIZE or data[:4] != RSC7_MAGIC:
+        raise ResourceError("Not an RSC7 resource")
+    version, system_flags, graphics_flags = struct.unpack_from("<III", data, 4)
+    return {
+        "version": version,
+        "system_flags": system_flags,
+        "graphics_flags": graphics_flags,
+        "system_size": page_size(system_flags),
+        "graphics_size": page_size(graphics_flags),
+    }
+
+
+def read_header(path):
+    """RSC7 header of the resource at path (works for .ytd, .ydd, .yft ...)."""
+    with open(path, "rb") as f:
+        return parse_header(f.read(HEADER_SIZE))
+
+
+def _inflate(f, wanted):
+    """Inflate the first wanted bytes of the segments from a file positioned after the header."""
+    inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+    parts = []
+    size = 0
+    while size < wanted:
+        chunk = inflater.unconsumed_tail or f.read(READ_CHUNK)
+        if not chunk:
+            break
+        part = inflater.decompress(chunk, wanted - size)
+        parts.append(part)
+        size += len(part)
+        if inflater.eof:
+            break
+    if size < wanted:
+        raise ResourceError(f"Resource truncated ({size} of {wanted} bytes)")
+    return b"".join(parts)
+
+
+def read_system_segment(f, header):
+    """Inflate just the system segment from an open resource file positioned after the header."""
+    return _inflate(f, header["system_size"])
+
+
+def _system_offset(pointer, system):
+    if pointer >> 28 != SYSTEM_BASE >> 28:
+        raise ResourceError(f"Expected a system pointer, got {pointer:#x}")
+    offset = pointer & 0x0FFFFFFF
+    if offset >= len(system):
+        raise ResourceError(f"Pointer {pointer:#x} is outside the system segment")
+    return offset
+
+
+def _read_string(system, pointer):
+    offset = _system_offset(pointer, system)
+    end = system.find(b"\0", offset)
+    return system[offset:end if end >= 0 else len(system)].decode("ascii", "replace")
+
+
+def level_bytes(fmt, width, height, level):
+    """Bytes of one mip level; fmt is a format code or name."""
+    if isinstance(fmt, str):
+        fmt = FORMAT_CODES.get(fmt)
+    _, unit, compressed = FORMATS.get(fmt, (None, 4, False))
+    w, h = max(width >> level, 1), max(height >> level, 1)
+    return ((w + 3) // 4) * ((h + 3) // 4) * unit if compressed else w * h * unit
+
+
+def texture_bytes(fmt, width, height, levels):
+    """Bytes of a texture's full mip chain."""
+    return sum(level_bytes(fmt, width, height, level) for level in range(max(levels, 1)))
+
+
+def parse_texture_dictionary(system):
+    """Textures of a pgDictionary<grcTexturePC> system segment, in file order."""
+    # The dictionary is the root block: texture pointers at 0x30, their count at 0x38
+    if len(system) < 0x40:
+        raise ResourceError("System segment too small for a texture dictionary")
+    textures_pointer, count = struct.unpack_from("<QH", system, 0x30)
+    if not count:
+        return []
+    list_offset = _system_offset(textures_pointer, system)
+    pointers = struct.unpack_from(f"<{count}Q", system, list_offset)
+
+    textures = []
+    for pointer in pointers:
+        offset = _system_offset(pointer, system)
+        name_pointer, = struct.unpack_from("<Q", system, offset + 0x28)
+        width, height, depth, stride, fmt = struct.unpack_from("<HHHHI", system, offset + 0x50)
+        levels = system[offset + 0x5D]
+        data_pointer, = struct.unpack_from("<Q", system, offset + 0x70)
+        textures.append({
+            "name": _read_string(system, name_pointer) if name_pointer else "",
+            "width": width,
+            "height": height,
+            "format": FORMATS.get(fmt, (f"0x{fmt:08x}",))[0],
+            "levels": levels,
+            "stride": stride,
+            "bytes": texture_bytes(fmt, width, height, levels),
+            "data_offset": data_pointer - GRAPHICS_BASE if data_pointer >> 28 == GRAPHICS_BASE >> 28 else None,
+        })
+    return textures
+
+
+def read_texture_dictionary(path):
+    """Header and texture list of a .ytd file, without inflating the pixel data."""
+    with span("ytd.parse", "io", path=str(path)), open(path, "rb") as f:
+        header = parse_header(f.read(HEADER_SIZE))
+        try:
+            system = read_system_segment(f, header)
+            textures = parse_texture_dictionary(system)
+        except (zlib.error, struct.error, IndexError) as e:
+            raise ResourceError(f"Corrupt texture dictionary: {e}") from e
+    PARSES.inc()
+    return {"header": header, "textures": textures}
+
+
+def read_texture_level(path, texture, level=0):
+    """Raw pixel data of one mip level of a texture returned by read_texture_dictionary.
+
+    Only the resource up to the end of that level is inflated, so small mips
+    of a texture near the start of the graphics segment are cheap.
+    """
+    if texture["data_offset"] is None:
+        raise ResourceError(f"Texture {texture['name']} has no pixel data")
+    level = min(level, max(texture["levels"], 1) - 1)
+    start = texture["data_offset"] + sum(level_bytes(texture["format"], texture["width"], texture["height"], l)
+                                         for l in range(level))
+    size = level_bytes(texture["format"], texture["width"], texture["height"], level)
+    with span("ytd.read_level", "io", path=str(path), level=level), open(path, "rb") as f:
+        header = parse_header(f.read(HEADER_SIZE))
+        try:
+            data = _inflate(f, header["system_size"] + start + size)
+        except zlib.error as e:
+            raise ResourceError(f"Corrupt resource: {e}") from e
+    offset = header["system_size"] + start
+    return data[offset:offset + size], max(texture["width"] >> level, 1), max(texture["height"] >> level, 1)
+
+
+class TextureIndex:
+    """Parsed texture dictionaries, cached per (path, size, mtime).
+
+    Entries are kept in memory and persisted to a JSON file so a library only
+    has to be read once. Files that fail to parse are cached too (with their
+    error) so scans don't retry them until they change.
+    """
+
+    def __init__(self, path=TEXTURE_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = None
+        self._dirty = False
+
+    def _load(self):
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def save(self):
+        """Persist the index (written atomically)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+    def get(self, path):
+        """Parsed dictionary of path: {"header", "textures"}, or {"error"} if unreadable."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            entry = self._load().get(path)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            INDEX_HITS.inc()
+            return entry["info"]
+
+        try:
+            info = read_texture_dictionary(path)
+        except (OSError, ResourceError) as e:
+            logger.debug("Could not parse %s: %s", path, e)
+            PARSE_FAILURES.inc()
+            info = {"error": str(e)}
+        with self._lock:
+            self._load()[path] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "info": info}
+            self._dirty = True
+        return info
+
+    def scan(self, root, workers=8):
+        """Index every .ytd under root; returns (files, textures, errors)."""
+        paths = [os.path.join(dirpath, name)
+                 for dirpath, _, names in os.walk(root) for name in names if name.lower().endswith(".ytd")]
+        files = textures = errors = 0
+        # Mostly file I/O and zlib, which release the GIL
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ytd") as executor:
+            for info in executor.map(self.get, paths):
+                files += 1
+                if "error" in info:
+                    errors += 1
+                else:
+                    textures += len(info["textures"])
+        self.save()
+        return files, textures, errors
+
+
+def oversized_textures(info, max_size):
+    """Textures of a parsed dictionary whose width or height exceeds max_size."""
+    return [texture for texture in info.get("textures", ())
+            if texture["width"] > max_size or texture["height"] > max_size]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_texture_index():
+    """Return the process-wide texture index."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = TextureIndex()
+        return _index
+
+
+if __name__ == "__main__":
+    import argparse
+    from config import setup_logging
+
+    parser = argparse.ArgumentParser(description="Inspect .ytd texture dictionaries")
+    parser.add_argument("paths", nargs="*", help=".ytd files to print as JSON")
+    parser.add_argument("--scan", metavar="ROOT", help="Index every .ytd under ROOT")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    setup_logging()
+    index = get_texture_index()
+    if args.scan:
+        started = time.perf_counter()
+        files, textures, errors = index.scan(args.scan, args.workers)
+        print(f"Indexed {files} files ({textures} textures, {errors} unreadable) "
+              f"in {time.perf_counter() - started:.2f}s")
+    for path in args.paths:
+        print(json.dumps({"path": path, **index.get(path)}, indent=2))
+    index.save()